@@ -4,8 +4,11 @@
 # - Constructor completo (agregar/editar/ordenar/borrar)
 # - Condicionales (relevant) + finalizar temprano
 # - Listas en cascada (choice_filter) Cantón→Distrito [CATÁLOGO MANUAL POR LOTES]
-# - Exportar/Importar proyecto (JSON)
-# - Exportar a XLSForm (survey/choices/settings)
+# - Importar catálogo completo Cantón→Distrito desde "Base de Datos Poblados por Regiones 2021.xlsx"
+#   (lectura read-only en streaming + caché en disco por hash del archivo)
+# - Exportar/Importar proyecto (JSON versionado y compacto, opcional .json.gz), importar un XLSForm (.xlsx) existente o el Formato de encuesta (.docx)
+# - Exportar a XLSForm (survey/choices/settings) y formato de encuesta en Word (.docx) / PDF
+#   (la lógica vive en motor_xlsform.py, sin Streamlit; también tiene CLI: proyecto JSON → .xlsx)
 # - PÁGINAS reales (style="pages"): Intro + Consentimiento + P2.. (por secciones)
 # - Portada con logo (media::image) y texto de introducción
 # - Consentimiento:
@@ -33,15 +36,50 @@
 #   - Se agrega 'qid' estable por pregunta y el editor deja de depender del índice.
 # ==========================================================================================
 
-import re
-import json
-import uuid
-from io import BytesIO
 from datetime import datetime
 from typing import List, Dict
 
 import streamlit as st
 import pandas as pd
+from streamlit.errors import StreamlitAPIException
+
+from motor_xlsform import (
+    TIPOS,
+    BASE_POBLADOS_PATH,
+    slugify_name,
+    asegurar_nombre_unico,
+    ensure_qid,
+    inicializar_estado,
+    set_catalogo,
+    agregar_lote_catalogo,
+    asegurar_placeholders_catalogo,
+    cargar_catalogo_poblados,
+    importar_catalogo_poblados,
+    plantilla_seed,
+    es_de_plantilla,
+    copiar_pregunta,
+    construir_xlsform,
+    excel_xlsform_bytes,
+    bundle_survey123_bytes,
+    word_encuesta_bytes,
+    pdf_encuesta_bytes,
+    clave_xlsform,
+    titulo_formulario,
+    PAGINA_CONSENTIMIENTO,
+    pagina_de_pregunta,
+    nuevo_id_pagina,
+    grafo_dependencias,
+    describir_dependencia,
+    validar_dependencias,
+    renombrar_referencias,
+    construir_lote_delegaciones,
+    proyecto_a_dict,
+    estado_desde_proyecto,
+    proyecto_a_archivo,
+    proyecto_desde_archivo,
+    proyecto_desde_xlsform,
+    proyecto_desde_docx,
+)
 
 # ------------------------------------------------------------------------------------------
 # Configuración de la app
@@ -59,130 +97,142 @@ Incluye:
 - **Páginas** con navegación **Siguiente/Anterior** (`settings.style = pages`).
 - **Portada** con **logo** (`media::image`) e **introducción**.
 - **Consentimiento informado** (si NO acepta, la encuesta termina) con texto ordenado por bloques.
+- **Formato de encuesta en Word / PDF** con las mismas páginas y preguntas, para aplicar en papel.
 """)
 
 # ------------------------------------------------------------------------------------------
 # Helpers
 # ------------------------------------------------------------------------------------------
-TIPOS = [
-    "Texto (corto)",
-    "Párrafo (texto largo)",
-    "Número",
-    "Selección única",
-    "Selección múltiple",
-    "Fecha",
-    "Hora",
-    "GPS (ubicación)",
-]
-
-def _rerun():
+def _rerun(solo_fragmento: bool = False):
+    """solo_fragmento=True: re-ejecuta solo el panel (st.fragment) desde el que se llamó, no todo el script."""
     if hasattr(st, "rerun"):
+        if solo_fragmento and _fragmento is not _sin_fragmento:
+            try:
+                st.rerun(scope="fragment")
+            except StreamlitAPIException:
+                pass  # llamado fuera de un rerun de fragmento → rerun completo
         st.rerun()
     else:
         st.experimental_rerun()
 
-def slugify_name(texto: str) -> str:
-    if not texto:
-        return "campo"
-    t = texto.lower()
-    t = re.sub(r"[áàäâ]", "a", t)
-    t = re.sub(r"[éèëê]", "e", t)
-    t = re.sub(r"[íìïî]", "i", t)
-    t = re.sub(r"[óòöô]", "o", t)
-    t = re.sub(r"[úùüû]", "u", t)
-    t = re.sub(r"ñ", "n", t)
-    t = re.sub(r"[^a-z0-9]+", "_", t).strip("_")
-    return t or "campo"
-
-def asegurar_nombre_unico(base: str, usados: set) -> str:
-    if base not in usados:
-        return base
-    i = 2
-    while f"{base}_{i}" in usados:
-        i += 1
-    return f"{base}_{i}"
-
-def map_tipo_to_xlsform(tipo_ui: str, name: str):
-    if tipo_ui == "Texto (corto)":
-        return ("text", None, None)
-    if tipo_ui == "Párrafo (texto largo)":
-        return ("text", "multiline", None)
-    if tipo_ui == "Número":
-        return ("integer", None, None)
-    if tipo_ui == "Selección única":
-        return (f"select_one list_{name}", None, f"list_{name}")
-    if tipo_ui == "Selección múltiple":
-        return (f"select_multiple list_{name}", None, f"list_{name}")
-    if tipo_ui == "Fecha":
-        return ("date", None, None)
-    if tipo_ui == "Hora":
-        return ("time", None, None)
-    if tipo_ui == "GPS (ubicación)":
-        return ("geopoint", None, None)
-    return ("text", None, None)
-
-def xlsform_or_expr(conds):
-    if not conds:
-        return None
-    if len(conds) == 1:
-        return conds[0]
-    return "(" + " or ".join(conds) + ")"
-
-def xlsform_not(expr):
-    if not expr:
-        return None
-    return f"not({expr})"
-
-def build_relevant_expr(rules_for_target: List[Dict]):
-    or_parts = []
-    for r in rules_for_target:
-        src = r["src"]
-        op = r.get("op", "=")
-        vals = r.get("values", [])
-        if not vals:
-            continue
-
-        if op == "=":
-            segs = [f"${{{src}}}='{v}'" for v in vals]
-        elif op == "selected":
-            segs = [f"selected(${{{src}}}, '{v}')" for v in vals]
-        elif op == "!=":
-            segs = [f"${{{src}}}!='{v}'" for v in vals]
-        else:
-            segs = [f"${{{src}}}='{v}'" for v in vals]
+def _sin_fragmento(fn):
+    return fn
 
-        or_parts.append(xlsform_or_expr(segs))
-    return xlsform_or_expr(or_parts)
+# Paneles aislados: un clic dentro de un fragmento re-ejecuta solo ese panel (Streamlit ≥ 1.37)
+_fragmento = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or _sin_fragmento
 
 # ------------------------------------------------------------------------------------------
 # FIX REFLEJO DE EDICIÓN: ID estable por pregunta (qid) + editor por qid
 # ------------------------------------------------------------------------------------------
-def ensure_qid(q: Dict) -> Dict:
-    if "qid" not in q or not q["qid"]:
-        q["qid"] = str(uuid.uuid4())
-    return q
+# Store de preguntas: la lista st.session_state.preguntas + dos índices que se mantienen sincronizados
+#   - preguntas_pos_by_qid:  qid  → posición en la lista
+#   - preguntas_qid_by_name: name → qid (si hay names duplicados, apunta al primero)
+#   - preguntas_sufijos:     base → próximo sufijo libre, para asignar names únicos en O(1) amortizado
+# Toda mutación (agregar, mover, renombrar, eliminar, importar) pasa por estas funciones.
+def _set_preguntas(preguntas: List[Dict]):
+    """Reemplaza la lista de preguntas y reconstruye los índices (asegura qid único en cada una)."""
+    lista = []
+    pos_by_qid = {}
+    qid_by_name = {}
+    for q in preguntas:
+        if q.get("qid") in pos_by_qid:
+            q = copiar_pregunta(q)
+            q["qid"] = None
+        q = ensure_qid(q)
+        pos_by_qid[q["qid"]] = len(lista)
+        qid_by_name.setdefault(q.get("name"), q["qid"])
+        lista.append(q)
+    st.session_state.preguntas = lista
+    st.session_state.preguntas_pos_by_qid = pos_by_qid
+    st.session_state.preguntas_qid_by_name = qid_by_name
+    st.session_state.preguntas_sufijos = {}  # base → próximo sufijo (asegurar_nombre_unico)
+
+def _indices_preguntas_ok() -> bool:
+    return (
+        "preguntas_pos_by_qid" in st.session_state
+        and "preguntas_qid_by_name" in st.session_state
+        and "preguntas_sufijos" in st.session_state
+        and len(st.session_state.preguntas_pos_by_qid) == len(st.session_state.preguntas)
+    )
+
+def _hay_names_duplicados() -> bool:
+    return len(st.session_state.preguntas_qid_by_name) != len(st.session_state.preguntas)
 
 def q_index_by_qid(qid: str) -> int:
-    for i, q in enumerate(st.session_state.preguntas):
-        if q.get("qid") == qid:
-            return i
-    return -1
+    return st.session_state.preguntas_pos_by_qid.get(qid, -1)
+
+def q_by_name(name: str):
+    qid = st.session_state.preguntas_qid_by_name.get(name)
+    if qid is None:
+        return None
+    return st.session_state.preguntas[st.session_state.preguntas_pos_by_qid[qid]]
+
+def _agregar_pregunta(q: Dict):
+    q = ensure_qid(q)
+    st.session_state.preguntas_pos_by_qid[q["qid"]] = len(st.session_state.preguntas)
+    st.session_state.preguntas_qid_by_name.setdefault(q["name"], q["qid"])
+    st.session_state.preguntas.append(q)
+
+def _intercambiar_preguntas(i: int, j: int):
+    preguntas = st.session_state.preguntas
+    preguntas[i], preguntas[j] = preguntas[j], preguntas[i]
+    st.session_state.preguntas_pos_by_qid[preguntas[i]["qid"]] = i
+    st.session_state.preguntas_pos_by_qid[preguntas[j]["qid"]] = j
+    if _hay_names_duplicados():
+        # "El primero" de un name duplicado pudo cambiar: reconstruir (caso raro)
+        _set_preguntas(preguntas)
+
+def _pregunta_editable(qid: str) -> Dict:
+    """Copy-on-write: la primera edición de una pregunta de la plantilla compartida la copia a la sesión."""
+    pos = st.session_state.preguntas_pos_by_qid[qid]
+    q = st.session_state.preguntas[pos]
+    if es_de_plantilla(q):
+        q = copiar_pregunta(q)
+        st.session_state.preguntas[pos] = q
+    return q
+
+def _renombrar_pregunta(qid: str, nuevo: str):
+    q = st.session_state.preguntas[st.session_state.preguntas_pos_by_qid[qid]]
+    viejo = q["name"]
+    if viejo == nuevo:
+        return
+    q = _pregunta_editable(qid)
+    duplicados = _hay_names_duplicados()
+    q["name"] = nuevo
+    # Expresiones ${viejo} y reglas del panel que apuntaban a la pregunta pasan al name nuevo
+    renombrar_referencias(st.session_state, viejo, nuevo)
+    if duplicados:
+        _set_preguntas(st.session_state.preguntas)
+        return
+    qid_by_name = st.session_state.preguntas_qid_by_name
+    if qid_by_name.get(viejo) == qid:
+        del qid_by_name[viejo]
+    qid_by_name.setdefault(nuevo, qid)
+
+def _eliminar_pregunta(qid: str):
+    pos = st.session_state.preguntas_pos_by_qid.get(qid)
+    if pos is None:
+        return
+    preguntas = st.session_state.preguntas
+    q = preguntas.pop(pos)
+    pos_by_qid = st.session_state.preguntas_pos_by_qid
+    del pos_by_qid[qid]
+    for i in range(pos, len(preguntas)):
+        pos_by_qid[preguntas[i]["qid"]] = i
+    qid_by_name = st.session_state.preguntas_qid_by_name
+    if qid_by_name.get(q["name"]) == qid:
+        del qid_by_name[q["name"]]
+    if _hay_names_duplicados():
+        _set_preguntas(preguntas)
 
 # ------------------------------------------------------------------------------------------
 # Estado base (session_state)
 # ------------------------------------------------------------------------------------------
-if "preguntas" not in st.session_state:
-    st.session_state.preguntas = []
-if "reglas_visibilidad" not in st.session_state:
-    st.session_state.reglas_visibilidad = []
-if "reglas_finalizar" not in st.session_state:
-    st.session_state.reglas_finalizar = []
-
-# ✅ Textos fijos editables (solo matriz 9)
-if "textos_fijos" not in st.session_state:
-    st.session_state.textos_fijos = {
-        "matriz_9_label": "9. En términos de seguridad, indique qué tan seguros percibe los siguientes espacios de su distrito."
-    }
+inicializar_estado(st.session_state)
+
+# Fragmentos XLSForm por pregunta de builds anteriores (build incremental)
+if "xlsform_frag_cache" not in st.session_state:
+    st.session_state.xlsform_frag_cache = {}
 
 # Editor: solo una pregunta abierta a la vez (por qid estable)
 if "edit_qid" not in st.session_state:
@@ -198,98 +248,61 @@ with st.expander("✏️ Textos fijos (editables)", expanded=False):
 # ------------------------------------------------------------------------------------------
 # Catálogo manual por lotes: Cantón → Distritos
 # ------------------------------------------------------------------------------------------
-if "choices_ext_rows" not in st.session_state:
-    st.session_state.choices_ext_rows = []  # filas para hoja choices
-if "choices_extra_cols" not in st.session_state:
-    st.session_state.choices_extra_cols = set()
-
-def _append_choice_unique(row: Dict):
-    key = (row.get("list_name"), row.get("name"))
-    exists = any((r.get("list_name"), r.get("name")) == key for r in st.session_state.choices_ext_rows)
-    if not exists:
-        st.session_state.choices_ext_rows.append(row)
-
-def _asegurar_placeholders_catalogo():
-    """
-    FIX: Survey123 exige que existan list_canton/list_distrito en choices si se usan en survey.
-    Esto garantiza placeholders aun cuando el usuario NO agregue lotes.
-    """
-    st.session_state.choices_extra_cols.update({"canton_key", "any"})
-    _append_choice_unique({"list_name": "list_canton", "name": "__pick_canton__", "label": "— escoja un cantón —"})
-    _append_choice_unique({"list_name": "list_distrito", "name": "__pick_distrito__", "label": "— escoja un cantón —", "any": "1"})
-
-def _hay_catalogo_real() -> bool:
-    cantones_reales = any(
-        r.get("list_name") == "list_canton" and r.get("name") not in (None, "", "__pick_canton__")
-        for r in st.session_state.choices_ext_rows
-    )
-    distritos_reales = any(
-        r.get("list_name") == "list_distrito" and r.get("name") not in (None, "", "__pick_distrito__")
-        for r in st.session_state.choices_ext_rows
-    )
-    return bool(cantones_reales and distritos_reales)
-
-def _filtrar_placeholders_si_hay_catalogo(rows: List[Dict]) -> List[Dict]:
-    if not _hay_catalogo_real():
-        return rows
-    filtradas = []
-    for r in rows:
-        if r.get("list_name") == "list_canton" and r.get("name") == "__pick_canton__":
-            continue
-        if r.get("list_name") == "list_distrito" and r.get("name") == "__pick_distrito__":
-            continue
-        filtradas.append(r)
-    return filtradas
-
-# Asegurar placeholders desde el inicio
-_asegurar_placeholders_catalogo()
-
 st.markdown("### 📚 Catálogo Cantón → Distrito (por lotes)")
-with st.expander("Agrega un lote (un Cantón y varios Distritos)", expanded=True):
-    col_c1, col_c2 = st.columns(2)
-    canton_txt = col_c1.text_input("Cantón (una vez)", value="", key="canton_lote")
-    distritos_txt = col_c2.text_area("Distritos del cantón (uno por línea)", value="", height=130, key="distritos_lote")
-
-    col_b1, col_b2, _ = st.columns([1, 1, 2])
-    add_lote = col_b1.button("Agregar lote", type="primary", use_container_width=True, key="btn_add_lote")
-    clear_all = col_b2.button("Limpiar catálogo", use_container_width=True, key="btn_clear_cat")
-
-    if clear_all:
-        st.session_state.choices_ext_rows = []
-        st.session_state.choices_extra_cols = set()
-        _asegurar_placeholders_catalogo()
-        st.success("Catálogo limpiado (placeholders conservados).")
-        _rerun()
-
-    if add_lote:
-        c = canton_txt.strip()
-        distritos = [d.strip() for d in distritos_txt.splitlines() if d.strip()]
-        if not c or not distritos:
-            st.error("Debes indicar Cantón y al menos un Distrito.")
-        else:
-            slug_c = slugify_name(c)
-
-            st.session_state.choices_extra_cols.update({"canton_key", "any"})
-            _asegurar_placeholders_catalogo()
+@_fragmento
+def _panel_catalogo():
+    with st.expander("Agrega un lote (un Cantón y varios Distritos)", expanded=True):
+        col_c1, col_c2 = st.columns(2)
+        canton_txt = col_c1.text_input("Cantón (una vez)", value="", key="canton_lote")
+        distritos_txt = col_c2.text_area("Distritos del cantón (uno por línea)", value="", height=130, key="distritos_lote")
+
+        col_b1, col_b2, _ = st.columns([1, 1, 2])
+        add_lote = col_b1.button("Agregar lote", type="primary", use_container_width=True, key="btn_add_lote")
+        clear_all = col_b2.button("Limpiar catálogo", use_container_width=True, key="btn_clear_cat")
+
+        if clear_all:
+            set_catalogo(st.session_state, [])
+            st.session_state.choices_extra_cols = set()
+            asegurar_placeholders_catalogo(st.session_state)
+            st.success("Catálogo limpiado (placeholders conservados).")
+            _rerun(solo_fragmento=True)
+
+        if add_lote:
+            c = canton_txt.strip()
+            distritos = [d.strip() for d in distritos_txt.splitlines() if d.strip()]
+            if not c or not distritos:
+                st.error("Debes indicar Cantón y al menos un Distrito.")
+            else:
+                st.session_state.choices_extra_cols.update({"canton_key", "any"})
+                asegurar_placeholders_catalogo(st.session_state)
 
-            _append_choice_unique({"list_name": "list_canton", "name": slug_c, "label": c})
+                n_nuevos = agregar_lote_catalogo(st.session_state, c, distritos)
 
-            usados_d = set()
-            for d in distritos:
-                slug_d = asegurar_nombre_unico(slugify_name(d), usados_d)
-                usados_d.add(slug_d)
-                _append_choice_unique({"list_name": "list_distrito", "name": slug_d, "label": d, "canton_key": slug_c})
+                st.success(f"Lote agregado: {c} → {n_nuevos} distritos nuevos.")
+                _rerun(solo_fragmento=True)
 
-            st.success(f"Lote agregado: {c} → {len(distritos)} distritos.")
-            _rerun()
+    with st.expander("Importar catálogo completo (Base de Datos Poblados por Regiones 2021)", expanded=False):
+        st.caption(
+            "Carga todos los cantones y distritos del archivo incluido en el repositorio en un solo paso. "
+            "El archivo se procesa una sola vez; luego se reutiliza el catálogo guardado en caché."
+        )
+        if st.button("📥 Importar cantones y distritos", use_container_width=True, key="btn_import_poblados"):
+            try:
+                n_c, n_d = importar_catalogo_poblados(st.session_state, cargar_catalogo_poblados(BASE_POBLADOS_PATH))
+                st.success(f"Catálogo importado: {n_c} cantones, {n_d} distritos nuevos.")
+                _rerun(solo_fragmento=True)
+            except Exception as e:
+                st.error(f"No se pudo importar la base de poblados: {e}")
+
+    if st.session_state.choices_ext_rows:
+        st.dataframe(
+            pd.DataFrame(st.session_state.choices_ext_rows),
+            use_container_width=True,
+            hide_index=True,
+            height=240
+        )
 
-if st.session_state.choices_ext_rows:
-    st.dataframe(
-        pd.DataFrame(st.session_state.choices_ext_rows),
-        use_container_width=True,
-        hide_index=True,
-        height=240
-    )
+_panel_catalogo()
 # ------------------------------------------------------------------------------------------
 # Cabecera: Logo + Delegación
 # ------------------------------------------------------------------------------------------
@@ -321,1041 +334,20 @@ with col_txt:
         help="Debe coincidir con el archivo en `media/` de Survey123 Connect.",
         key="logo_media_txt"
     )
-    titulo_compuesto = (f"Encuesta comunidad – {delegacion.strip()}" if delegacion.strip() else "Encuesta comunidad")
+    titulo_compuesto = titulo_formulario(delegacion)
     st.markdown(f"<h5 style='text-align:center;margin:4px 0'>📋 {titulo_compuesto}</h5>", unsafe_allow_html=True)
 
-# ------------------------------------------------------------------------------------------
-# Intro (Página 1)
-# ------------------------------------------------------------------------------------------
-INTRO_COMUNIDAD = (
-    "Con el fin de hacer más segura nuestra comunidad, deseamos concentrarnos en los problemas "
-    "de seguridad más importantes. Queremos trabajar en conjunto con el gobierno local, otras "
-    "instituciones y la comunidad para reducir los delitos y riesgos que afectan a las personas. "
-    "Es importante recordarle que la información que usted nos proporcione es confidencial y se "
-    "utilizará únicamente para mejorar la seguridad en nuestra área."
-)
-
-
-# ------------------------------------------------------------------------------------------
-# Consentimiento informado (Página 2)
-# ------------------------------------------------------------------------------------------
-CONSENTIMIENTO_TITULO = "Consentimiento Informado para la Participación en la Encuesta"
-CONSENT_SI = slugify_name("Sí")
-CONSENT_NO = slugify_name("No")
-
-CONSENTIMIENTO_BLOQUES = [
-    "Usted está siendo invitado(a) a participar de forma libre y voluntaria en una encuesta sobre seguridad, convivencia y percepción ciudadana, dirigida a personas mayores de 18 años.",
-    "El objetivo de esta encuesta es recopilar información de carácter preventivo y estadístico, con el fin de apoyar la planificación de acciones de prevención, mejora de la convivencia y fortalecimiento de la seguridad en comunidades y zonas comerciales.",
-    "La participación es totalmente voluntaria. Usted puede negarse a responder cualquier pregunta, así como retirarse de la encuesta en cualquier momento, sin que ello genere consecuencia alguna.",
-    "De conformidad con lo dispuesto en el artículo 5 de la Ley N.º 8968 (Protección de la Persona frente al Tratamiento de sus Datos Personales), se le informa que:",
-    "Finalidad del tratamiento: La información recopilada será utilizada exclusivamente para fines estadísticos, analíticos y preventivos, y no para investigaciones penales, procesos judiciales, sanciones administrativas ni procedimientos disciplinarios.",
-    "Datos personales: Algunos apartados permiten, de forma voluntaria, el suministro de datos personales o información de contacto.",
-    "Tratamiento de los datos: Los datos serán almacenados, analizados y resguardados bajo criterios de confidencialidad y seguridad, conforme a la normativa vigente.",
-    "Destinatarios y acceso: La información será conocida únicamente por el personal autorizado de la Fuerza Pública / Ministerio de Seguridad Pública, para los fines indicados. No será cedida a terceros ajenos a estos fines.",
-    "Responsable de la base de datos: El Ministerio de Seguridad Pública, a través de la Dirección de Programas Policiales Preventivos, Oficina Estrategia Integral de Prevención para la Seguridad Pública (EIPESP / Estrategia Sembremos Seguridad), será responsable del tratamiento y custodia de la información recolectada.",
-    "Derechos de la persona participante: Usted conserva el derecho a la autodeterminación informativa y a decidir libremente sobre el suministro de sus datos.",
-    "Las respuestas brindadas no constituyen denuncias formales, ni sustituyen los mecanismos legales correspondientes.",
-    "Al continuar con la encuesta, usted manifiesta haber leído y comprendido la información anterior y otorga su consentimiento informado para participar."
-]
-
-INTRO_PERCEPCION_DISTRITO = (
-    "En esta sección le preguntaremos sobre cómo percibe la seguridad en su distrito. "
-    "Las siguientes preguntas buscan conocer su opinión y experiencia sobre la seguridad en el lugar "
-    "donde vive o trabaja, así como en los distintos espacios que forman parte del distrito. "
-    "Nos interesa saber cómo siente y cómo observa la seguridad, cuáles lugares le generan mayor o menor "
-    "tranquilidad y si considera que la situación ha mejorado, empeorado o se mantiene igual. "
-    "Sus respuestas nos ayudarán a identificar qué espacios generan mayor preocupación, entender por qué "
-    "se perciben como inseguros y conocer la forma en que las personas viven la seguridad en su entorno. "
-    "Esta información se utilizará para apoyar el análisis de la situación del distrito y orientar acciones "
-    "de mejora y prevención. No hay respuestas correctas o incorrectas. Le pedimos responder con sinceridad, "
-    "según su experiencia y percepción personal."
-)
-
-INTRO_RIESGOS_III = (
-    "A continuación, en esta sección le preguntaremos sobre situaciones o condiciones que pueden representar "
-    "riesgos para la convivencia y la seguridad en el distrito. "
-    "Estas preguntas no se refieren necesariamente a delitos, sino a situaciones, comportamientos o problemas "
-    "sociales que usted haya observado y que puedan generar preocupación, afectar la tranquilidad o aumentar "
-    "el riesgo de que ocurran hechos de inseguridad. "
-    "Nos interesa conocer qué situaciones están presentes en el distrito, con qué frecuencia se observan y en "
-    "qué espacios se presentan, según su experiencia y percepción. Sus respuestas ayudarán a identificar "
-    "factores de riesgo y a orientar acciones de prevención y atención a nivel local. "
-    "No existen respuestas correctas o incorrectas. Le pedimos responder con sinceridad, de acuerdo con lo que "
-    "ha visto o vivido en su entorno."
-)
-
-INTRO_DELITOS = (
-    "A continuación, se presenta una lista de delitos para que indique aquellos que, según su conocimiento u "
-    "observación, considera que se presentan en el distrito. La información recopilada tiene fines de análisis "
-    "preventivo y territorial, y no constituye una denuncia formal ni la confirmación judicial de hechos delictivos."
-)
-
-INTRO_VICT_VI = (
-    "A continuación, se presentan algunas preguntas relacionadas con situaciones de violencia intrafamiliar, "
-    "con el fin de conocer si usted o algún miembro de su hogar ha sido afectado directamente por este tipo de "
-    "situaciones en el distrito durante los últimos 12 meses. La información recopilada es confidencial y se utiliza "
-    "únicamente con fines de análisis y mejora de las acciones de prevención y atención."
-)
-
-INTRO_VICT_OTROS = (
-    "Las siguientes preguntas se refieren a otros delitos distintos a la violencia intrafamiliar, "
-    "que pudieron haber afectado a usted o a algún miembro de su hogar en el distrito durante los últimos 12 meses. "
-    "Estas preguntas buscan conocer la experiencia directa de victimización, así como aspectos relacionados con la "
-    "denuncia y las características generales del hecho. La información brindada no constituye denuncia formal ni "
-    "confirmación de hechos delictivos."
-)
-
-INTRO_CONFIANZA_POLICIAL = (
-    "A continuación, se presentará una lista de afirmaciones relacionadas con su percepción y confianza "
-    "en el cuerpo de policía que opera en su (Distrito) barrio."
-)
-
-INTRO_PROPUESTAS_CIUDADANAS = (
-    "Las siguientes preguntas tienen como objetivo conocer la percepción ciudadana sobre acciones que podrían "
-    "contribuir a la mejora de la seguridad desde el ámbito local e institucional. La información recolectada no "
-    "constituye una evaluación de la gestión ni implica asignación de competencias o responsabilidades."
-)
 # ------------------------------------------------------------------------------------------
 # Precarga de preguntas (seed)
 # ------------------------------------------------------------------------------------------
 if "seed_cargado" not in st.session_state:
-    v_muy_inseguro = slugify_name("Muy inseguro")
-    v_inseguro = slugify_name("Inseguro")
-
-    # LISTA COMPARTIDA para la matriz (table-list)
-    LISTA_MATRIZ_SEG = "list_matriz_seguridad"
-
-    # Slugs útiles
-    SLUG_SI = slugify_name("Sí")
-    SLUG_NO = slugify_name("No")
-
-    # Escala 1–10 (para confianza / profesionalidad / calidad / satisfacción / contribución)
-    ESCALA_1_10 = [str(i) for i in range(1, 11)]
-
-    seed = [
-        # ---------------- Consentimiento ----------------
-        {"tipo_ui": "Selección única",
-         "label": "¿Acepta participar en esta encuesta?",
-         "name": "consentimiento",
-         "required": True,
-         "opciones": ["Sí", "No"],
-         "appearance": "horizontal",
-         "choice_filter": None,
-         "relevant": None},
-
-        # ---------------- I. DATOS DEMOGRÁFICOS ----------------
-        {"tipo_ui": "Selección única", "label": "1. Cantón:", "name": "canton", "required": True,
-         "opciones": [], "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección única", "label": "2. Distrito:", "name": "distrito", "required": True,
-         "opciones": [], "appearance": None, "choice_filter": "canton_key=${canton}", "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "3. Edad (en años cumplidos): marque una categoría que incluya su edad.",
-         "name": "edad_rango",
-         "required": True,
-         "opciones": ["18 a 29 años", "30 a 44 años", "45 a 64 años", "65 años o más"],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "4. ¿Con cuál de estas opciones se identifica?",
-         "name": "genero",
-         "required": True,
-         "opciones": ["Femenino", "Masculino", "Persona no Binaria", "Prefiero no decir"],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "5. Escolaridad:",
-         "name": "escolaridad",
-         "required": True,
-         "opciones": [
-             "Ninguna",
-             "Primaria incompleta",
-             "Primaria completa",
-             "Secundaria incompleta",
-             "Secundaria completa",
-             "Técnico",
-             "Universitaria incompleta",
-             "Universitaria completa",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "6. ¿Cuál es su relación con la zona?",
-         "name": "relacion_zona",
-         "required": True,
-         "opciones": ["Vivo en la zona", "Trabajo en la zona", "Visito la zona", "Estudio en la zona"],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        # ---------------- II. PERCEPCIÓN CIUDADANA (7–11) ----------------
-        {"tipo_ui": "Selección única",
-         "label": "7. ¿Qué tan seguro percibe usted el distrito donde reside o transita?",
-         "name": "percep_seg_distrito",
-         "required": True,
-         "opciones": ["Muy inseguro", "Inseguro", "Ni seguro ni inseguro", "Seguro", "Muy seguro"],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "7.1. Indique por qué considera el distrito inseguro (Marque todas las situaciones que usted percibe que ocurren con mayor frecuencia en su comunidad):",
-         "name": "motivos_inseguridad_distrito",
-         "required": True,
-         "opciones": [
-             "Venta o distribución de drogas",
-             "Consumo de drogas en espacios públicos",
-             "Consumo de alcohol en espacios públicos",
-             "Riñas o peleas frecuentes",
-             "Asaltos o robos a personas",
-             "Robos a viviendas o comercios",
-             "Amenazas y extorsiones",
-             "Balaceras, detonaciones o ruidos similares",
-             "Presencia de grupos que generan temor",
-             "Vandalismo o daños intencionales",
-             "Poca iluminación en calles o espacios públicos",
-             "Lotes baldíos o abandonados",
-             "Casas o edificios abandonados",
-             "Calles en mal estado",
-             "Falta de limpieza o acumulación de basura",
-             "Paradas de bus inseguras",
-             "Falta de cámaras de seguridad",
-             "Comercios inseguros o sin control",
-             "Daños frecuentes a la propiedad",
-             "Presencia de personas en situación de calle que influye en su percepción de seguridad",
-             "Presencia de personas en situación de ocio (sin actividad laboral o educativa)",
-             "Ventas informales (ambulantes)",
-             "Zona donde se ejerce prostitución",
-             "Problemas con transporte informal",
-             "Falta de patrullajes visibles",
-             "Falta de presencia policial en la zona",
-             "Situaciones de violencia intrafamiliar",
-             "Situaciones de violencia de género",
-             "Otro problema que considere importante",
-         ],
-         "appearance": None,
-         "choice_filter": None,
-         "relevant": xlsform_or_expr([
-             f"${{percep_seg_distrito}}='{v_muy_inseguro}'",
-             f"${{percep_seg_distrito}}='{v_inseguro}'"
-         ])},
-
-        {"tipo_ui": "Párrafo (texto largo)",
-         "label": "Indique cuál es ese otro problema importante:",
-         "name": "otro_problema_inseg_distrito",
-         "required": True,
-         "opciones": [],
-         "appearance": None,
-         "choice_filter": None,
-         "relevant": f"selected(${{motivos_inseguridad_distrito}}, '{slugify_name('Otro problema que considere importante')}')"},
-
-        {"tipo_ui": "Selección única",
-         "label": "8. En comparación con los 12 meses anteriores, ¿cómo percibe que ha cambiado la seguridad en este distrito?",
-         "name": "cambio_seguridad_12m",
-         "required": True,
-         "opciones": ["Mucho menos seguro (1)", "Menos seguro (2)", "Se mantiene igual (3)", "Más seguro (4)", "Mucho más seguro (5)"],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Párrafo (texto largo)",
-         "label": "8.1. Indique por qué (explique brevemente la razón de su respuesta anterior):",
-         "name": "motivo_cambio_12m",
-         "required": True,
-         "opciones": [],
-         "appearance": None, "choice_filter": None, "relevant": "string-length(${cambio_seguridad_12m})>0"},
-
-        # 9. MATRIZ (todas comparten list_override = LISTA_MATRIZ_SEG)
-        {"tipo_ui": "Selección única", "label": "Discotecas, bares, sitios de entretenimiento", "name": "seg_discotecas_bares",
-         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
-         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
-
-        {"tipo_ui": "Selección única", "label": "Espacios recreativos (parques, play, plaza de deportes)", "name": "seg_espacios_recreativos",
-         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
-         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
-
-        {"tipo_ui": "Selección única", "label": "Lugar de residencia (casa de habitación)", "name": "seg_lugar_residencia",
-         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
-         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
-
-        {"tipo_ui": "Selección única", "label": "Paradas y/o estaciones de buses, taxis, trenes", "name": "seg_paradas_estaciones",
-         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
-         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
-
-        {"tipo_ui": "Selección única", "label": "Puentes peatonales", "name": "seg_puentes_peatonales",
-         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
-         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
-
-        {"tipo_ui": "Selección única", "label": "Transporte público", "name": "seg_transporte_publico",
-         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
-         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
-
-        {"tipo_ui": "Selección única", "label": "Zona bancaria", "name": "seg_zona_bancaria",
-         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
-         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
-
-        {"tipo_ui": "Selección única", "label": "Zona de comercio", "name": "seg_zona_comercio",
-         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
-         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
-
-        {"tipo_ui": "Selección única", "label": "Zonas residenciales (calles y barrios, distinto a su casa)", "name": "seg_zonas_residenciales",
-         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
-         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
-
-        {"tipo_ui": "Selección única", "label": "Zonas francas", "name": "seg_zonas_francas",
-         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
-         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
-
-        {"tipo_ui": "Selección única", "label": "Lugares de interés turístico", "name": "seg_lugares_turisticos",
-         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
-         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
-
-        {"tipo_ui": "Selección única", "label": "Centros educativos", "name": "seg_centros_educativos",
-         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
-         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
-
-        {"tipo_ui": "Selección única",
-         "label": "10. Desde su percepción ¿cuál considera que es el principal foco de inseguridad en el distrito?",
-         "name": "foco_inseguridad",
-         "required": True,
-         "opciones": [
-             "Discotecas, bares, sitios de entretenimiento",
-             "Espacios recreativos (parques, play, plaza de deportes)",
-             "Lugar de residencia (casa de habitación)",
-             "Paradas y/o estaciones de buses, taxis, trenes",
-             "Puentes peatonales",
-             "Transporte público",
-             "Zona bancaria",
-             "Zona comercial",
-             "Zonas francas",
-             "Zonas residenciales (calles y barrios, distinto a su casa)",
-             "Lugares de interés turístico",
-             "Centros educativos",
-             "Otros",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Texto (corto)",
-         "label": "Indique cuál es ese otro foco de inseguridad:",
-         "name": "foco_inseguridad_otro",
-         "required": True,
-         "opciones": [],
-         "appearance": None, "choice_filter": None, "relevant": f"${{foco_inseguridad}}='{slugify_name('Otros')}'"},
-
-        {"tipo_ui": "Párrafo (texto largo)",
-         "label": "11. Describa brevemente las razones por las cuales considera inseguro el tipo de espacio seleccionado en la pregunta anterior:",
-         "name": "razones_foco_inseguridad",
-         "required": True,
-         "opciones": [],
-         "appearance": None, "choice_filter": None, "relevant": "string-length(${foco_inseguridad})>0"},
-
-        # ---------------- III. RIESGOS (12–17) ----------------
-        {"tipo_ui": "Selección múltiple",
-         "label": "12. Según su conocimiento u observación, seleccione las problemáticas que afectan su distrito:",
-         "name": "problematicas_distrito",
-         "required": True,
-         "opciones": [
-             "Problemas vecinales o conflictos entre vecinos",
-             "Presencia de personas en situación de calle (personas que viven permanentemente en la vía pública)",
-             "Zona donde se ejerce prostitución",
-             "Desvinculación escolar (deserción escolar)",
-             "Falta de oportunidades laborales",
-             "Acumulación de basura, aguas negras o mal alcantarillado",
-             "Carencia o inexistencia de alumbrado público",
-             "Lotes baldíos",
-             "Cuarterías",
-             "Asentamientos informales o precarios",
-             "Pérdida de espacios públicos (parques, polideportivos u otros)",
-             "Consumo de alcohol en vía pública",
-             "Consumo de drogas en espacios públicos",
-             "Ventas informales (ambulantes)",
-             "Escándalos musicales o ruidos excesivos",
-             "Otro problema que considere importante",
-             "No se observan estas problemáticas en el distrito",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Párrafo (texto largo)",
-         "label": "Indique cuál es ese otro problema importante:",
-         "name": "problematicas_otro",
-         "required": True,
-         "opciones": [],
-         "appearance": None, "choice_filter": None,
-         "relevant": f"selected(${{problematicas_distrito}}, '{slugify_name('Otro problema que considere importante')}')"},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "13. En relación con la oferta de servicios y oportunidades en su distrito (Inversión social), indique cuáles de las siguientes carencias identifica:",
-         "name": "carencias_inversion_social",
-         "required": True,
-         "opciones": [
-             "Falta de oferta educativa",
-             "Falta de oferta deportiva",
-             "Falta de oferta recreativa",
-             "Falta de actividades culturales",
-             "No se observan carencias",
-             "Otro problema que considere importante",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Párrafo (texto largo)",
-         "label": "Indique cuál es esa otra carencia importante:",
-         "name": "carencias_inversion_social_otro",
-         "required": True,
-         "opciones": [],
-         "appearance": None, "choice_filter": None,
-         "relevant": f"selected(${{carencias_inversion_social}}, '{slugify_name('Otro problema que considere importante')}')"},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "14. En los casos en que se observa consumo de drogas en el distrito, indique dónde ocurre:",
-         "name": "consumo_drogas_donde",
-         "required": True,
-         "opciones": [
-             "Áreas públicas (calles, parques, paradas, espacios abiertos)",
-             "Áreas privadas (viviendas, locales, espacios cerrados)",
-             "No se observa consumo de drogas",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "15. Indique las principales deficiencias de infraestructura vial que afectan su distrito:",
-         "name": "infra_vial_deficiencias",
-         "required": True,
-         "opciones": [
-             "Calles en mal estado",
-             "Falta de señalización de tránsito",
-             "Carencia o inexistencia de aceras",
-             "No se observan dificiencias de infraestructura",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "16. Según su conocimiento u observación, indique en qué tipo de espacios se identifica la existencia de puntos de venta de drogas en el distrito:",
-         "name": "puntos_venta_drogas",
-         "required": True,
-         "opciones": [
-             "Casa de habitación (espacio cerrado)",
-             "Edificación abandonada",
-             "Lote baldío",
-             "Otro tipo de espacio",
-             "No se observa",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Texto (corto)",
-         "label": "Indique cuál es ese otro tipo de espacio:",
-         "name": "puntos_venta_drogas_otro",
-         "required": True,
-         "opciones": [],
-         "appearance": None, "choice_filter": None,
-         "relevant": f"selected(${{puntos_venta_drogas}}, '{slugify_name('Otro tipo de espacio')}')"},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "17. Según su conocimiento u observación, indique si ha identificado situaciones de inseguridad asociadas al uso de los siguientes medios o modalidades de transporte en su distrito:",
-         "name": "inseguridad_transporte",
-         "required": True,
-         "opciones": [
-             "Transporte informal o no autorizado (taxis piratas)",
-             "Plataformas de transporte digital",
-             "Transporte público (buses)",
-             "Servicios de reparto o mensajería “exprés” (por ejemplo, repartidores en motocicleta o bicimoto)",
-             "Otro tipo de situación relacionada con el transporte",
-             "No se observa",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Texto (corto)",
-         "label": "Indique cuál es ese otro tipo de situación relacionada con el transporte:",
-         "name": "inseguridad_transporte_otro",
-         "required": True,
-         "opciones": [],
-         "appearance": None, "choice_filter": None,
-         "relevant": f"selected(${{inseguridad_transporte}}, '{slugify_name('Otro tipo de situación relacionada con el transporte')}')"},
-
-        # ---------------- Delitos (18–28) ----------------
-        {"tipo_ui": "Selección múltiple",
-         "label": "18. Seleccione los delitos que, según su conocimiento u observación, se presentan en el distrito:",
-         "name": "delitos_lista",
-         "required": True,
-         "opciones": [
-             "Disturbios en vía pública (riñas o agresiones)",
-             "Daños a la propiedad (viviendas, comercios, vehículos u otros bienes)",
-             "Daños al poliducto (perforaciones, tomas ilegales o vandalismo)",
-             "Extorsión (amenazas o intimidación para exigir dinero u otros beneficios)",
-             "Hurto (sustracción de artículos mediante el descuido)",
-             "Compra o venta de artículos robados (receptación)",
-             "Contrabando (licor, cigarrillos, medicinas, ropa, calzado, etc.)",
-             "Maltrato animal",
-             "Tráfico de personas (coyotaje)",
-             "Otro delito",
-             "No se observan delitos",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Texto (corto)",
-         "label": "Indique cuál es ese otro delito:",
-         "name": "delitos_otro",
-         "required": True,
-         "opciones": [],
-         "appearance": None, "choice_filter": None,
-         "relevant": f"selected(${{delitos_lista}}, '{slugify_name('Otro delito')}')"},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "19. Según su conocimiento u observación, ¿de qué forma se presenta la venta de drogas en el distrito?",
-         "name": "venta_drogas_forma",
-         "required": True,
-         "opciones": [
-             "En espacios cerrados (casas, edificaciones u otros inmuebles)",
-             "En vía pública",
-             "De forma ocasional o móvil (sin punto fijo)",
-             "No se observa venta de drogas",
-             "Otro",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Texto (corto)",
-         "label": "Indique cuál es ese otro modo de venta de drogas:",
-         "name": "venta_drogas_forma_otro",
-         "required": True,
-         "opciones": [],
-         "appearance": None, "choice_filter": None,
-         "relevant": f"selected(${{venta_drogas_forma}}, '{slugify_name('Otro')}')"},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "20. Delitos contra la vida",
-         "name": "delitos_vida",
-         "required": True,
-         "opciones": [
-             "Homicidios (muerte intencional de una persona)",
-             "Personas heridas de forma intencional (heridos)",
-             "Femicide (homicidio de una mujer por razones de género)",
-             "No se observan delitos contra la vida",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "21. Delitos sexuales",
-         "name": "delitos_sexuales",
-         "required": True,
-         "opciones": [
-             "Abuso sexual (tocamientos u otros actos sexuales sin consentimiento)",
-             "Violación (acceso sexual sin consentimiento)",
-             "Acoso sexual (insinuaciones, solicitudes o conductas sexuales no deseadas)",
-             "Acoso callejero (comentarios, gestos o conductas sexuales en espacios públicos)",
-             "No se observan delitos sexuales",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "22. Asaltos",
-         "name": "asaltos",
-         "required": True,
-         "opciones": [
-             "Asalto a personas",
-             "Asalto a comercio",
-             "Asalto a vivienda",
-             "Asalto a transporte público",
-             "No se observan asaltos",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "23. Estafas",
-         "name": "estafas",
-         "required": True,
-         "opciones": [
-             "Billetes falsos",
-             "Documentos falsos",
-             "Estafas relacionadas con la compra o venta de oro",
-             "Lotería falsa",
-             "Estafas informáticas (por internet, redes sociales o correos electrónicos)",
-             "Estafas telefónicas",
-             "Estafas con tarjetas (clonación, cargos no autorizados)",
-             "No se observan estafas",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "24. Robo (Sustracción de artículos mediante la utilización de la fuerza)",
-         "name": "robos",
-         "required": True,
-         "opciones": [
-             "Robo a comercios",
-             "Robo a edificaciones",
-             "Robo a viviendas",
-             "Robo de vehículos completos",
-             "Robo a vehículos (tacha)",
-             "Robo de ganado (destace)",
-             "Robo de bienes agrícolas",
-             "Robo de cultivos",
-             "Robo de cable",
-             "No se observan robos",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "25. Abandono de personas",
-         "name": "abandono",
-         "required": True,
-         "opciones": [
-             "Abandono de adulto mayor",
-             "Abandono de menor de edad",
-             "Abandono de incapaz",
-             "No se observan situaciones de abandono",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "26. Explotación infantil",
-         "name": "explotacion_infantil",
-         "required": True,
-         "opciones": [
-             "Sexual",
-             "Laboral",
-             "No se observan",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "27. Delitos ambientales",
-         "name": "delitos_ambientales",
-         "required": True,
-         "opciones": [
-             "Caza ilegal",
-             "Pesca ilegal",
-             "Tala ilegal",
-             "Extracción ilegal de material minero",
-             "No se observan delitos ambientales",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "28. Trata de personas",
-         "name": "trata_personas",
-         "required": True,
-         "opciones": [
-             "Con fines laborales",
-             "Con fines sexuales",
-             "No se observan situaciones de trata de personas",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        # ---------------- Victimización — Apartado A: Violencia intrafamiliar (29–29.3) ----------------
-        {"tipo_ui": "Selección única",
-         "label": "29. Durante los últimos 12 meses, ¿usted o algún miembro de su hogar ha sido afectado por alguna situación de violencia intrafamiliar (violencia doméstica)?",
-         "name": "vi_12m",
-         "required": True,
-         "opciones": ["Sí", "No"],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "29.1. ¿Qué tipo(s) de violencia intrafamiliar (violencia doméstica) se presentaron?",
-         "name": "vi_tipos",
-         "required": True,
-         "opciones": [
-             "Violencia psicológica (gritos, amenazas, humillaciones, maltratos, entre otros)",
-             "Violencia física (agresiones físicas, empujones, golpes, entre otros)",
-             "Violencia vicaria (uso de hijas, hijos u otras personas para causar daño emocional)",
-             "Violencia patrimonial (destrucción, retención o control de bienes, documentos o dinero)",
-             "Violencia sexual (actos de carácter sexual sin consentimiento)",
-         ],
-         "appearance": None, "choice_filter": None, "relevant": f"${{vi_12m}}='{SLUG_SI}'"},
-
-        {"tipo_ui": "Selección única",
-        "label": "29.2 ¿En relación con la situación de violencia intrafamiliar indicada anteriormente, usted o algún miembro de su hogar solicitó medidas de protección?",
-        "name": "vi_medidas_proteccion",
-        "required": True,
-        "opciones": ["Sí", "No", "No recuerda"],
-        "appearance": None,
-        "choice_filter": None,
-        "relevant": f"${{vi_12m}}='{SLUG_SI}'"},
-
-        {"tipo_ui": "Selección única",
-        "label": "29.3. En caso de haber existido intervención de la Fuerza Pública, ¿Cómo valora el abordaje brindado?",
-        "name": "vi_valoracion_fp",
-        "required": True,
-        "opciones": ["Excelente", "Bueno", "Regular", "Malo", "Muy malo","No hubo intervención de la Fuerza Pública / No aplica "],
-        "appearance": None,
-        "choice_filter": None,
-        "relevant": f"${{vi_12m}}='{SLUG_SI}' and ${{vi_medidas_proteccion}}='{SLUG_SI}'"},
-
-
-        # ---------------- Victimización — Apartado B: Otros delitos (30–30.4) ----------------
-        {"tipo_ui": "Selección única",
-         "label": "30. Durante los últimos 12 meses, ¿usted o algún miembro de su hogar fue afectado por algún delito?",
-         "name": "vict_delito_12m",
-         "required": True,
-         "opciones": ["NO", "Sí, y denuncié", "Sí, pero no denuncié"],
-         "appearance": None, "choice_filter": None, "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": (
-             "30.1 ¿Cuál de las siguientes situaciones afectó a usted o a algún miembro de su hogar?\n\n"
-             "A. Robo y Asalto (Violencia y fuerza)\n\n"
-             "Seleccione las opciones que correspondan:"
-         ),
-         "name": "vict_301_robo_asalto",
-         "required": True,
-         "opciones": [
-             "Asalto a mano armada (amenaza con arma o uso de violencia) en la calle o espacio público.",
-             "Asalto en transporte público (bus, taxi, metro, etc.).",
-             "Asalto o robo de su vehículo (coche, motocicleta, etc.).",
-             "Robo de accesorios o partes de su vehículo (espejos, llantas, radio).",
-             "Robo o intento de robo con fuerza a su vivienda (ej. forzar una puerta o ventana).",
-             "Robo o intento de robo con fuerza a su comercio o negocio.",
-             "No aplica",
-         ],
-         "appearance": "columns", "choice_filter": None,
-         "relevant": f"${{vict_delito_12m}}!='{slugify_name('NO')}'"},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "30.1 B. Hurto y Daños (Sin violencia directa). Seleccione las opciones que correspondan:",
-         "name": "vict_301_hurto_danos",
-         "required": True,
-         "opciones": [
-             "Hurto de su cartera, bolso o celular (sin que se diera cuenta, por descuido).",
-             "Daños a su propiedad (ej. grafitis, rotura de cristales, destrucción de cercas).",
-             "Receptación (Alguien en su hogar compró o recibió un artículo que luego supo que era robado).",
-             "Pérdida de artículos (celular, bicicleta, etc.) por descuido.",
-             "No aplica",
-         ],
-         "appearance": "columns", "choice_filter": None,
-         "relevant": f"${{vict_delito_12m}}!='{slugify_name('NO')}'"},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "30.1 C. Fraude y Engaño (Estafas). Seleccione las opciones que correspondan:",
-         "name": "vict_301_estafas",
-         "required": True,
-         "opciones": [
-             "Estafa telefónica (ej. llamadas para pedir dinero o datos personales).",
-             "Estafa o fraude informático (ej. a través de internet, redes sociales o correo electrónico).",
-             "Fraude con tarjetas bancarias (clonación o uso no autorizado).",
-             "Ser víctima de billetes o documentos falsos.",
-             "No aplica",
-         ],
-         "appearance": "columns", "choice_filter": None,
-         "relevant": f"${{vict_delito_12m}}!='{slugify_name('NO')}'"},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "30.1 D. Otros delitos y problemas personales. Seleccione las opciones que correspondan:",
-         "name": "vict_301_otros",
-         "required": True,
-         "opciones": [
-             "Extorsión (intimidación o amenaza para obtener dinero u otro beneficio).",
-             "Maltrato animal (si usted o alguien de su hogar fue testigo o su mascota fue la víctima).",
-             "Acoso o intimidación sexual en un espacio público.",
-             "Algún tipo de delito sexual (abuso, violación).",
-             "Lesiones personales (haber sido herido en una riña o agresión).",
-             "No aplica",
-             "Otro.",
-         ],
-         "appearance": "columns", "choice_filter": None,
-         "relevant": f"${{vict_delito_12m}}!='{slugify_name('NO')}'"},
-
-        {"tipo_ui": "Párrafo (texto largo)",
-         "label": "30.1 Indique cuál fue ese otro delito o situación:",
-         "name": "vict_301_otros_detalle",
-         "required": True,
-         "opciones": [],
-         "appearance": "multiline",
-         "choice_filter": None,
-         "relevant": f"selected(${{vict_301_otros}}, '{slugify_name('Otro.')}')"},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "30.2 En caso de NO haber realizado la denuncia, indique ¿cuál o cuáles fueron el motivo?",
-         "name": "vict_302_motivos_no_denuncia",
-         "required": True,
-         "opciones": [
-             "Distancia o dificultad de acceso a oficinas para denunciar",
-             "Miedo a represalias.",
-             "Falta de respuesta o seguimiento en denuncias anteriores",
-             "Complejidad o dificultad para realizar la denuncia (trámites, requisitos, tiempo)",
-             "Desconocimiento de dónde colocar la denuncia (falta de información)",
-             "El Policía me dijo que era mejor no denunciar.",
-             "Falta de tiempo para colocar la denuncia",
-             "Desconfianza en las autoridades o en el proceso de denuncia",
-             "Otro motivo:",
-         ],
-         "appearance": None, "choice_filter": None,
-         "relevant": f"${{vict_delito_12m}}='{slugify_name('Sí, pero no denuncié')}'"},
-
-        {"tipo_ui": "Párrafo (texto largo)",
-         "label": "Indique cuál fue ese otro motivo:",
-         "name": "vict_302_motivos_no_denuncia_otro",
-         "required": True,
-         "opciones": [],
-         "appearance": "multiline",
-         "choice_filter": None,
-         "relevant": f"selected(${{vict_302_motivos_no_denuncia}}, '{slugify_name('Otro motivo:')}')"},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "30.3 ¿Tiene conocimiento sobre el horario en el cual se presentó el hecho o situación que le afectó a usted o un familiar?",
-         "name": "vict_303_horario",
-         "required": True,
-         "opciones": [
-             "00:00 – 02:59 (madrugada)",
-             "03:00 – 05:59 (madrugada)",
-             "06:00 – 08:59 (mañana)",
-             "09:00 – 11:59 (mañana)",
-             "12:00 – 14:59 (mediodía / tarde)",
-             "15:00 – 17:59 (tarde)",
-             "18:00 – 20:59 (noche)",
-             "21:00 – 23:59 (noche)",
-             "Desconocido",
-         ],
-         "appearance": "columns", "choice_filter": None,
-         "relevant": f"${{vict_delito_12m}}!='{slugify_name('NO')}'"},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "30.4 ¿Cuál fue la forma o modo en que ocurrió la situación que afectó a usted o a algún miembro de su hogar?",
-         "name": "vict_304_modo",
-         "required": True,
-         "opciones": [
-             "Arma blanca (cuchillo, machete, tijeras).",
-             "Arma de fuego.",
-             "Amenazas o intimidación",
-             "Arrebato (le quitaron un objeto de forma rápida o sorpresiva)",
-             "Boquete (ingreso mediante apertura de huecos en paredes, techos o estructuras)",
-             "Ganzúa (pata de chancho, llaves falsas u objetos similares)",
-             "Engaño (mediante mentiras, falsas ofertas o distracción)",
-             "Escalamiento (ingreso trepando muros, rejas o techos)",
-             "Otro.",
-             "No sabe / No recuerda",
-         ],
-         "appearance": "columns", "choice_filter": None,
-         "relevant": f"${{vict_delito_12m}}!='{slugify_name('NO')}'"},
-
-        {"tipo_ui": "Párrafo (texto largo)",
-         "label": "30.4.1 Indique cuál fue ese otro modo:",
-         "name": "vict_304_modo_otro",
-         "required": True,
-         "opciones": [],
-         "appearance": "multiline",
-         "choice_filter": None,
-         "relevant": f"selected(${{vict_304_modo}}, '{slugify_name('Otro.')}')"},
-
-        # ---------------- Confianza Policial (31–41) ----------------
-        {"tipo_ui": "Selección única",
-         "label": "31. ¿Identifica usted a los policías de la Fuerza Pública de Costa Rica en su comunidad?",
-         "name": "identifica_policias",
-         "required": True,
-         "opciones": ["Sí", "No"],
-         "appearance": "horizontal",
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "31.1 ¿Cuáles de los siguientes tipos de atención ha tenido?",
-         "name": "tipos_atencion",
-         "required": True,
-         "opciones": [
-             "Solicitud de ayuda o auxilio.",
-             "Atención relacionada con una denuncia.",
-             "Atención cordial o preventiva durante un patrullaje.",
-             "Fui abordado o registrado para identificación.",
-             "Fui objeto de una infracción o conflicto.",
-             "Evento preventivos (Cívico policial, Reunión Comunitaria)",
-             "Otra (especifique):",
-         ],
-         "appearance": None,
-         "choice_filter": None,
-         "relevant": f"${{identifica_policias}}='{SLUG_SI}'"},
-
-        {"tipo_ui": "Texto (corto)",
-         "label": "Indique cuál es esa otra atención:",
-         "name": "tipos_atencion_otro",
-         "required": True,
-         "opciones": [],
-         "appearance": None,
-         "choice_filter": None,
-         "relevant": f"selected(${{tipos_atencion}}, '{slugify_name('Otra (especifique):')}')"},
-
-        {"tipo_ui": "Selección única",
-         "label": "32. ¿Cuál es el nivel de confianza en la policía de la Fuerza Pública de Costa Rica de su comunidad?\nEscala de 1 a 10 (1=Ninguna Confianza, 10=Mucha Confianza)",
-         "name": "nivel_confianza_policia",
-         "required": True,
-         "opciones": ESCALA_1_10,
-         "appearance": "horizontal",
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "33. En una escala del 1 al 10, donde 1 es “Nada profesional” y 10 es “Muy profesional”, ¿cómo calificaría la profesionalidad de la Fuerza Pública en su distrito?",
-         "name": "profesionalidad_fp",
-         "required": True,
-         "opciones": ESCALA_1_10,
-         "appearance": "horizontal",
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "34. En una escala del 1 al 10, donde 1 es “Muy mala” y 10 es “Muy buena”, ¿cómo califica la calidad del servicio policial en su distrito?",
-         "name": "calidad_servicio_policial",
-         "required": True,
-         "opciones": ESCALA_1_10,
-         "appearance": "horizontal",
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "35. En una escala del 1 al 10, donde 1 es “Nada satisfecho(a)” y 10 es “Muy satisfecho(a)”, ¿qué tan satisfecho(a) está con el trabajo preventivo que realiza la Fuerza Pública en su distrito?",
-         "name": "satisfaccion_trabajo_preventivo",
-         "required": True,
-         "opciones": ESCALA_1_10,
-         "appearance": "horizontal",
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "36. En una escala del 1 al 10, donde 1 es “No contribuye en nada” y 10 es “Contribuye muchísimo”, indique: ¿En qué medida considera que la presencia policial ayuda a reducir el crimen en su distrito?",
-         "name": "contribucion_presencia_policial",
-         "required": True,
-         "opciones": ESCALA_1_10,
-         "appearance": "horizontal",
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "37. ¿Con qué frecuencia observa presencia policial en su distrito?",
-         "name": "frecuencia_presencia_policial",
-         "required": True,
-         "opciones": ["Todos los días", "Varias veces por semana", "Una vez por semana", "Casi nunca", "Nunca"],
-         "appearance": None,
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "38. ¿Considera que la presencia policial es consistente a lo largo del día en su distrito?",
-         "name": "presencia_consistente_dia",
-         "required": True,
-         "opciones": ["Sí", "No", "A veces"],
-         "appearance": "horizontal",
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "39. ¿Considera que la policía trata a las personas de manera justa e imparcial en su distrito?",
-         "name": "trato_justo_imparcial",
-         "required": True,
-         "opciones": ["Sí", "No", "A veces"],
-         "appearance": "horizontal",
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "40. ¿Cree usted que puede expresar preocupaciones o quejas a la policía sin temor a represalias?",
-         "name": "expresar_quejas_sin_temor",
-         "required": True,
-         "opciones": ["Sí", "No", "No estoy seguro(a)"],
-         "appearance": "horizontal",
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Selección única",
-         "label": "41. ¿Considera que la policía proporciona información veraz, clara y oportuna a la comunidad?",
-         "name": "info_veraz_clara_oportuna",
-         "required": True,
-         "opciones": ["Sí", "No", "A veces"],
-         "appearance": "horizontal",
-         "choice_filter": None,
-         "relevant": None},
-
-        # ---------------- Propuestas ciudadanas para la mejora de la seguridad (42–46) ----------------
-        {"tipo_ui": "Selección múltiple",
-         "label": "42. ¿Qué actividad considera que deba realizar la Fuerza Pública para mejorar la seguridad en su comunidad?",
-         "name": "propuestas_fp",
-         "required": True,
-         "opciones": [
-             "Mayor presencia policial y patrullaje",
-             "Acciones disuasivas en puntos conflictivos",
-             "Acciones contra consumo y venta de drogas",
-             "Mejorar el servicio policial a la comunidad",
-             "Acercamiento comunitario y comercial",
-             "Actividades de prevención y educación",
-             "Coordinación interinstitucional",
-             "Integridad y credibilidad policial",
-             "Otro:",
-             "No tiene una opinión al respecto",
-         ],
-         "appearance": None,
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Texto (corto)",
-         "label": "Indique cuál es ese otro aporte para Fuerza Pública:",
-         "name": "propuestas_fp_otro",
-         "required": True,
-         "opciones": [],
-         "appearance": None,
-         "choice_filter": None,
-         "relevant": f"selected(${{propuestas_fp}}, '{slugify_name('Otro:')}')"},
-
-        {"tipo_ui": "Selección múltiple",
-         "label": "43. ¿Qué actividad considera que deba realizar la municipalidad para mejorar la seguridad en su comunidad?",
-         "name": "propuestas_muni",
-         "required": True,
-         "opciones": [
-             "Mantenimiento e iluminación del espacio público",
-             "Limpieza y ordenamiento urbano",
-             "Instalación de cámaras y seguridad municipal",
-             "Control del comercio informal y transporte",
-             "Creación y mejoramiento de espacios públicos",
-             "Desarrollo social y generación de empleo",
-             "Coordinación interinstitucional",
-             "Acercamiento municipal a comercio y comunidad",
-             "Otro:",
-             "No tiene una opinión al respecto",
-         ],
-         "appearance": None,
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Texto (corto)",
-         "label": "Indique cuál es ese otro aporte para municipalidad:",
-         "name": "propuestas_muni_otro",
-         "required": True,
-         "opciones": [],
-         "appearance": None,
-         "choice_filter": None,
-         "relevant": f"selected(${{propuestas_muni}}, '{slugify_name('Otro:')}')"},
-
-        {"tipo_ui": "Selección única",
-         "label": "44. ¿Usted tiene información de alguna persona o grupo que se dedique a realizar algún delito en su comunidad?",
-         "name": "info_persona_grupo_delito",
-         "required": True,
-         "opciones": ["Sí", "No"],
-         "appearance": "horizontal",
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Párrafo (texto largo)",
-         "label": "44.1. Si su respuesta es “Sí”, describa aquellas características que pueda aportar tales como nombre de estructura o banda criminal… (nombre de personas, alias, domicilio, vehículos, etc.)",
-         "name": "info_persona_grupo_delito_detalle",
-         "required": True,
-         "opciones": [],
-         "appearance": None,
-         "choice_filter": None,
-         "relevant": f"${{info_persona_grupo_delito}}='{SLUG_SI}'"},
-
-        {"tipo_ui": "Párrafo (texto largo)",
-         "label": "45. En el siguiente espacio de forma voluntaria podrá anotar su nombre, teléfono o correo electrónico en el cual desee ser contactado y continuar colaborando de forma confidencial con Fuerza Pública.",
-         "name": "contacto_voluntario",
-         "required": False,
-         "opciones": [],
-         "appearance": "multiline",
-         "choice_filter": None,
-         "relevant": None},
-
-        {"tipo_ui": "Párrafo (texto largo)",
-         "label": "46. En el siguiente espacio podrá registrar alguna otra información que estime pertinente.",
-         "name": "info_adicional_final",
-         "required": False,
-         "opciones": [],
-         "appearance": "multiline",
-         "choice_filter": None,
-         "relevant": None},
-    ]
-
-    # ✅ asegurar qid estable en todo el seed
-    st.session_state.preguntas = [ensure_qid(q) for q in seed]
+    # Plantilla compartida (qid fijo): la sesión solo guarda referencias hasta que edita una pregunta
+    _set_preguntas(list(plantilla_seed()))
     st.session_state.seed_cargado = True
 
-# ✅ Asegurar qid también si ya existían preguntas en session_state (por ejemplo al recargar)
-st.session_state.preguntas = [ensure_qid(q) for q in st.session_state.preguntas]
+# ✅ Asegurar qid + índices también si ya existían preguntas en session_state (por ejemplo al recargar)
+if not _indices_preguntas_ok():
+    _set_preguntas(st.session_state.preguntas)
 # ------------------------------------------------------------------------------------------
 # Sidebar: Metadatos + Exportar/Importar proyecto
 # ------------------------------------------------------------------------------------------
@@ -1363,7 +355,7 @@ with st.sidebar:
     st.header("⚙️ Configuración")
     form_title = st.text_input(
         "Título del formulario",
-        value=(f"Encuesta comunidad – {delegacion.strip()}" if delegacion.strip() else "Encuesta comunidad"),
+        value=titulo_formulario(delegacion),
         key="sb_form_title"
     )
     idioma = st.selectbox("Idioma por defecto (default_language)", options=["es", "en"], index=0, key="sb_idioma")
@@ -1371,54 +363,138 @@ with st.sidebar:
     version = st.text_input("Versión (settings.version)", value=version_auto, key="sb_version")
 
     st.markdown("---")
-    st.caption("💾 Exporta/Importa tu proyecto (JSON)")
+    st.caption("💾 Exporta/Importa tu proyecto (JSON), o importa un XLSForm (.xlsx) o el Formato de encuesta (.docx)")
     col_exp, col_imp = st.columns(2)
 
+    comprimir = col_exp.checkbox("Comprimir (.json.gz)", value=False, key="chk_export_gz")
     if col_exp.button("Exportar proyecto (JSON)", use_container_width=True, key="btn_export_json"):
-        proj = {
-            "form_title": form_title,
-            "idioma": idioma,
-            "version": version,
-            "preguntas": st.session_state.preguntas,  # incluye qid
-            "reglas_visibilidad": st.session_state.reglas_visibilidad,
-            "reglas_finalizar": st.session_state.reglas_finalizar,
-            "choices_ext_rows": st.session_state.choices_ext_rows,
-            "choices_extra_cols": list(st.session_state.choices_extra_cols),
-            "textos_fijos": st.session_state.textos_fijos,
-        }
-        jbuf = BytesIO(json.dumps(proj, ensure_ascii=False, indent=2).encode("utf-8"))
+        proj = proyecto_a_dict(st.session_state, form_title, idioma, version, logo_media_name=logo_media_name)
+        # Formato versionado y compacto (opciones y etiquetas del catálogo sin repetir)
         st.download_button(
             "Descargar JSON",
-            data=jbuf,
-            file_name="proyecto_encuesta.json",
-            mime="application/json",
+            data=proyecto_a_archivo(proj, comprimir=comprimir),
+            file_name="proyecto_encuesta.json.gz" if comprimir else "proyecto_encuesta.json",
+            mime="application/gzip" if comprimir else "application/json",
             use_container_width=True
         )
 
-    up = col_imp.file_uploader("Importar JSON", type=["json"], label_visibility="collapsed", key="uploader_json")
-    if up is not None:
+    up = col_imp.file_uploader("Importar JSON / XLSForm / Word", type=["json", "gz", "xlsx", "docx"], label_visibility="collapsed",
+                               key="uploader_json")
+    # El archivo queda en el uploader entre reruns: se importa una sola vez por archivo subido
+    if up is not None and st.session_state.get("_importado_id") != up.file_id:
         try:
-            raw = up.read().decode("utf-8")
-            data = json.loads(raw)
-
-            preguntas = list(data.get("preguntas", []))
-            # ✅ asegurar qid (si tu JSON viejo no trae qid)
-            st.session_state.preguntas = [ensure_qid(q) for q in preguntas]
+            if up.name.lower().endswith(".xlsx"):
+                # XLSForm (p. ej. editado en Survey123 Connect): se lee en streaming desde el upload
+                data, avisos = proyecto_desde_xlsform(up)
+            elif up.name.lower().endswith(".docx"):
+                # Formato de encuesta en Word (nueva edición): borrador con los names del cuestionario actual
+                data, avisos = proyecto_desde_docx(up, referencia=st.session_state.preguntas)
+                # El Word no trae catálogo Cantón→Distrito: se conserva el cargado
+                data["choices_ext_rows"] = list(st.session_state.choices_ext_rows)
+                data["choices_extra_cols"] = sorted(st.session_state.choices_extra_cols)
+            else:
+                # Proyecto .json / .json.gz de cualquier versión: se migra y se valida antes de cargarlo
+                data, avisos = proyecto_desde_archivo(up.getvalue()), []
 
-            st.session_state.reglas_visibilidad = list(data.get("reglas_visibilidad", []))
-            st.session_state.reglas_finalizar = list(data.get("reglas_finalizar", []))
-            st.session_state.choices_ext_rows = list(data.get("choices_ext_rows", []))
-            st.session_state.choices_extra_cols = set(data.get("choices_extra_cols", []))
-            st.session_state.textos_fijos = dict(data.get("textos_fijos", st.session_state.textos_fijos))
+            estado_desde_proyecto(data, st.session_state)
+            st.session_state["_importado_id"] = up.file_id
+            st.session_state["_avisos_importacion"] = avisos
+            # ✅ asegurar qid (si tu JSON viejo no trae qid) + índices del store
+            _set_preguntas(st.session_state.preguntas)
 
             st.session_state.edit_qid = None
-            _asegurar_placeholders_catalogo()
             _rerun()
         except Exception as e:
-            st.error(f"No se pudo importar el JSON: {e}")
+            st.error(f"No se pudo importar el archivo: {e}")
+    if st.session_state.get("_avisos_importacion"):
+        st.warning("Importado con avisos:\n\n" + "\n".join(f"- {a}" for a in st.session_state["_avisos_importacion"]))
 # ------------------------------------------------------------------------------------------
 # Constructor: Agregar nuevas preguntas
 # ------------------------------------------------------------------------------------------
+def _etiquetas_paginas() -> Dict[str, str]:
+    """id → título de las páginas del proyecto (en orden) a las que se puede asignar una pregunta."""
+    return {pag["id"]: pag["label"] for pag in st.session_state.paginas}
+
+def _seccion_de(q: Dict, secciones: Dict[str, str]) -> str:
+    pid = pagina_de_pregunta(q)
+    return pid if pid in secciones else "__sin__"
+
+# ------------------------------------------------------------------------------------------
+# Páginas (secciones) del formulario: orden, título, intro y relevant adicional
+# ------------------------------------------------------------------------------------------
+with st.expander("🗂️ Páginas del formulario", expanded=False):
+    st.caption(
+        "Intro y Consentimiento van siempre al inicio; estas páginas se muestran después y solo si la persona acepta. "
+        "Cada pregunta indica su página; una pregunta sin página válida se exporta en la última."
+    )
+    paginas = st.session_state.paginas
+    n_por_pagina = {}
+    for q in st.session_state.preguntas:
+        pid = pagina_de_pregunta(q)
+        n_por_pagina[pid] = n_por_pagina.get(pid, 0) + 1
+
+    for i, pag in enumerate(paginas):
+        c1, c2, c3, c4, c5 = st.columns([6, 1, 1, 1, 1])
+        n = n_por_pagina.get(pag["id"], 0)
+        meta = f"`{pag['id']}`  •  {n} preguntas"
+        if pag.get("relevant"):
+            meta += f"  •  relevant: `{pag['relevant']}`"
+        c1.markdown(f"**{i+1}. {pag['label']}**")
+        c1.caption(meta)
+        if c2.button("⬆️", key=f"pag_up_{pag['id']}", use_container_width=True, disabled=(i == 0)):
+            paginas[i - 1], paginas[i] = paginas[i], paginas[i - 1]
+            _rerun()
+        if c3.button("⬇️", key=f"pag_down_{pag['id']}", use_container_width=True, disabled=(i == len(paginas) - 1)):
+            paginas[i], paginas[i + 1] = paginas[i + 1], paginas[i]
+            _rerun()
+        if c4.button("✏️", key=f"pag_edit_{pag['id']}", use_container_width=True):
+            st.session_state.pag_edit_id = None if st.session_state.get("pag_edit_id") == pag["id"] else pag["id"]
+            _rerun()
+        if c5.button("🗑️", key=f"pag_del_{pag['id']}", use_container_width=True, disabled=(n > 0 or len(paginas) == 1),
+                     help="Solo se pueden eliminar páginas sin preguntas."):
+            del paginas[i]
+            _rerun()
+
+        # Edición en el lugar: el id no cambia, así que las preguntas conservan su página
+        if st.session_state.get("pag_edit_id") == pag["id"]:
+            with st.container(border=True):
+                e_label = st.text_input("Título de la página", value=pag["label"], key=f"pag_e_label_{pag['id']}")
+                e_intro = st.text_area("Texto de introducción (opcional)", value=pag.get("intro") or "", height=90,
+                                       key=f"pag_e_intro_{pag['id']}")
+                e_rel = st.text_input("relevant adicional (opcional; se combina con consentimiento = Sí)",
+                                      value=pag.get("relevant") or "", key=f"pag_e_rel_{pag['id']}")
+                b1, b2 = st.columns(2)
+                if b1.button("💾 Guardar página", key=f"pag_save_{pag['id']}", use_container_width=True):
+                    if not e_label.strip():
+                        st.error("Indica el título de la página.")
+                    else:
+                        paginas[i] = {**pag, "label": e_label.strip(), "intro": e_intro.strip() or None,
+                                      "relevant": e_rel.strip() or None}
+                        st.session_state.pag_edit_id = None
+                        st.success("Página actualizada.")
+                        _rerun()
+                if b2.button("Cancelar", key=f"pag_cancel_{pag['id']}", use_container_width=True):
+                    st.session_state.pag_edit_id = None
+                    _rerun()
+
+    st.markdown("**Agregar página**")
+    np_label = st.text_input("Título de la página", key="pag_nueva_label")
+    np_intro = st.text_area("Texto de introducción (opcional)", height=90, key="pag_nueva_intro")
+    np_rel = st.text_input("relevant adicional (opcional; se combina con consentimiento = Sí)", key="pag_nueva_rel")
+    if st.button("➕ Agregar página", key="btn_add_pagina"):
+        if not np_label.strip():
+            st.error("Indica el título de la página.")
+        else:
+            paginas.append({
+                "id": nuevo_id_pagina(np_label, paginas),
+                "label": np_label.strip(),
+                "intro": np_intro.strip() or None,
+                "relevant": np_rel.strip() or None,
+                "notas": [],
+            })
+            st.success(f"Página agregada: {np_label.strip()}")
+            _rerun()
+
 st.subheader("📝 Diseña tus preguntas")
 
 with st.form("form_add_q", clear_on_submit=False):
@@ -1429,6 +505,9 @@ with st.form("form_add_q", clear_on_submit=False):
     name = col_n1.text_input("Nombre interno (XLSForm 'name')", value=sugerido, key="add_name")
     required = col_n2.checkbox("Requerida", value=False, key="add_required")
     appearance = col_n3.text_input("Appearance (opcional)", value="", key="add_appearance")
+    _etq_paginas = _etiquetas_paginas()
+    pagina_nueva = st.selectbox("Página", options=list(_etq_paginas), format_func=_etq_paginas.get,
+                                index=max(len(_etq_paginas) - 1, 0), key="add_pagina")
 
     opciones = []
     if tipo_ui in ("Selección única", "Selección múltiple"):
@@ -1444,8 +523,7 @@ if add:
         st.warning("Agrega una etiqueta.")
     else:
         base = slugify_name(name or label)
-        usados = {q["name"] for q in st.session_state.preguntas}
-        unico = asegurar_nombre_unico(base, usados)
+        unico = asegurar_nombre_unico(base, st.session_state.preguntas_qid_by_name, st.session_state.preguntas_sufijos)
 
         nueva = ensure_qid({
             "tipo_ui": tipo_ui,
@@ -1455,9 +533,10 @@ if add:
             "opciones": opciones,
             "appearance": (appearance.strip() or None),
             "choice_filter": None,
-            "relevant": None
+            "relevant": None,
+            "pagina": pagina_nueva,
         })
-        st.session_state.preguntas.append(nueva)
+        _agregar_pregunta(nueva)
         st.session_state.edit_qid = None
         st.success(f"Pregunta agregada: **{label}** (name: `{unico}`)")
         _rerun()
@@ -1466,122 +545,197 @@ if add:
 # ------------------------------------------------------------------------------------------
 st.subheader("📚 Preguntas (ordénalas y edítalas)")
 
-if not st.session_state.preguntas:
-    st.info("Aún no has agregado preguntas.")
-else:
-    for idx, q in enumerate(st.session_state.preguntas):
-        q = ensure_qid(q)
-        qid = q["qid"]
-
-        with st.container(border=True):
-            c1, c2, c3, c4, c5 = st.columns([4, 2, 2, 2, 2])
-
-            c1.markdown(f"**{idx+1}. {q['label']}**")
-            meta = f"type: {q['tipo_ui']}  •  name: `{q['name']}`  •  requerida: {'sí' if q['required'] else 'no'}"
-            if q.get("appearance"):
-                meta += f"  •  appearance: `{q['appearance']}`"
-            if q.get("choice_filter"):
-                meta += f"  •  choice_filter: `{q['choice_filter']}`"
-            if q.get("relevant"):
-                meta += f"  •  relevant: `{q['relevant']}`"
-            if q.get("list_override"):
-                meta += f"  •  list_override: `{q['list_override']}`"
-            c1.caption(meta)
-
-            if q["tipo_ui"] in ("Selección única", "Selección múltiple"):
-                c1.caption("Opciones: " + ", ".join(q.get("opciones") or []))
-
-            up_btn = c2.button("⬆️ Subir", key=f"up_{qid}", use_container_width=True, disabled=(idx == 0))
-            down_btn = c3.button("⬇️ Bajar", key=f"down_{qid}", use_container_width=True, disabled=(idx == len(st.session_state.preguntas) - 1))
-            edit_btn = c4.button("✏️ Editar", key=f"edit_{qid}", use_container_width=True)
-            del_btn = c5.button("🗑️ Eliminar", key=f"del_{qid}", use_container_width=True)
-
-            if up_btn:
-                st.session_state.preguntas[idx - 1], st.session_state.preguntas[idx] = st.session_state.preguntas[idx], st.session_state.preguntas[idx - 1]
-                _rerun()
-
-            if down_btn:
-                st.session_state.preguntas[idx + 1], st.session_state.preguntas[idx] = st.session_state.preguntas[idx], st.session_state.preguntas[idx + 1]
-                _rerun()
-
-            if edit_btn:
-                st.session_state.edit_qid = qid
-                _rerun()
-
-            if del_btn:
-                # Si estaba editando esa, cerrar editor
-                if st.session_state.edit_qid == qid:
-                    st.session_state.edit_qid = None
-                del st.session_state.preguntas[idx]
-                st.warning("Pregunta eliminada.")
-                _rerun()
-
-            # Editor desplegable SOLO si coincide el qid
-            if st.session_state.edit_qid == qid:
-                st.markdown("**Editar esta pregunta**")
-
-                ne_label = st.text_input("Etiqueta", value=q["label"], key=f"e_label_{qid}")
-                ne_name = st.text_input("Nombre interno (name)", value=q["name"], key=f"e_name_{qid}")
-                ne_required = st.checkbox("Requerida", value=q["required"], key=f"e_req_{qid}")
-                ne_appearance = st.text_input("Appearance", value=q.get("appearance") or "", key=f"e_app_{qid}")
-                ne_choice_filter = st.text_input("choice_filter (opcional)", value=q.get("choice_filter") or "", key=f"e_cf_{qid}")
-                ne_relevant = st.text_input("relevant (opcional)", value=q.get("relevant") or "", key=f"e_rel_{qid}")
-
-                ne_opciones = q.get("opciones") or []
+# Solo se dibuja la porción visible (filtro + página): el costo del rerun no crece con el cuestionario
+PREGUNTAS_POR_PAGINA_OPCIONES = [10, 20, 50]
+
+def _lista_a_primera_pagina():
+    """Al cambiar filtro, búsqueda o tamaño de página, la lista vuelve a la página 1 (las primeras coincidencias)."""
+    st.session_state.lista_pagina = 1
+
+# Subir/bajar/editar/cancelar solo re-ejecutan este panel; guardar y eliminar cambian los
+# names que usan los condicionales, así que re-ejecutan toda la app.
+@_fragmento
+def _panel_preguntas():
+    if not st.session_state.preguntas:
+        st.info("Aún no has agregado preguntas.")
+    else:
+        secciones = {"__todas__": "Todas las secciones", PAGINA_CONSENTIMIENTO: "Consentimiento informado"}
+        secciones.update(_etiquetas_paginas())
+        secciones["__sin__"] = "Sin página válida (se exporta en la última)"
+
+        fc1, fc2, fc3 = st.columns([3, 3, 1])
+        filtro_seccion = fc1.selectbox("Sección", options=list(secciones), format_func=secciones.get,
+                                       key="lista_filtro_seccion", on_change=_lista_a_primera_pagina)
+        busqueda = fc2.text_input("Buscar (etiqueta o name)", key="lista_busqueda",
+                                  on_change=_lista_a_primera_pagina).strip().lower()
+        por_pagina = fc3.selectbox("Por página", options=PREGUNTAS_POR_PAGINA_OPCIONES, key="lista_por_pagina",
+                                   on_change=_lista_a_primera_pagina)
+
+        total_preguntas = len(st.session_state.preguntas)
+        visibles = []
+        for idx, q in enumerate(st.session_state.preguntas):
+            if filtro_seccion != "__todas__" and _seccion_de(q, secciones) != filtro_seccion:
+                continue
+            if busqueda and busqueda not in q["name"] and busqueda not in q["label"].lower():
+                continue
+            visibles.append(idx)
+
+        n_paginas = max(1, -(-len(visibles) // por_pagina))
+        if st.session_state.get("lista_pagina", 1) > n_paginas:
+            st.session_state.lista_pagina = n_paginas
+        pc1, pc2 = st.columns([1, 3])
+        pagina = pc1.number_input("Página", min_value=1, max_value=n_paginas, step=1, key="lista_pagina")
+        ini = (pagina - 1) * por_pagina
+        fin = min(ini + por_pagina, len(visibles))
+        if visibles:
+            pc2.caption(f"Mostrando {ini + 1}–{fin} de {len(visibles)} (total: {total_preguntas}) • página {pagina} de {n_paginas}")
+        else:
+            pc2.caption(f"Ninguna pregunta coincide con el filtro (total: {total_preguntas}).")
+
+        for idx in visibles[ini:fin]:
+            q = ensure_qid(st.session_state.preguntas[idx])
+            qid = q["qid"]
+
+            with st.container(border=True):
+                c1, c2, c3, c4, c5 = st.columns([4, 2, 2, 2, 2])
+
+                c1.markdown(f"**{idx+1}. {q['label']}**")
+                meta = f"type: {q['tipo_ui']}  •  name: `{q['name']}`  •  requerida: {'sí' if q['required'] else 'no'}"
+                if q.get("appearance"):
+                    meta += f"  •  appearance: `{q['appearance']}`"
+                if q.get("choice_filter"):
+                    meta += f"  •  choice_filter: `{q['choice_filter']}`"
+                if q.get("relevant"):
+                    meta += f"  •  relevant: `{q['relevant']}`"
+                if q.get("list_override"):
+                    meta += f"  •  list_override: `{q['list_override']}`"
+                c1.caption(meta)
+
                 if q["tipo_ui"] in ("Selección única", "Selección múltiple"):
-                    ne_opts_txt = st.text_area("Opciones (una por línea)", value="\n".join(ne_opciones), key=f"e_opts_{qid}")
-                    ne_opciones = [o.strip() for o in ne_opts_txt.splitlines() if o.strip()]
+                    c1.caption("Opciones: " + ", ".join(q.get("opciones") or []))
 
-                col_ok, col_cancel = st.columns(2)
+                up_btn = c2.button("⬆️ Subir", key=f"up_{qid}", use_container_width=True, disabled=(idx == 0))
+                down_btn = c3.button("⬇️ Bajar", key=f"down_{qid}", use_container_width=True, disabled=(idx == total_preguntas - 1))
+                edit_btn = c4.button("✏️ Editar", key=f"edit_{qid}", use_container_width=True)
+                del_btn = c5.button("🗑️ Eliminar", key=f"del_{qid}", use_container_width=True)
 
-                if col_ok.button("💾 Guardar cambios", key=f"e_save_{qid}", use_container_width=True):
-                    # Buscar índice actual por qid (por si se movió mientras editabas)
-                    cur_idx = q_index_by_qid(qid)
-                    if cur_idx == -1:
-                        st.error("No se encontró la pregunta (posible cambio de estado). Intenta de nuevo.")
-                        st.session_state.edit_qid = None
-                        _rerun()
+                if up_btn:
+                    _intercambiar_preguntas(idx - 1, idx)
+                    _rerun(solo_fragmento=True)
 
-                    new_base = slugify_name(ne_name or ne_label)
-                    usados = {qq["name"] for j, qq in enumerate(st.session_state.preguntas) if j != cur_idx}
-                    ne_name_final = new_base if new_base not in usados else asegurar_nombre_unico(new_base, usados)
+                if down_btn:
+                    _intercambiar_preguntas(idx, idx + 1)
+                    _rerun(solo_fragmento=True)
 
-                    st.session_state.preguntas[cur_idx]["label"] = ne_label.strip() or q["label"]
-                    st.session_state.preguntas[cur_idx]["name"] = ne_name_final
-                    st.session_state.preguntas[cur_idx]["required"] = ne_required
-                    st.session_state.preguntas[cur_idx]["appearance"] = ne_appearance.strip() or None
-                    st.session_state.preguntas[cur_idx]["choice_filter"] = ne_choice_filter.strip() or None
-                    st.session_state.preguntas[cur_idx]["relevant"] = ne_relevant.strip() or None
+                if edit_btn:
+                    st.session_state.edit_qid = qid
+                    _rerun(solo_fragmento=True)
 
+                if del_btn:
+                    # Si estaba editando esa, cerrar editor
+                    if st.session_state.edit_qid == qid:
+                        st.session_state.edit_qid = None
+                    _eliminar_pregunta(qid)
+                    st.warning("Pregunta eliminada.")
+                    _rerun()
+
+                # Editor desplegable SOLO si coincide el qid
+                if st.session_state.edit_qid == qid:
+                    st.markdown("**Editar esta pregunta**")
+                    dependientes = grafo_dependencias(
+                        st.session_state.preguntas, st.session_state.reglas_visibilidad, st.session_state.reglas_finalizar
+                    ).get(q["name"], [])
+                    if dependientes:
+                        st.caption(
+                            f"Usada por ({len(dependientes)}): " + "; ".join(describir_dependencia(d) for d in dependientes)
+                            + ". Si cambias el name, estas referencias se actualizan."
+                        )
+
+                    ne_label = st.text_input("Etiqueta", value=q["label"], key=f"e_label_{qid}")
+                    ne_name = st.text_input("Nombre interno (name)", value=q["name"], key=f"e_name_{qid}")
+                    ne_required = st.checkbox("Requerida", value=q["required"], key=f"e_req_{qid}")
+                    ne_appearance = st.text_input("Appearance", value=q.get("appearance") or "", key=f"e_app_{qid}")
+                    ne_choice_filter = st.text_input("choice_filter (opcional)", value=q.get("choice_filter") or "", key=f"e_cf_{qid}")
+                    ne_relevant = st.text_input("relevant (opcional)", value=q.get("relevant") or "", key=f"e_rel_{qid}")
+                    ne_pagina = pagina_de_pregunta(q)
+                    if ne_pagina != PAGINA_CONSENTIMIENTO:
+                        etiquetas = _etiquetas_paginas()
+                        opciones_pag = list(etiquetas)
+                        ne_pagina = st.selectbox(
+                            "Página", options=opciones_pag, format_func=etiquetas.get,
+                            index=opciones_pag.index(ne_pagina) if ne_pagina in etiquetas else len(opciones_pag) - 1,
+                            key=f"e_pag_{qid}"
+                        )
+
+                    ne_opciones = q.get("opciones") or []
                     if q["tipo_ui"] in ("Selección única", "Selección múltiple"):
-                        st.session_state.preguntas[cur_idx]["opciones"] = ne_opciones
+                        ne_opts_txt = st.text_area("Opciones (una por línea)", value="\n".join(ne_opciones), key=f"e_opts_{qid}")
+                        ne_opciones = [o.strip() for o in ne_opts_txt.splitlines() if o.strip()]
+
+                    col_ok, col_cancel = st.columns(2)
+
+                    if col_ok.button("💾 Guardar cambios", key=f"e_save_{qid}", use_container_width=True):
+                        # Buscar índice actual por qid (por si se movió mientras editabas)
+                        cur_idx = q_index_by_qid(qid)
+                        if cur_idx == -1:
+                            st.error("No se encontró la pregunta (posible cambio de estado). Intenta de nuevo.")
+                            st.session_state.edit_qid = None
+                            _rerun()
+
+                        new_base = slugify_name(ne_name or ne_label)
+                        usados = st.session_state.preguntas_qid_by_name
+                        ne_name_final = (new_base if usados.get(new_base) in (None, qid)
+                                         else asegurar_nombre_unico(new_base, usados, st.session_state.preguntas_sufijos))
+
+                        _renombrar_pregunta(qid, ne_name_final)
+                        qe = _pregunta_editable(qid)
+                        qe["label"] = ne_label.strip() or q["label"]
+                        qe["required"] = ne_required
+                        qe["appearance"] = ne_appearance.strip() or None
+                        qe["choice_filter"] = ne_choice_filter.strip() or None
+                        qe["relevant"] = ne_relevant.strip() or None
+                        qe["pagina"] = ne_pagina
+
+                        if q["tipo_ui"] in ("Selección única", "Selección múltiple"):
+                            qe["opciones"] = ne_opciones
+
+                        st.success("Cambios guardados.")
+                        st.session_state.edit_qid = None
+                        _rerun()
 
-                    st.success("Cambios guardados.")
-                    st.session_state.edit_qid = None
-                    _rerun()
+                    if col_cancel.button("Cancelar", key=f"e_cancel_{qid}", use_container_width=True):
+                        st.session_state.edit_qid = None
+                        _rerun(solo_fragmento=True)
 
-                if col_cancel.button("Cancelar", key=f"e_cancel_{qid}", use_container_width=True):
-                    st.session_state.edit_qid = None
-                    _rerun()
+_panel_preguntas()
 # ------------------------------------------------------------------------------------------
 # Condicionales (panel)
 # ------------------------------------------------------------------------------------------
-st.subheader("🔀 Condicionales (mostrar / finalizar)")
-if not st.session_state.preguntas:
-    st.info("Agrega preguntas para definir condicionales.")
-else:
+def _opciones_condicionales():
+    """Opciones de los selectbox (una sola lista para ambos paneles); la etiqueta se busca por índice name→qid."""
+    names = [q["name"] for q in st.session_state.preguntas]
+    _preguntas = st.session_state.preguntas
+    _pos_by_qid = st.session_state.preguntas_pos_by_qid
+    _qid_by_name = st.session_state.preguntas_qid_by_name
+
+    def _fmt_pregunta(n):
+        return f"{n} — {_preguntas[_pos_by_qid[_qid_by_name[n]]]['label']}"
+
+    return names, _fmt_pregunta
+
+# Cada panel de reglas es un fragmento: agregar/eliminar una regla no re-ejecuta el resto de la app
+@_fragmento
+def _panel_reglas_visibilidad():
+    names, _fmt_pregunta = _opciones_condicionales()
     with st.expander("👁️ Mostrar pregunta si se cumple condición", expanded=False):
-        names = [q["name"] for q in st.session_state.preguntas]
-        labels_by_name = {q["name"]: q["label"] for q in st.session_state.preguntas}
-
         target = st.selectbox("Pregunta a mostrar (target)", options=names,
-                              format_func=lambda n: f"{n} — {labels_by_name[n]}",
+                              format_func=_fmt_pregunta,
                               key="vis_target")
         src = st.selectbox("Depende de (source)", options=names,
-                           format_func=lambda n: f"{n} — {labels_by_name[n]}",
+                           format_func=_fmt_pregunta,
                            key="vis_src")
         op = st.selectbox("Operador", options=["=", "selected"], key="vis_op")
-        src_q = next((qq for qq in st.session_state.preguntas if qq["name"] == src), None)
+        src_q = q_by_name(src)
 
         vals = []
         if src_q and src_q.get("opciones"):
@@ -1599,7 +753,7 @@ else:
             else:
                 st.session_state.reglas_visibilidad.append({"target": target, "src": src, "op": op, "values": vals})
                 st.success("Regla agregada.")
-                _rerun()
+                _rerun(solo_fragmento=True)
 
         if st.session_state.reglas_visibilidad:
             st.markdown("**Reglas de visibilidad actuales:**")
@@ -1607,17 +761,17 @@ else:
                 st.write(f"- Mostrar **{r['target']}** si **{r['src']}** {r['op']} {r['values']}")
                 if st.button(f"Eliminar regla #{i+1}", key=f"del_vis_{i}"):
                     del st.session_state.reglas_visibilidad[i]
-                    _rerun()
+                    _rerun(solo_fragmento=True)
 
+@_fragmento
+def _panel_reglas_finalizar():
+    names, _fmt_pregunta = _opciones_condicionales()
     with st.expander("⏹️ Finalizar temprano si se cumple condición", expanded=False):
-        names = [q["name"] for q in st.session_state.preguntas]
-        labels_by_name = {q["name"]: q["label"] for q in st.session_state.preguntas}
-
         src2 = st.selectbox("Condición basada en", options=names,
-                            format_func=lambda n: f"{n} — {labels_by_name[n]}",
+                            format_func=_fmt_pregunta,
                             key="final_src")
         op2 = st.selectbox("Operador", options=["=", "selected", "!="], key="final_op")
-        src2_q = next((qq for qq in st.session_state.preguntas if qq["name"] == src2), None)
+        src2_q = q_by_name(src2)
 
         vals2 = []
         if src2_q and src2_q.get("opciones"):
@@ -1631,10 +785,9 @@ else:
             if not vals2:
                 st.error("Indica al menos un valor.")
             else:
-                idx_src = next((i for i, qq in enumerate(st.session_state.preguntas) if qq["name"] == src2), 0)
-                st.session_state.reglas_finalizar.append({"src": src2, "op": op2, "values": vals2, "index_src": idx_src})
+                st.session_state.reglas_finalizar.append({"src": src2, "op": op2, "values": vals2})
                 st.success("Regla agregada.")
-                _rerun()
+                _rerun(solo_fragmento=True)
 
         if st.session_state.reglas_finalizar:
             st.markdown("**Reglas de finalización actuales:**")
@@ -1642,420 +795,62 @@ else:
                 st.write(f"- Si **{r['src']}** {r['op']} {r['values']} ⇒ ocultar lo que sigue (efecto fin)")
                 if st.button(f"Eliminar regla fin #{i+1}", key=f"del_fin_{i}"):
                     del st.session_state.reglas_finalizar[i]
-                    _rerun()
+                    _rerun(solo_fragmento=True)
+
+st.subheader("🔀 Condicionales (mostrar / finalizar)")
+if not st.session_state.preguntas:
+    st.info("Agrega preguntas para definir condicionales.")
+else:
+    _panel_reglas_visibilidad()
+    _panel_reglas_finalizar()
 # ------------------------------------------------------------------------------------------
 # Construcción XLSForm (Intro + Consentimiento + Páginas)
 # ------------------------------------------------------------------------------------------
 def _get_logo_media_name():
     return logo_media_name
 
-def construir_xlsform(preguntas, form_title: str, idioma: str, version: str,
-                      reglas_vis, reglas_fin):
-    survey_rows = []
-    choices_rows = []
-    choices_keys = set()  # dedup choices por (list_name,name)
-
-    def _choices_add_unique(row: Dict):
-        key = (row.get("list_name"), row.get("name"))
-        if key not in choices_keys:
-            choices_rows.append(row)
-            choices_keys.add(key)
-
-    idx_by_name = {q.get("name"): i for i, q in enumerate(preguntas)}
-
-    vis_by_target = {}
-    for r in reglas_vis:
-        vis_by_target.setdefault(r["target"], []).append(
-            {"src": r["src"], "op": r.get("op", "="), "values": r.get("values", [])}
-        )
-
-    fin_conds = []
-    for r in reglas_fin:
-        cond = build_relevant_expr([{"src": r["src"], "op": r.get("op", "="), "values": r.get("values", [])}])
-        if cond:
-            fin_conds.append((r["index_src"], cond))
-
-    def _aplicar_exclusividad_no_observa(row: Dict, q: Dict):
-        """
-        FIX: Si un select_multiple incluye opción tipo:
-        - "No se observa"
-        - "No se observan ..."
-        - "No se observa ..."
-        entonces esa opción debe ser EXCLUSIVA (no permitir combinar con otras).
-        """
-        if q.get("tipo_ui") != "Selección múltiple":
-            return
-
-        opts = q.get("opciones") or []
-        if not opts:
-            return
-
-        exclusivas = [o for o in opts if str(o).strip().lower().startswith("no se observa")]
-        if not exclusivas:
-            exclusivas = [o for o in opts if str(o).strip().lower().startswith("no se observan")]
-        if not exclusivas:
-            return
-
-        ex_label = exclusivas[0]
-        ex_slug = slugify_name(ex_label)
-        nm = q["name"]
-
-        row["constraint"] = f"not(selected(${{{nm}}}, '{ex_slug}') and count-selected(${{{nm}}})>1)"
-        row["constraint_message"] = f"Si selecciona “{ex_label}”, no puede marcar otras opciones."
-
-    def add_q(q, idx):
-        x_type, default_app, list_name = map_tipo_to_xlsform(q["tipo_ui"], q["name"])
-
-        # FIX MATRIZ: permitir forzar list_name compartido con list_override
-        list_override = q.get("list_override")
-        if list_override and isinstance(x_type, str):
-            if x_type.startswith("select_one "):
-                x_type = f"select_one {list_override}"
-                list_name = list_override
-            elif x_type.startswith("select_multiple "):
-                x_type = f"select_multiple {list_override}"
-                list_name = list_override
-
-        rel_manual = q.get("relevant") or None
-        rel_panel = build_relevant_expr(vis_by_target.get(q["name"], []))
-
-        nots = [xlsform_not(cond) for idx_src, cond in fin_conds if idx_src < idx]
-        rel_fin = "(" + " and ".join(nots) + ")" if nots else None
-
-        parts = [p for p in [rel_manual, rel_panel, rel_fin] if p]
-        rel_final = parts[0] if parts and len(parts) == 1 else ("(" + ") and (".join(parts) + ")" if parts else None)
-
-        row = {"type": x_type, "name": q["name"], "label": q["label"]}
-        if q.get("required"):
-            row["required"] = "yes"
-        app = q.get("appearance") or default_app
-        if app:
-            row["appearance"] = app
-        if q.get("choice_filter"):
-            row["choice_filter"] = q["choice_filter"]
-        if rel_final:
-            row["relevant"] = rel_final
-
-        # Constraints placeholders SOLO si NO hay catálogo real
-        if not _hay_catalogo_real():
-            if q["name"] == "canton":
-                row["constraint"] = ". != '__pick_canton__'"
-                row["constraint_message"] = "Seleccione un cantón válido."
-            if q["name"] == "distrito":
-                row["constraint"] = ". != '__pick_distrito__'"
-                row["constraint_message"] = "Seleccione un distrito válido."
-
-        # ✅ Exclusividad "No se observa / No se observan..."
-        _aplicar_exclusividad_no_observa(row, q)
-
-        survey_rows.append(row)
-
-        # Generar choices (excepto Cantón/Distrito)
-        if list_name and q["name"] not in {"canton", "distrito"}:
-            usados = set()
-            for opt_label in (q.get("opciones") or []):
-                base = slugify_name(opt_label)
-                opt_name = asegurar_nombre_unico(base, usados)
-                usados.add(opt_name)
-                _choices_add_unique({"list_name": list_name, "name": opt_name, "label": str(opt_label)})
-
-    # Página 1: Intro
-    survey_rows += [
-        {"type": "begin_group", "name": "p1_intro", "label": "Introducción", "appearance": "field-list"},
-        {"type": "note", "name": "intro_logo", "label": form_title, "media::image": _get_logo_media_name()},
-        {"type": "note", "name": "intro_texto", "label": INTRO_COMUNIDAD},
-        {"type": "end_group", "name": "p1_end"},
-    ]
-
-    # Página 2: Consentimiento
-    idx_consent = idx_by_name.get("consentimiento", None)
-    survey_rows.append({"type": "begin_group", "name": "p2_consentimiento", "label": "Consentimiento informado", "appearance": "field-list"})
-    survey_rows.append({"type": "note", "name": "cons_title", "label": CONSENTIMIENTO_TITULO})
-    for i, txt in enumerate(CONSENTIMIENTO_BLOQUES, start=1):
-        survey_rows.append({"type": "note", "name": f"cons_b{i:02d}", "label": txt})
-    if idx_consent is not None:
-        add_q(preguntas[idx_consent], idx_consent)
-    survey_rows.append({"type": "end_group", "name": "p2_consentimiento_end"})
-
-    # Página final si NO acepta
-    survey_rows.append({
-        "type": "begin_group",
-        "name": "p_fin_no",
-        "label": "Finalización",
-        "appearance": "field-list",
-        "relevant": f"${{consentimiento}}='{CONSENT_NO}'"
-    })
-    survey_rows.append({
-        "type": "note",
-        "name": "fin_no_texto",
-        "label": "Gracias. Al no aceptar participar, la encuesta finaliza en este punto."
-    })
-    survey_rows.append({"type": "end_group", "name": "p_fin_no_end"})
-
-    # Desde aquí, todo se muestra SOLO si consentimiento = Sí
-    rel_si = f"${{consentimiento}}='{CONSENT_SI}'"
-
-    p_demograficos = {"canton", "distrito", "edad_rango", "genero", "escolaridad", "relacion_zona"}
-
-    p_percepcion = {
-        "percep_seg_distrito",
-        "motivos_inseguridad_distrito",
-        "otro_problema_inseg_distrito",
-        "cambio_seguridad_12m",
-        "motivo_cambio_12m",
-        "seg_discotecas_bares",
-        "seg_espacios_recreativos",
-        "seg_lugar_residencia",
-        "seg_paradas_estaciones",
-        "seg_puentes_peatonales",
-        "seg_transporte_publico",
-        "seg_zona_bancaria",
-        "seg_zona_comercio",
-        "seg_zonas_residenciales",
-        "seg_zonas_francas",
-        "seg_lugares_turisticos",
-        "seg_centros_educativos",
-        "foco_inseguridad",
-        "foco_inseguridad_otro",
-        "razones_foco_inseguridad",
-    }
-
-    p_riesgos = {
-        "problematicas_distrito",
-        "problematicas_otro",
-        "carencias_inversion_social",
-        "carencias_inversion_social_otro",
-        "consumo_drogas_donde",
-        "infra_vial_deficiencias",
-        "puntos_venta_drogas",
-        "puntos_venta_drogas_otro",
-        "inseguridad_transporte",
-        "inseguridad_transporte_otro",
-    }
-
-    p_delitos = {
-        "delitos_lista",
-        "delitos_otro",
-        "venta_drogas_forma",
-        "venta_drogas_forma_otro",
-        "delitos_vida",
-        "delitos_sexuales",
-        "asaltos",
-        "estafas",
-        "robos",
-        "abandono",
-        "explotacion_infantil",
-        "delitos_ambientales",
-        "trata_personas",
-    }
-
-    p_vict_vi = {"vi_12m", "vi_tipos", "vi_medidas_proteccion", "vi_valoracion_fp"}
-
-    p_vict_otros = {
-        "vict_delito_12m",
-        "vict_301_robo_asalto",
-        "vict_301_hurto_danos",
-        "vict_301_estafas",
-        "vict_301_otros",
-        "vict_301_otros_detalle",
-        "vict_302_motivos_no_denuncia",
-        "vict_302_motivos_no_denuncia_otro",
-        "vict_303_horario",
-        "vict_304_modo",
-        "vict_304_modo_otro",
-    }
-
-    p_confianza = {
-        "identifica_policias",
-        "tipos_atencion",
-        "tipos_atencion_otro",
-        "nivel_confianza_policia",
-        "profesionalidad_fp",
-        "calidad_servicio_policial",
-        "satisfaccion_trabajo_preventivo",
-        "contribucion_presencia_policial",
-        "frecuencia_presencia_policial",
-        "presencia_consistente_dia",
-        "trato_justo_imparcial",
-        "expresar_quejas_sin_temor",
-        "info_veraz_clara_oportuna",
-    }
-
-    p_propuestas = {
-        "propuestas_fp",
-        "propuestas_fp_otro",
-        "propuestas_muni",
-        "propuestas_muni_otro",
-        "info_persona_grupo_delito",
-        "info_persona_grupo_delito_detalle",
-        "contacto_voluntario",
-        "info_adicional_final",
-    }
-
-    def add_page(group_name, page_label, names_set, intro_note_text: str = None,
-                 group_appearance: str = "field-list", group_relevant: str = None, extra_notes: List[str] = None):
-        row = {"type": "begin_group", "name": group_name, "label": page_label, "appearance": group_appearance}
-        if group_relevant:
-            row["relevant"] = group_relevant
-        survey_rows.append(row)
-
-        if intro_note_text:
-            note = {"type": "note", "name": f"{group_name}_intro", "label": intro_note_text}
-            if group_relevant:
-                note["relevant"] = group_relevant
-            survey_rows.append(note)
-
-        if extra_notes:
-            for j, t in enumerate(extra_notes, start=1):
-                nn = {"type": "note", "name": f"{group_name}_note{j:02d}", "label": t}
-                if group_relevant:
-                    nn["relevant"] = group_relevant
-                survey_rows.append(nn)
-
-        for i, qq in enumerate(preguntas):
-            if qq["name"] in names_set:
-                add_q(qq, i)
-
-        survey_rows.append({"type": "end_group", "name": f"{group_name}_end"})
-
-    add_page("p3_demograficos", "I. DATOS DEMOGRÁFICOS", p_demograficos,
-             intro_note_text=None, group_appearance="field-list", group_relevant=rel_si)
-
-    add_page("p4_percepcion_distrito", "II. PERCEPCIÓN CIUDADANA DE SEGURIDAD EN EL DISTRITO", p_percepcion,
-             intro_note_text=INTRO_PERCEPCION_DISTRITO, group_appearance="field-list", group_relevant=rel_si)
-
-    add_page("p5_riesgos_iii", "III. RIESGOS, DELITOS, VICTIMIZACIÓN Y EVALUACIÓN POLICIAL", p_riesgos,
-             intro_note_text=INTRO_RIESGOS_III, group_appearance="field-list", group_relevant=rel_si)
-
-    add_page("p6_delitos", "Delitos", p_delitos,
-             intro_note_text=INTRO_DELITOS, group_appearance="field-list", group_relevant=rel_si)
-
-    add_page("p7_vict_vi", "Victimización — Apartado A: Violencia intrafamiliar", p_vict_vi,
-             intro_note_text=INTRO_VICT_VI, group_appearance="field-list", group_relevant=rel_si)
-
-    add_page("p8_vict_otros", "Victimización — Apartado B: Victimización por otros delitos", p_vict_otros,
-             intro_note_text=INTRO_VICT_OTROS, group_appearance="field-list", group_relevant=rel_si)
-
-    add_page("p9_confianza_policial", "Confianza Policial", p_confianza,
-             intro_note_text=INTRO_CONFIANZA_POLICIAL, group_appearance="field-list", group_relevant=rel_si)
-
-    add_page(
-        "p10_propuestas_ciudadanas",
-        "Propuestas ciudadanas para la mejora de la seguridad",
-        p_propuestas,
-        intro_note_text=INTRO_PROPUESTAS_CIUDADANAS,
-        group_appearance="field-list",
-        group_relevant=rel_si,
-        extra_notes=[
-            "Información Adicional y Contacto Voluntario",
-            "Nota (Recuerde: su información es confidencial y voluntaria. No constituye denuncia formal)."
-        ]
-    )
-
-    # Encapsular matriz 9 en table-list (ya comparten list_override)
-    def _postprocesar_matriz_table_list(df_survey: pd.DataFrame) -> pd.DataFrame:
-        matriz_names = [
-            "seg_discotecas_bares",
-            "seg_espacios_recreativos",
-            "seg_lugar_residencia",
-            "seg_paradas_estaciones",
-            "seg_puentes_peatonales",
-            "seg_transporte_publico",
-            "seg_zona_bancaria",
-            "seg_zona_comercio",
-            "seg_zonas_residenciales",
-            "seg_zonas_francas",
-            "seg_lugares_turisticos",
-            "seg_centros_educativos",
-        ]
-        idxs = df_survey.index[df_survey["name"].isin(matriz_names)].tolist()
-        if not idxs:
-            return df_survey
-
-        start = min(idxs)
-        end = max(idxs)
-
-        matriz_label = st.session_state.textos_fijos.get(
-            "matriz_9_label",
-            "9. En términos de seguridad, indique qué tan seguros percibe los siguientes espacios de su distrito."
-        )
+def _get_logo_bytes():
+    """Logo subido o, si no hay, el 001.png por defecto (None si no existe)."""
+    if st.session_state.get("_logo_bytes"):
+        return st.session_state["_logo_bytes"]
+    try:
+        with open(DEFAULT_LOGO_PATH, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
 
-        begin_row = {
-            "type": "begin_group",
-            "name": "matriz_seguridad_9",
-            "label": matriz_label,
-            "appearance": "table-list",
-        }
-        end_row = {"type": "end_group", "name": "matriz_seguridad_9_end"}
-
-        top = df_survey.iloc[:start].copy()
-        mid = df_survey.iloc[start:end + 1].copy()
-        bot = df_survey.iloc[end + 1:].copy()
-
-        return pd.concat([top, pd.DataFrame([begin_row]), mid, pd.DataFrame([end_row]), bot], ignore_index=True)
-
-    # Choices del catálogo (filtrando placeholders si hay catálogo real)
-    _asegurar_placeholders_catalogo()
-    catalog_rows = [dict(r) for r in st.session_state.choices_ext_rows]
-    catalog_rows = _filtrar_placeholders_si_hay_catalogo(catalog_rows)
-    for r in catalog_rows:
-        _choices_add_unique(r)
-
-    # DataFrames
-    survey_cols_all = set().union(*[r.keys() for r in survey_rows])
-    survey_cols = [c for c in [
-        "type", "name", "label", "required", "appearance", "choice_filter",
-        "relevant", "constraint", "constraint_message", "media::image"
-    ] if c in survey_cols_all]
-    for k in sorted(survey_cols_all):
-        if k not in survey_cols:
-            survey_cols.append(k)
-
-    df_survey = pd.DataFrame(survey_rows, columns=survey_cols)
-    df_survey = _postprocesar_matriz_table_list(df_survey)
-
-    choices_cols_all = set()
-    for r in choices_rows:
-        choices_cols_all.update(r.keys())
-    base_choice_cols = ["list_name", "name", "label"]
-    for extra in sorted(choices_cols_all):
-        if extra not in base_choice_cols:
-            base_choice_cols.append(extra)
-    df_choices = pd.DataFrame(choices_rows, columns=base_choice_cols) if choices_rows else pd.DataFrame(columns=base_choice_cols)
-
-    df_settings = pd.DataFrame([{
-        "form_title": form_title,
-        "version": version,
-        "default_language": idioma,
-        "style": "pages",
-    }], columns=["form_title", "version", "default_language", "style"])
-
-    return df_survey, df_choices, df_settings
-
-def descargar_excel_xlsform(df_survey, df_choices, df_settings, nombre_archivo: str):
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-        df_survey.to_excel(writer, sheet_name="survey", index=False)
-        df_choices.to_excel(writer, sheet_name="choices", index=False)
-        df_settings.to_excel(writer, sheet_name="settings", index=False)
-
-        wb = writer.book
-        fmt_hdr = wb.add_format({"bold": True, "align": "left"})
-        for sheet, df in (("survey", df_survey), ("choices", df_choices), ("settings", df_settings)):
-            ws = writer.sheets[sheet]
-            ws.freeze_panes(1, 0)
-            ws.set_row(0, None, fmt_hdr)
-            for col_idx, col_name in enumerate(list(df.columns)):
-                ws.set_column(col_idx, col_idx, max(14, min(55, len(str(col_name)) + 8)))
-
-    buffer.seek(0)
+def descargar_excel_xlsform(df_survey, df_choices, df_settings, nombre_archivo: str, data: bytes = None):
+    if data is None:
+        data = excel_xlsform_bytes(df_survey, df_choices, df_settings)
     st.download_button(
         label=f"📥 Descargar XLSForm ({nombre_archivo})",
-        data=buffer,
+        data=data,
         file_name=nombre_archivo,
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         use_container_width=True
     )
+
+# ------------------------------------------------------------------------------------------
+# Memo de construcción: mismo contenido ⇒ mismo resultado (LRU acotado, compartido entre sesiones)
+# ------------------------------------------------------------------------------------------
+XLSFORM_CACHE_MAX_ENTRIES = 16
+
+@st.cache_data(max_entries=XLSFORM_CACHE_MAX_ENTRIES, show_spinner=False)
+def _construir_xlsform_memo(clave: str, _preguntas, form_title: str, idioma: str, version: str, _reglas_vis, _reglas_fin,
+                            _estado, _logo_media_name: str, _frag_cache: Dict = None):
+    """
+    Solo `clave` identifica la entrada (los parámetros con "_" no se hashean).
+    Devuelve los 3 DataFrames + los bytes del .xlsx + el ahorro de la optimización de relevant,
+    así reconstruir/descargar sin cambios es inmediato.
+    """
+    stats = {}
+    df_survey, df_choices, df_settings = construir_xlsform(
+        _preguntas, form_title=form_title, idioma=idioma, version=version,
+        reglas_vis=_reglas_vis, reglas_fin=_reglas_fin,
+        estado=_estado, logo_media_name=_logo_media_name, frag_cache=_frag_cache, stats=stats
+    )
+    return df_survey, df_choices, df_settings, excel_xlsform_bytes(df_survey, df_choices, df_settings), stats
+
 # ------------------------------------------------------------------------------------------
 # Exportar / Vista previa XLSForm
 # ------------------------------------------------------------------------------------------
@@ -2064,26 +859,87 @@ st.subheader("📦 Generar XLSForm (Excel) para Survey123")
 
 if st.button("🧮 Construir XLSForm", use_container_width=True, disabled=not st.session_state.preguntas, key="btn_build_xls"):
     try:
-        names = [q["name"] for q in st.session_state.preguntas]
-        if len(names) != len(set(names)):
+        validacion = validar_dependencias(
+            st.session_state.preguntas, st.session_state.reglas_visibilidad,
+            st.session_state.reglas_finalizar, st.session_state.paginas
+        )
+        if _hay_names_duplicados():
             st.error("Hay 'name' duplicados. Edita las preguntas para que cada 'name' sea único.")
+        elif validacion["errores"]:
+            st.error("Corrige estas referencias antes de exportar:\n\n" + "\n".join(f"- {e}" for e in validacion["errores"]))
         else:
-            df_survey, df_choices, df_settings = construir_xlsform(
-                st.session_state.preguntas,
-                form_title=(f"Encuesta comunidad – {delegacion.strip()}" if delegacion.strip() else "Encuesta comunidad"),
+            if validacion["avisos"]:
+                st.warning("Revisa (no impide exportar):\n\n" + "\n".join(f"- {a}" for a in validacion["avisos"]))
+            build_args = dict(
+                form_title=titulo_formulario(delegacion),
                 idioma="es",
                 version=(version.strip() or datetime.now().strftime("%Y%m%d%H%M")),
+            )
+            clave = clave_xlsform(
+                st.session_state,
+                st.session_state.preguntas,
                 reglas_vis=st.session_state.reglas_visibilidad,
-                reglas_fin=st.session_state.reglas_finalizar
+                reglas_fin=st.session_state.reglas_finalizar,
+                logo_media_name=_get_logo_media_name(),
+                **build_args
+            )
+            df_survey, df_choices, df_settings, xlsx_bytes, stats = _construir_xlsform_memo(
+                clave,
+                st.session_state.preguntas,
+                _reglas_vis=st.session_state.reglas_visibilidad,
+                _reglas_fin=st.session_state.reglas_finalizar,
+                _estado=st.session_state,
+                _logo_media_name=_get_logo_media_name(),
+                _frag_cache=st.session_state.xlsform_frag_cache,
+                **build_args
             )
             st.success("XLSForm construido. Vista previa:")
+            if stats.get("bytes_antes"):
+                st.caption(
+                    f"Expresiones relevant optimizadas: {stats['bytes_antes']:,} → {stats['bytes_despues']:,} bytes "
+                    f"({stats['bytes_antes'] - stats['bytes_despues']:,} bytes menos)."
+                )
             c1, c2, c3 = st.columns(3)
             c1.markdown("**Hoja: survey**");   c1.dataframe(df_survey, use_container_width=True, hide_index=True)
             c2.markdown("**Hoja: choices**");  c2.dataframe(df_choices, use_container_width=True, hide_index=True)
             c3.markdown("**Hoja: settings**"); c3.dataframe(df_settings, use_container_width=True, hide_index=True)
 
             nombre_archivo = slugify_name(form_title) + "_xlsform.xlsx"
-            descargar_excel_xlsform(df_survey, df_choices, df_settings, nombre_archivo)
+            descargar_excel_xlsform(df_survey, df_choices, df_settings, nombre_archivo, data=xlsx_bytes)
+
+            # Proyecto listo para Survey123 Connect: <encuesta>/<encuesta>.xlsx + media/<logo>
+            carpeta = slugify_name(form_title)
+            st.download_button(
+                "📦 Descargar proyecto Survey123 Connect (.zip)",
+                data=bundle_survey123_bytes(
+                    carpeta, xlsx_bytes=xlsx_bytes,
+                    logo_media_name=_get_logo_media_name(), logo_bytes=_get_logo_bytes()
+                ),
+                file_name=f"{carpeta}_survey123.zip",
+                mime="application/zip",
+                use_container_width=True
+            )
+
+            # Formato de encuesta en Word / PDF (mismas páginas y preguntas, para aplicar en papel)
+            cw, cp = st.columns(2)
+            cw.download_button(
+                "📄 Descargar formato de encuesta (Word)",
+                data=word_encuesta_bytes(
+                    st.session_state.preguntas, build_args["form_title"], st.session_state, logo_bytes=_get_logo_bytes()
+                ),
+                file_name=f"{carpeta}_formato.docx",
+                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                use_container_width=True
+            )
+            cp.download_button(
+                "🖨️ Descargar formato de encuesta (PDF)",
+                data=pdf_encuesta_bytes(
+                    st.session_state.preguntas, build_args["form_title"], st.session_state, logo_bytes=_get_logo_bytes()
+                ),
+                file_name=f"{carpeta}_formato.pdf",
+                mime="application/pdf",
+                use_container_width=True
+            )
 
             if st.session_state.get("_logo_bytes"):
                 st.download_button(
@@ -2094,10 +950,52 @@ if st.button("🧮 Construir XLSForm", use_container_width=True, disabled=not st
                     use_container_width=True
                 )
 
-            st.info("Publica en Survey123 Connect: crea encuesta desde archivo, copia el logo a `media/` y publica.")
+            st.info("Publica en Survey123 Connect: descomprime el .zip en la carpeta de encuestas de Connect "
+                    "(ya incluye `media/` con el logo) o crea la encuesta desde el XLSForm y copia el logo a `media/`.")
     except Exception as e:
         st.error(f"Ocurrió un error al generar el XLSForm: {e}")
 
+# ------------------------------------------------------------------------------------------
+# Lote por delegaciones: un XLSForm por delegación en un solo .zip
+# ------------------------------------------------------------------------------------------
+with st.expander("🏘️ Generar lote por delegaciones (.zip)", expanded=False):
+    st.caption(
+        "Genera el mismo cuestionario para varias delegaciones (título “Encuesta comunidad – <delegación>”). "
+        "Cada delegación queda en su carpeta con su XLSForm y el logo en `media/`. "
+        "Para logo o subconjunto de cantones por delegación usa la CLI: `python motor_xlsform.py proyecto.json --delegaciones delegaciones.json`."
+    )
+    lote_txt = st.text_area("Delegaciones (una por línea)", value="", height=130, key="lote_delegaciones_txt")
+    lw, lp = st.columns(2)
+    lote_word = lw.checkbox("Incluir formato Word (.docx) por delegación", value=False, key="lote_incluir_word")
+    lote_pdf = lp.checkbox("Incluir formato PDF por delegación", value=False, key="lote_incluir_pdf")
+    if st.button("📦 Generar lote", use_container_width=True, disabled=not st.session_state.preguntas, key="btn_lote_delegaciones"):
+        nombres = [d.strip() for d in lote_txt.splitlines() if d.strip()]
+        if not nombres:
+            st.error("Indica al menos una delegación.")
+        else:
+            try:
+                logo_bytes = _get_logo_bytes()
+                proyecto = proyecto_a_dict(
+                    st.session_state, form_title, "es",
+                    (version.strip() or datetime.now().strftime("%Y%m%d%H%M")),
+                    logo_media_name=_get_logo_media_name()
+                )
+                with st.spinner(f"Construyendo {len(nombres)} XLSForms..."):
+                    zip_bytes = construir_lote_delegaciones(
+                        proyecto, nombres, logo_media_name=_get_logo_media_name(), logo_bytes=logo_bytes,
+                        incluir_word=lote_word, incluir_pdf=lote_pdf
+                    )
+                st.success(f"Lote generado: {len(nombres)} delegaciones.")
+                st.download_button(
+                    "📥 Descargar lote (.zip)",
+                    data=zip_bytes,
+                    file_name="lote_delegaciones_xlsform.zip",
+                    mime="application/zip",
+                    use_container_width=True
+                )
+            except Exception as e:
+                st.error(f"No se pudo generar el lote: {e}")
+
 
 
 
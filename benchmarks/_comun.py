@@ -0,0 +1,28 @@
+"""Utilidades compartidas por los scripts de benchmarks/ (se ejecutan desde la raíz del repo)."""
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+SALIDA = os.path.join(RAIZ, "bench_output.txt")
+
+
+def cronometrar(fn, *args, repeticiones: int = 3, **kwargs):
+    """Mejor tiempo (s) de `repeticiones` llamadas y el resultado de la última."""
+    mejor, res = float("inf"), None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        res = fn(*args, **kwargs)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, res
+
+
+def reportar(titulo: str, lineas):
+    """Imprime el resultado y lo agrega a bench_output.txt (ignorado por git)."""
+    texto = "\n".join([f"== {titulo}", *lineas]) + "\n"
+    print(texto, end="")
+    with open(SALIDA, "a", encoding="utf-8") as f:
+        f.write(texto)
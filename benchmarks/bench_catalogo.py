@@ -0,0 +1,66 @@
+"""
+Inserciones en el catálogo (choices_ext_rows) con append_choice_unique vs el recorrido lineal anterior.
+
+    python benchmarks/bench_catalogo.py [n ...]
+
+Por defecto 10 000, 50 000 y 100 000 filas (un cantón cada 20 distritos, ~5 % de filas repetidas).
+El recorrido lineal es O(n²): solo se mide hasta 10 000 filas.
+"""
+import sys
+
+from _comun import cronometrar, reportar
+
+import motor_xlsform as m
+
+MAX_ANTERIOR = 10_000
+
+
+def filas(n: int):
+    rows = []
+    for i in range(n):
+        if i % 20 == 0:
+            rows.append({"list_name": "list_canton", "name": f"canton_{i // 20}", "label": f"Cantón {i // 20}"})
+        elif i % 20 == 19:
+            rows.append(dict(rows[-3]))  # repetida: no se agrega
+        else:
+            rows.append({"list_name": "list_distrito", "name": f"distrito_{i}", "label": f"Distrito {i}",
+                         "canton_key": f"canton_{i // 20}"})
+    return rows
+
+
+def insertar_anterior(rows):
+    """Como _append_choice_unique antes del índice: recorre todo el catálogo en cada inserción."""
+    catalogo = []
+    for row in rows:
+        key = (row.get("list_name"), row.get("name"))
+        if not any((r.get("list_name"), r.get("name")) == key for r in catalogo):
+            catalogo.append(row)
+    return catalogo
+
+
+def insertar(rows):
+    estado = {}
+    m.inicializar_estado(estado)
+    m.set_catalogo(estado, [])
+    for row in rows:
+        m.append_choice_unique(estado, row)
+    return estado["choices_ext_rows"]
+
+
+def main():
+    tamanos = [int(a) for a in sys.argv[1:]] or [10_000, 50_000, 100_000]
+    lineas = []
+    for n in tamanos:
+        rows = filas(n)
+        t_nuevo, nuevo = cronometrar(insertar, rows)
+        linea = f"{n} inserciones ({len(nuevo)} únicas): índice {t_nuevo:.3f} s"
+        if n <= MAX_ANTERIOR:
+            t_ant, anterior = cronometrar(insertar_anterior, rows, repeticiones=1)
+            assert anterior == nuevo
+            linea += f" | recorrido lineal {t_ant:.2f} s"
+        lineas.append(linea)
+    reportar("append_choice_unique", lineas)
+
+
+if __name__ == "__main__":
+    main()
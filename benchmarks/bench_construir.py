@@ -0,0 +1,69 @@
+"""
+construir_xlsform sobre un formulario grande (el seed replicado hasta n preguntas, con reglas de finalización).
+
+    python benchmarks/bench_construir.py [n] [ruta/a/motor_xlsform.py]
+
+Por defecto n = 5000 y el motor_xlsform del repo. Pasar otra ruta permite comparar contra una versión
+anterior, p. ej. `git show <commit>:motor_xlsform.py > /tmp/motor_viejo.py`.
+Mide el mejor de 3 (tiempo de pared) y el pico de memoria trazada de un build.
+"""
+import importlib.util
+import sys
+import tracemalloc
+
+from _comun import cronometrar, reportar
+
+
+def cargar_motor(ruta: str = None):
+    if not ruta:
+        import motor_xlsform
+        return motor_xlsform
+    spec = importlib.util.spec_from_file_location("motor_bench", ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def formulario_grande(m, n: int):
+    estado = {}
+    m.inicializar_estado(estado)
+    seed = m.seed_preguntas()
+    preguntas = []
+    for k in range(n):
+        q = dict(seed[k % len(seed)])
+        if k >= len(seed):
+            q["name"] = f"{q['name']}_{k}"
+        q["qid"] = f"bench_{k}"
+        preguntas.append(q)
+    # Una regla de finalización cada ~500 preguntas sobre selecciones únicas con opciones
+    reglas_fin = []
+    for i, q in enumerate(preguntas):
+        if i % 500 == 10 and q.get("opciones"):
+            reglas_fin.append({"src": q["name"], "op": "=", "values": [m.slugify_name(q["opciones"][-1])],
+                               "index_src": i})
+    return preguntas, reglas_fin, estado
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    ruta = sys.argv[2] if len(sys.argv) > 2 else None
+    m = cargar_motor(ruta)
+    preguntas, reglas_fin, estado = formulario_grande(m, n)
+
+    def build():
+        return m.construir_xlsform(preguntas, "Benchmark", "es", "1", [], reglas_fin, estado)
+
+    t, (survey, choices, _) = cronometrar(build)
+    tracemalloc.start()
+    build()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    reportar(f"construir_xlsform ({ruta or 'motor_xlsform.py del repo'})", [
+        f"{n} preguntas, {len(reglas_fin)} reglas de finalización: survey {survey.shape[0]} filas, "
+        f"choices {choices.shape[0]} filas",
+        f"mejor de 3: {t:.3f} s | pico de memoria trazada: {pico / 1e6:.1f} MB",
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+slugify_name: versión anterior (siete re.sub) vs tabla de transliteración + memo.
+
+    python benchmarks/bench_slug.py [n]
+
+n etiquetas estilo catálogo (por defecto 100 000), repetidas y todas distintas.
+Antes de medir verifica que ambas versiones den el mismo resultado.
+"""
+import random
+import re
+import sys
+
+from _comun import cronometrar, reportar
+
+import motor_xlsform as m
+
+
+def slugify_anterior(texto: str) -> str:
+    if not texto:
+        return "campo"
+    t = texto.lower()
+    t = re.sub(r"[áàäâ]", "a", t)
+    t = re.sub(r"[éèëê]", "e", t)
+    t = re.sub(r"[íìïî]", "i", t)
+    t = re.sub(r"[óòöô]", "o", t)
+    t = re.sub(r"[úùüû]", "u", t)
+    t = re.sub(r"ñ", "n", t)
+    t = re.sub(r"[^a-z0-9]+", "_", t).strip("_")
+    return t or "campo"
+
+
+def etiquetas(n: int, distintas: bool):
+    rnd = random.Random(2026)
+    base = [c["canton"] for c in m.cargar_catalogo_poblados()]
+    base += [d for c in m.cargar_catalogo_poblados() for d in c["distritos"]]
+    base += ["Sí", "No", "No sabe / No responde", "Muy inseguro", "Inseguro", "Ni seguro ni inseguro"]
+    if distintas:
+        return [f"{rnd.choice(base)} {i}" for i in range(n)]
+    return [rnd.choice(base) for _ in range(n)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lineas = []
+    for distintas in (False, True):
+        textos = etiquetas(n, distintas)
+        assert [m.slugify_name(t) for t in textos] == [slugify_anterior(t) for t in textos]
+
+        t_ant, _ = cronometrar(lambda: [slugify_anterior(t) for t in textos])
+        t_frio = float("inf")
+        for _ in range(3):
+            m._slug.cache_clear()
+            t, _ = cronometrar(lambda: [m.slugify_name(t) for t in textos], repeticiones=1)
+            t_frio = min(t_frio, t)
+        t_tibio, _ = cronometrar(lambda: [m.slugify_name(t) for t in textos])
+        tipo = "distintas" if distintas else "repetidas"
+        lineas.append(f"{n} etiquetas {tipo}: anterior {t_ant:.3f} s | nueva en frío {t_frio:.3f} s | "
+                      f"nueva con memo {t_tibio:.3f} s")
+    reportar("slugify_name", lineas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3706 @@
+# -*- coding: utf-8 -*-
+# ==========================================================================================
+# Motor XLSForm (sin Streamlit): Encuesta Comunidad → XLSForm para ArcGIS Survey123
+# - Helpers (slug, nombres únicos, tipos, expresiones relevant)
+# - Catálogo Cantón→Distrito (índice + estadísticas) sobre un mapping de estado
+#   (st.session_state en la app, dict en la CLI / procesos batch)
+# - Textos fijos, seed del cuestionario y construcción de survey/choices/settings
+# - Proyecto Survey123 Connect en .zip: <encuesta>/<encuesta>.xlsx + media/ (logo y CSV externos)
+# - Formato de encuesta en Word (.docx) y PDF para aplicar en papel
+# - Lote por delegaciones: un XLSForm por delegación (pool de procesos) en un solo .zip
+# - Archivo de proyecto versionado y compacto (.json / .json.gz), migrado y validado al cargar
+# - Importar un XLSForm .xlsx existente como proyecto editable, o el Formato de encuesta .docx como borrador
+# - CLI: proyecto JSON → XLSForm .xlsx (o .zip por delegaciones, o .docx / .pdf); XLSForm .xlsx / Formato .docx → proyecto .json
+#
+#   python motor_xlsform.py proyecto_encuesta.json -o encuesta_xlsform.xlsx
+#   python motor_xlsform.py proyecto_encuesta.json -o encuesta_survey123.zip
+#   python motor_xlsform.py proyecto_encuesta.json -o encuesta_formato.docx
+#   python motor_xlsform.py proyecto_encuesta.json -o encuesta_formato.pdf
+#   python motor_xlsform.py encuesta_xlsform.xlsx -o proyecto_encuesta.json
+#   python motor_xlsform.py "Formato de encuesta Comunidad 2026.docx" -o proyecto_encuesta.json
+#   python motor_xlsform.py proyecto_encuesta.json --delegaciones delegaciones.json -o lote.zip
+# ==========================================================================================
+
+import io
+import os
+import re
+import csv
+import sys
+import time
+import json
+import uuid
+import gzip
+import hashlib
+import functools
+import unicodedata
+import zipfile
+import bisect
+import shutil
+import tempfile
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from types import MappingProxyType
+from typing import List, Dict, Optional, Tuple
+
+import pandas as pd
+import xlsxwriter
+from openpyxl import load_workbook
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Cm, Pt
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import KeepTogether, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from xml.sax.saxutils import escape as xml_escape
+from PIL import Image as PILImage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_LOGO_MEDIA_NAME = "001.png"
+MATRIZ_9_LABEL_DEFAULT = "9. En términos de seguridad, indique qué tan seguros percibe los siguientes espacios de su distrito."
+# Filas de la matriz 9 (se agrupan en un table-list al emitir la hoja survey)
+MATRIZ_9_NAMES = frozenset({
+    "seg_discotecas_bares",
+    "seg_espacios_recreativos",
+    "seg_lugar_residencia",
+    "seg_paradas_estaciones",
+    "seg_puentes_peatonales",
+    "seg_transporte_publico",
+    "seg_zona_bancaria",
+    "seg_zona_comercio",
+    "seg_zonas_residenciales",
+    "seg_zonas_francas",
+    "seg_lugares_turisticos",
+    "seg_centros_educativos",
+})
+
+# ------------------------------------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------------------------------------
+TIPOS = [
+    "Texto (corto)",
+    "Párrafo (texto largo)",
+    "Número",
+    "Selección única",
+    "Selección múltiple",
+    "Fecha",
+    "Hora",
+    "GPS (ubicación)",
+]
+
+def _tabla_transliteracion() -> Dict[int, str]:
+    """Letras latinas con diacríticos (Latin-1, Extended-A/B, Extended Additional) → ASCII; marcas combinantes → ""."""
+    tabla = {cp: "" for cp in range(0x0300, 0x0370)}
+    for cp in list(range(0x00C0, 0x0250)) + list(range(0x1E00, 0x1F00)):
+        base = "".join(ch for ch in unicodedata.normalize("NFKD", chr(cp).lower()) if not unicodedata.combining(ch))
+        if base.isascii() and base.isalnum():
+            tabla[cp] = base
+    tabla.update({ord(k): v for k, v in {
+        "ß": "ss", "æ": "ae", "œ": "oe", "ø": "o", "đ": "d", "ð": "d", "ł": "l", "þ": "th", "ı": "i", "ŧ": "t", "ħ": "h",
+    }.items()})
+    return tabla
+
+_TRANSLITERACION = _tabla_transliteracion()
+_NO_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+@functools.lru_cache(maxsize=65536)
+def _slug(texto: str) -> str:
+    return _NO_SLUG_RE.sub("_", texto.lower().translate(_TRANSLITERACION)).strip("_") or "campo"
+
+def slugify_name(texto: str) -> str:
+    """Una pasada: minúsculas + tabla de transliteración + un solo regex (memo acotado: se repiten mucho)."""
+    if not texto:
+        return "campo"
+    return _slug(texto)
+
+def asegurar_nombre_unico(base: str, usados, siguiente: Dict = None) -> str:
+    """
+    Primer name libre entre base, base_2, base_3, ... (no lo registra en `usados`: lo hace quien llama).
+    siguiente (opcional): {base: próximo sufijo a probar} que se conserva entre llamadas; así asignar
+    muchos names con la misma base es O(1) amortizado en vez de volver a probar desde _2.
+    """
+    if base not in usados:
+        return base
+    i = siguiente.get(base, 2) if siguiente is not None else 2
+    while f"{base}_{i}" in usados:
+        i += 1
+    if siguiente is not None:
+        siguiente[base] = i + 1
+    return f"{base}_{i}"
+
+def map_tipo_to_xlsform(tipo_ui: str, name: str):
+    if tipo_ui == "Texto (corto)":
+        return ("text", None, None)
+    if tipo_ui == "Párrafo (texto largo)":
+        return ("text", "multiline", None)
+    if tipo_ui == "Número":
+        return ("integer", None, None)
+    if tipo_ui == "Selección única":
+        return (f"select_one list_{name}", None, f"list_{name}")
+    if tipo_ui == "Selección múltiple":
+        return (f"select_multiple list_{name}", None, f"list_{name}")
+    if tipo_ui == "Fecha":
+        return ("date", None, None)
+    if tipo_ui == "Hora":
+        return ("time", None, None)
+    if tipo_ui == "GPS (ubicación)":
+        return ("geopoint", None, None)
+    return ("text", None, None)
+
+def xlsform_or_expr(conds):
+    if not conds:
+        return None
+    if len(conds) == 1:
+        return conds[0]
+    return "(" + " or ".join(conds) + ")"
+
+def xlsform_not(expr):
+    if not expr:
+        return None
+    return f"not({expr})"
+
+def build_relevant_expr(rules_for_target: List[Dict]):
+    or_parts = []
+    for r in rules_for_target:
+        src = r["src"]
+        op = r.get("op", "=")
+        vals = r.get("values", [])
+        if not vals:
+            continue
+
+        if op == "=":
+            segs = [f"${{{src}}}='{v}'" for v in vals]
+        elif op == "selected":
+            segs = [f"selected(${{{src}}}, '{v}')" for v in vals]
+        elif op == "!=":
+            segs = [f"${{{src}}}!='{v}'" for v in vals]
+        else:
+            segs = [f"${{{src}}}='{v}'" for v in vals]
+
+        or_parts.append(xlsform_or_expr(segs))
+    return xlsform_or_expr(or_parts)
+
+def titulo_formulario(delegacion: str) -> str:
+    return f"Encuesta comunidad – {delegacion.strip()}" if delegacion and delegacion.strip() else "Encuesta comunidad"
+
+def ensure_qid(q: Dict) -> Dict:
+    if "qid" not in q or not q["qid"]:
+        q["qid"] = str(uuid.uuid4())
+    return q
+
+# ------------------------------------------------------------------------------------------
+# Catálogo Cantón → Distritos (índice (list_name, name) + estadísticas incrementales)
+# ------------------------------------------------------------------------------------------
+PLACEHOLDER_KEYS = {("list_canton", "__pick_canton__"), ("list_distrito", "__pick_distrito__")}
+
+def _stats_catalogo_vacias() -> Dict:
+    return {"cantones_reales": 0, "distritos_reales": 0, "placeholders": 0}
+
+def _contar_fila_catalogo(stats: Dict, key, delta: int = 1):
+    """Actualiza las estadísticas del catálogo al agregar (delta=1) o quitar (delta=-1) una fila."""
+    list_name, name = key
+    if key in PLACEHOLDER_KEYS:
+        stats["placeholders"] += delta
+    elif name in (None, ""):
+        return
+    elif list_name == "list_canton":
+        stats["cantones_reales"] += delta
+    elif list_name == "list_distrito":
+        stats["distritos_reales"] += delta
+
+def set_catalogo(estado, rows: List[Dict]):
+    """
+    Reemplaza el catálogo y reconstruye el índice (list_name, name) → posición y las estadísticas.
+    Único punto de entrada para asignar choices_ext_rows (limpiar, importar JSON, etc.).
+    Si hay filas repetidas por (list_name, name) se conserva la primera.
+    """
+    filas = []
+    index = {}
+    stats = _stats_catalogo_vacias()
+    for r in rows:
+        key = (r.get("list_name"), r.get("name"))
+        if key in index:
+            continue
+        index[key] = len(filas)
+        filas.append(r)
+        _contar_fila_catalogo(stats, key)
+    estado["choices_ext_rows"] = filas
+    estado["choices_ext_index"] = index
+    estado["choices_ext_stats"] = stats
+    estado["choices_ext_sufijos"] = {}  # list_name → {base: próximo sufijo} (asegurar_nombre_unico)
+    estado["choices_ext_rev"] = estado.get("choices_ext_rev", 0) + 1
+
+def append_choice_unique(estado, row: Dict):
+    key = (row.get("list_name"), row.get("name"))
+    index = estado["choices_ext_index"]
+    if key not in index:
+        index[key] = len(estado["choices_ext_rows"])
+        estado["choices_ext_rows"].append(row)
+        _contar_fila_catalogo(estado["choices_ext_stats"], key)
+        estado["choices_ext_rev"] += 1
+
+class _NombresDeLista:
+    """`name in vista` sobre el índice del catálogo para una list_name, sin copiar los names a un set."""
+    __slots__ = ("index", "list_name")
+
+    def __init__(self, index: Dict, list_name: str):
+        self.index = index
+        self.list_name = list_name
+
+    def __contains__(self, name) -> bool:
+        return (self.list_name, name) in self.index
+
+def _distritos_existentes(estado) -> set:
+    return {(r.get("canton_key"), r.get("label")) for r in estado["choices_ext_rows"] if r.get("list_name") == "list_distrito"}
+
+def agregar_lote_catalogo(estado, canton: str, distritos: List[str], existentes: set = None) -> int:
+    """
+    Agrega un cantón y sus distritos (lote manual o importación). Idempotente: un distrito ya cargado
+    para el mismo cantón no se duplica. Los names de distrito son únicos en toda la lista (hay distritos
+    homónimos en cantones distintos). Devuelve cuántos distritos nuevos se agregaron.
+    """
+    if existentes is None:
+        existentes = _distritos_existentes(estado)
+    slug_c = slugify_name(canton)
+    append_choice_unique(estado, {"list_name": "list_canton", "name": slug_c, "label": canton})
+
+    usados = _NombresDeLista(estado["choices_ext_index"], "list_distrito")
+    siguiente = estado["choices_ext_sufijos"].setdefault("list_distrito", {})
+    n = 0
+    for d in distritos:
+        if (slug_c, d) in existentes:
+            continue
+        existentes.add((slug_c, d))
+        slug_d = asegurar_nombre_unico(slugify_name(d), usados, siguiente)
+        append_choice_unique(estado, {"list_name": "list_distrito", "name": slug_d, "label": d, "canton_key": slug_c})
+        n += 1
+    return n
+
+def hash_catalogo(estado) -> str:
+    """
+    Hash de contenido del catálogo. Se recalcula solo si el catálogo cambió desde el último cálculo
+    (choices_ext_rev se incrementa en cada mutación), así builds repetidos no vuelven a recorrerlo.
+    """
+    rev = estado["choices_ext_rev"]
+    cached = estado.get("choices_ext_hash")
+    if cached and cached[0] == rev:
+        return cached[1]
+    h = hashlib.sha256()
+    for r in estado["choices_ext_rows"]:
+        h.update(json.dumps(r, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        h.update(b"\n")
+    estado["choices_ext_hash"] = (rev, h.hexdigest())
+    return estado["choices_ext_hash"][1]
+
+def asegurar_placeholders_catalogo(estado):
+    """
+    FIX: Survey123 exige que existan list_canton/list_distrito en choices si se usan en survey.
+    Esto garantiza placeholders aun cuando el usuario NO agregue lotes.
+    """
+    estado["choices_extra_cols"].update({"canton_key", "any"})
+    append_choice_unique(estado, {"list_name": "list_canton", "name": "__pick_canton__", "label": "— escoja un cantón —"})
+    append_choice_unique(estado, {"list_name": "list_distrito", "name": "__pick_distrito__", "label": "— escoja un cantón —", "any": "1"})
+
+def hay_catalogo_real(estado) -> bool:
+    stats = estado["choices_ext_stats"]
+    return stats["cantones_reales"] > 0 and stats["distritos_reales"] > 0
+
+def filtrar_placeholders_si_hay_catalogo(estado, rows: List[Dict]) -> List[Dict]:
+    if not hay_catalogo_real(estado) or not estado["choices_ext_stats"]["placeholders"]:
+        return rows
+    return [r for r in rows if (r.get("list_name"), r.get("name")) not in PLACEHOLDER_KEYS]
+
+# ------------------------------------------------------------------------------------------
+# Importar catálogo completo desde la Base de Datos de Poblados 2021
+# ------------------------------------------------------------------------------------------
+BASE_POBLADOS_PATH = os.path.join(BASE_DIR, "Base de Datos Poblados por Regiones 2021.xlsx")
+BASE_POBLADOS_HOJA = "Orden por Delegacion y Region"
+CATALOGO_CACHE_DIR = os.path.join(BASE_DIR, ".cache_catalogo")
+
+def _hash_archivo(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _leer_base_poblados(path: str) -> List[Dict]:
+    """
+    Lee la hoja "Orden por Delegacion y Region" en modo read-only (streaming, fila por fila)
+    y devuelve [{"canton": ..., "distritos": [...]}, ...] en el orden del archivo, sin duplicados.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[BASE_POBLADOS_HOJA]
+        col_canton = col_distrito = None
+        distritos_por_canton = {}  # dict conserva el orden de aparición
+        for row in ws.iter_rows(values_only=True):
+            if col_canton is None:
+                heads = [str(v).strip() if v is not None else "" for v in row]
+                if "Nombre Cantón" in heads and "Nombre Distrito" in heads:
+                    col_canton = heads.index("Nombre Cantón")
+                    col_distrito = heads.index("Nombre Distrito")
+                continue
+            if len(row) <= max(col_canton, col_distrito):
+                continue
+            c, d = row[col_canton], row[col_distrito]
+            if c is None or d is None or not str(c).strip() or not str(d).strip():
+                continue
+            distritos_por_canton.setdefault(str(c).strip(), {})[str(d).strip()] = None
+    finally:
+        wb.close()
+
+    if col_canton is None:
+        raise ValueError(f"No se encontraron las columnas 'Nombre Cantón' / 'Nombre Distrito' en la hoja '{BASE_POBLADOS_HOJA}'.")
+    return [{"canton": c, "distritos": list(ds)} for c, ds in distritos_por_canton.items()]
+
+def cargar_catalogo_poblados(path: str = BASE_POBLADOS_PATH) -> List[Dict]:
+    """
+    Devuelve el catálogo Cantón→Distritos de la base de poblados.
+    El resultado se guarda en disco por hash del archivo: sesiones posteriores no vuelven a parsear el Excel.
+    """
+    cache_path = os.path.join(CATALOGO_CACHE_DIR, f"poblados_{_hash_archivo(path)}.json")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    catalogo = _leer_base_poblados(path)
+    try:
+        os.makedirs(CATALOGO_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(catalogo, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # sin permisos de escritura: se usa el catálogo sin caché
+    return catalogo
+
+def importar_catalogo_poblados(estado, catalogo: List[Dict]):
+    """
+    Agrega todos los cantones/distritos al catálogo en una sola pasada.
+    Es idempotente: un distrito ya cargado para el mismo cantón no se duplica.
+    """
+    estado["choices_extra_cols"].update({"canton_key", "any"})
+    asegurar_placeholders_catalogo(estado)
+
+    existentes = _distritos_existentes(estado)
+    n_cantones = n_distritos = 0
+    for item in catalogo:
+        n_distritos += agregar_lote_catalogo(estado, item["canton"], item["distritos"], existentes)
+        n_cantones += 1
+
+    return n_cantones, n_distritos
+
+# ------------------------------------------------------------------------------------------
+# Estado del proyecto (mapping): preguntas, reglas, textos fijos y catálogo
+# ------------------------------------------------------------------------------------------
+def inicializar_estado(estado):
+    """Completa en `estado` las claves que falten (no pisa lo existente) y deja el catálogo indexado."""
+    if "preguntas" not in estado:
+        estado["preguntas"] = []
+    if "reglas_visibilidad" not in estado:
+        estado["reglas_visibilidad"] = []
+    if "reglas_finalizar" not in estado:
+        estado["reglas_finalizar"] = []
+    if "textos_fijos" not in estado:
+        estado["textos_fijos"] = {"matriz_9_label": MATRIZ_9_LABEL_DEFAULT}
+    if "choices_ext_rows" not in estado:
+        estado["choices_ext_rows"] = []  # filas para hoja choices
+    if "choices_extra_cols" not in estado:
+        estado["choices_extra_cols"] = set()
+    if "paginas" not in estado:
+        estado["paginas"] = paginas_por_defecto()
+
+    # Índice hash + estadísticas del catálogo (viven junto a la lista de filas; se reconstruyen si faltan o quedaron desfasados)
+    if ("choices_ext_index" not in estado
+            or "choices_ext_stats" not in estado
+            or "choices_ext_sufijos" not in estado
+            or len(estado["choices_ext_index"]) != len(estado["choices_ext_rows"])):
+        set_catalogo(estado, estado["choices_ext_rows"])
+    asegurar_placeholders_catalogo(estado)
+    return estado
+
+# ------------------------------------------------------------------------------------------
+# Intro (Página 1)
+# ------------------------------------------------------------------------------------------
+INTRO_COMUNIDAD = (
+    "Con el fin de hacer más segura nuestra comunidad, deseamos concentrarnos en los problemas "
+    "de seguridad más importantes. Queremos trabajar en conjunto con el gobierno local, otras "
+    "instituciones y la comunidad para reducir los delitos y riesgos que afectan a las personas. "
+    "Es importante recordarle que la información que usted nos proporcione es confidencial y se "
+    "utilizará únicamente para mejorar la seguridad en nuestra área."
+)
+
+
+# ------------------------------------------------------------------------------------------
+# Consentimiento informado (Página 2)
+# ------------------------------------------------------------------------------------------
+CONSENTIMIENTO_TITULO = "Consentimiento Informado para la Participación en la Encuesta"
+CONSENT_SI = slugify_name("Sí")
+CONSENT_NO = slugify_name("No")
+
+CONSENTIMIENTO_BLOQUES = [
+    "Usted está siendo invitado(a) a participar de forma libre y voluntaria en una encuesta sobre seguridad, convivencia y percepción ciudadana, dirigida a personas mayores de 18 años.",
+    "El objetivo de esta encuesta es recopilar información de carácter preventivo y estadístico, con el fin de apoyar la planificación de acciones de prevención, mejora de la convivencia y fortalecimiento de la seguridad en comunidades y zonas comerciales.",
+    "La participación es totalmente voluntaria. Usted puede negarse a responder cualquier pregunta, así como retirarse de la encuesta en cualquier momento, sin que ello genere consecuencia alguna.",
+    "De conformidad con lo dispuesto en el artículo 5 de la Ley N.º 8968 (Protección de la Persona frente al Tratamiento de sus Datos Personales), se le informa que:",
+    "Finalidad del tratamiento: La información recopilada será utilizada exclusivamente para fines estadísticos, analíticos y preventivos, y no para investigaciones penales, procesos judiciales, sanciones administrativas ni procedimientos disciplinarios.",
+    "Datos personales: Algunos apartados permiten, de forma voluntaria, el suministro de datos personales o información de contacto.",
+    "Tratamiento de los datos: Los datos serán almacenados, analizados y resguardados bajo criterios de confidencialidad y seguridad, conforme a la normativa vigente.",
+    "Destinatarios y acceso: La información será conocida únicamente por el personal autorizado de la Fuerza Pública / Ministerio de Seguridad Pública, para los fines indicados. No será cedida a terceros ajenos a estos fines.",
+    "Responsable de la base de datos: El Ministerio de Seguridad Pública, a través de la Dirección de Programas Policiales Preventivos, Oficina Estrategia Integral de Prevención para la Seguridad Pública (EIPESP / Estrategia Sembremos Seguridad), será responsable del tratamiento y custodia de la información recolectada.",
+    "Derechos de la persona participante: Usted conserva el derecho a la autodeterminación informativa y a decidir libremente sobre el suministro de sus datos.",
+    "Las respuestas brindadas no constituyen denuncias formales, ni sustituyen los mecanismos legales correspondientes.",
+    "Al continuar con la encuesta, usted manifiesta haber leído y comprendido la información anterior y otorga su consentimiento informado para participar."
+]
+
+INTRO_PERCEPCION_DISTRITO = (
+    "En esta sección le preguntaremos sobre cómo percibe la seguridad en su distrito. "
+    "Las siguientes preguntas buscan conocer su opinión y experiencia sobre la seguridad en el lugar "
+    "donde vive o trabaja, así como en los distintos espacios que forman parte del distrito. "
+    "Nos interesa saber cómo siente y cómo observa la seguridad, cuáles lugares le generan mayor o menor "
+    "tranquilidad y si considera que la situación ha mejorado, empeorado o se mantiene igual. "
+    "Sus respuestas nos ayudarán a identificar qué espacios generan mayor preocupación, entender por qué "
+    "se perciben como inseguros y conocer la forma en que las personas viven la seguridad en su entorno. "
+    "Esta información se utilizará para apoyar el análisis de la situación del distrito y orientar acciones "
+    "de mejora y prevención. No hay respuestas correctas o incorrectas. Le pedimos responder con sinceridad, "
+    "según su experiencia y percepción personal."
+)
+
+INTRO_RIESGOS_III = (
+    "A continuación, en esta sección le preguntaremos sobre situaciones o condiciones que pueden representar "
+    "riesgos para la convivencia y la seguridad en el distrito. "
+    "Estas preguntas no se refieren necesariamente a delitos, sino a situaciones, comportamientos o problemas "
+    "sociales que usted haya observado y que puedan generar preocupación, afectar la tranquilidad o aumentar "
+    "el riesgo de que ocurran hechos de inseguridad. "
+    "Nos interesa conocer qué situaciones están presentes en el distrito, con qué frecuencia se observan y en "
+    "qué espacios se presentan, según su experiencia y percepción. Sus respuestas ayudarán a identificar "
+    "factores de riesgo y a orientar acciones de prevención y atención a nivel local. "
+    "No existen respuestas correctas o incorrectas. Le pedimos responder con sinceridad, de acuerdo con lo que "
+    "ha visto o vivido en su entorno."
+)
+
+INTRO_DELITOS = (
+    "A continuación, se presenta una lista de delitos para que indique aquellos que, según su conocimiento u "
+    "observación, considera que se presentan en el distrito. La información recopilada tiene fines de análisis "
+    "preventivo y territorial, y no constituye una denuncia formal ni la confirmación judicial de hechos delictivos."
+)
+
+INTRO_VICT_VI = (
+    "A continuación, se presentan algunas preguntas relacionadas con situaciones de violencia intrafamiliar, "
+    "con el fin de conocer si usted o algún miembro de su hogar ha sido afectado directamente por este tipo de "
+    "situaciones en el distrito durante los últimos 12 meses. La información recopilada es confidencial y se utiliza "
+    "únicamente con fines de análisis y mejora de las acciones de prevención y atención."
+)
+
+INTRO_VICT_OTROS = (
+    "Las siguientes preguntas se refieren a otros delitos distintos a la violencia intrafamiliar, "
+    "que pudieron haber afectado a usted o a algún miembro de su hogar en el distrito durante los últimos 12 meses. "
+    "Estas preguntas buscan conocer la experiencia directa de victimización, así como aspectos relacionados con la "
+    "denuncia y las características generales del hecho. La información brindada no constituye denuncia formal ni "
+    "confirmación de hechos delictivos."
+)
+
+INTRO_CONFIANZA_POLICIAL = (
+    "A continuación, se presentará una lista de afirmaciones relacionadas con su percepción y confianza "
+    "en el cuerpo de policía que opera en su (Distrito) barrio."
+)
+
+INTRO_PROPUESTAS_CIUDADANAS = (
+    "Las siguientes preguntas tienen como objetivo conocer la percepción ciudadana sobre acciones que podrían "
+    "contribuir a la mejora de la seguridad desde el ámbito local e institucional. La información recolectada no "
+    "constituye una evaluación de la gestión ni implica asignación de competencias o responsabilidades."
+)
+
+# ------------------------------------------------------------------------------------------
+# Páginas del formulario (después de Intro + Consentimiento; solo si consentimiento = Sí)
+# ------------------------------------------------------------------------------------------
+# Las páginas son datos del proyecto (estado["paginas"]: orden, título, intro, relevant adicional y
+# notas) y cada pregunta lleva el id de su página en "pagina". PAGINAS_ENCUESTA es el juego por
+# defecto; sus "names" solo sirven para asignar página al seed y a proyectos JSON anteriores.
+PAGINA_CONSENTIMIENTO = "p2_consentimiento"
+
+PAGINAS_ENCUESTA = [
+    {
+        "id": "p3_demograficos",
+        "label": "I. DATOS DEMOGRÁFICOS",
+        "names": {"canton", "distrito", "edad_rango", "genero", "escolaridad", "relacion_zona"},
+        "intro": None,
+    },
+    {
+        "id": "p4_percepcion_distrito",
+        "label": "II. PERCEPCIÓN CIUDADANA DE SEGURIDAD EN EL DISTRITO",
+        "names": {
+            "percep_seg_distrito",
+            "motivos_inseguridad_distrito",
+            "otro_problema_inseg_distrito",
+            "cambio_seguridad_12m",
+            "motivo_cambio_12m",
+            "seg_discotecas_bares",
+            "seg_espacios_recreativos",
+            "seg_lugar_residencia",
+            "seg_paradas_estaciones",
+            "seg_puentes_peatonales",
+            "seg_transporte_publico",
+            "seg_zona_bancaria",
+            "seg_zona_comercio",
+            "seg_zonas_residenciales",
+            "seg_zonas_francas",
+            "seg_lugares_turisticos",
+            "seg_centros_educativos",
+            "foco_inseguridad",
+            "foco_inseguridad_otro",
+            "razones_foco_inseguridad",
+        },
+        "intro": INTRO_PERCEPCION_DISTRITO,
+    },
+    {
+        "id": "p5_riesgos_iii",
+        "label": "III. RIESGOS, DELITOS, VICTIMIZACIÓN Y EVALUACIÓN POLICIAL",
+        "names": {
+            "problematicas_distrito",
+            "problematicas_otro",
+            "carencias_inversion_social",
+            "carencias_inversion_social_otro",
+            "consumo_drogas_donde",
+            "infra_vial_deficiencias",
+            "puntos_venta_drogas",
+            "puntos_venta_drogas_otro",
+            "inseguridad_transporte",
+            "inseguridad_transporte_otro",
+        },
+        "intro": INTRO_RIESGOS_III,
+    },
+    {
+        "id": "p6_delitos",
+        "label": "Delitos",
+        "names": {
+            "delitos_lista",
+            "delitos_otro",
+            "venta_drogas_forma",
+            "venta_drogas_forma_otro",
+            "delitos_vida",
+            "delitos_sexuales",
+            "asaltos",
+            "estafas",
+            "robos",
+            "abandono",
+            "explotacion_infantil",
+            "delitos_ambientales",
+            "trata_personas",
+        },
+        "intro": INTRO_DELITOS,
+    },
+    {
+        "id": "p7_vict_vi",
+        "label": "Victimización — Apartado A: Violencia intrafamiliar",
+        "names": {"vi_12m", "vi_tipos", "vi_medidas_proteccion", "vi_valoracion_fp"},
+        "intro": INTRO_VICT_VI,
+    },
+    {
+        "id": "p8_vict_otros",
+        "label": "Victimización — Apartado B: Victimización por otros delitos",
+        "names": {
+            "vict_delito_12m",
+            "vict_301_robo_asalto",
+            "vict_301_hurto_danos",
+            "vict_301_estafas",
+            "vict_301_otros",
+            "vict_301_otros_detalle",
+            "vict_302_motivos_no_denuncia",
+            "vict_302_motivos_no_denuncia_otro",
+            "vict_303_horario",
+            "vict_304_modo",
+            "vict_304_modo_otro",
+        },
+        "intro": INTRO_VICT_OTROS,
+    },
+    {
+        "id": "p9_confianza_policial",
+        "label": "Confianza Policial",
+        "names": {
+            "identifica_policias",
+            "tipos_atencion",
+            "tipos_atencion_otro",
+            "nivel_confianza_policia",
+            "profesionalidad_fp",
+            "calidad_servicio_policial",
+            "satisfaccion_trabajo_preventivo",
+            "contribucion_presencia_policial",
+            "frecuencia_presencia_policial",
+            "presencia_consistente_dia",
+            "trato_justo_imparcial",
+            "expresar_quejas_sin_temor",
+            "info_veraz_clara_oportuna",
+        },
+        "intro": INTRO_CONFIANZA_POLICIAL,
+    },
+    {
+        "id": "p10_propuestas_ciudadanas",
+        "label": "Propuestas ciudadanas para la mejora de la seguridad",
+        "names": {
+            "propuestas_fp",
+            "propuestas_fp_otro",
+            "propuestas_muni",
+            "propuestas_muni_otro",
+            "info_persona_grupo_delito",
+            "info_persona_grupo_delito_detalle",
+            "contacto_voluntario",
+            "info_adicional_final",
+        },
+        "intro": INTRO_PROPUESTAS_CIUDADANAS,
+        "notas": [
+            "Información Adicional y Contacto Voluntario",
+            "Nota (Recuerde: su información es confidencial y voluntaria. No constituye denuncia formal).",
+        ],
+    },
+]
+
+_PAGINA_POR_NAME = {n: pag["id"] for pag in PAGINAS_ENCUESTA for n in pag["names"]}
+_PAGINA_POR_NAME["consentimiento"] = PAGINA_CONSENTIMIENTO
+
+def paginas_por_defecto() -> List[Dict]:
+    return [
+        {"id": pag["id"], "label": pag["label"], "intro": pag["intro"], "relevant": None, "notas": list(pag.get("notas") or [])}
+        for pag in PAGINAS_ENCUESTA
+    ]
+
+def pagina_de_pregunta(q) -> Optional[str]:
+    """Id de la página de la pregunta ("pagina"; si falta, la que le toca por name en el juego por defecto)."""
+    return q.get("pagina") or _PAGINA_POR_NAME.get(q.get("name"))
+
+def nuevo_id_pagina(label: str, paginas: List[Dict]) -> str:
+    usados = {pag["id"] for pag in paginas} | {PAGINA_CONSENTIMIENTO}
+    return asegurar_nombre_unico("p_" + (slugify_name(label) or "pagina"), usados)
+
+def agrupar_por_pagina(preguntas, paginas: List[Dict], idx_consent: Optional[int]) -> Dict[str, List[Tuple[int, Dict]]]:
+    """
+    Una sola pasada: id de página → [(índice, pregunta), ...] en el orden de la lista.
+    Una pregunta sin página válida (p. ej. recién agregada) cae en la última página: nunca se pierde.
+    """
+    por_pagina = {pag["id"]: [] for pag in paginas}
+    ultima = paginas[-1]["id"] if paginas else None
+    for i, q in enumerate(preguntas):
+        if i == idx_consent:
+            continue
+        pid = pagina_de_pregunta(q)
+        if pid not in por_pagina:
+            pid = ultima
+        if pid is not None:
+            por_pagina[pid].append((i, q))
+    return por_pagina
+
+# ------------------------------------------------------------------------------------------
+# Precarga de preguntas (seed)
+# ------------------------------------------------------------------------------------------
+def seed_preguntas() -> List[Dict]:
+    """Cuestionario base (Formato de encuesta Comunidad 2026). Devuelve una lista nueva en cada llamada."""
+    v_muy_inseguro = slugify_name("Muy inseguro")
+    v_inseguro = slugify_name("Inseguro")
+
+    # LISTA COMPARTIDA para la matriz (table-list)
+    LISTA_MATRIZ_SEG = "list_matriz_seguridad"
+
+    # Slugs útiles
+    SLUG_SI = slugify_name("Sí")
+
+    # Escala 1–10 (para confianza / profesionalidad / calidad / satisfacción / contribución)
+    ESCALA_1_10 = [str(i) for i in range(1, 11)]
+
+    seed = [
+        # ---------------- Consentimiento ----------------
+        {"tipo_ui": "Selección única",
+         "label": "¿Acepta participar en esta encuesta?",
+         "name": "consentimiento",
+         "required": True,
+         "opciones": ["Sí", "No"],
+         "appearance": "horizontal",
+         "choice_filter": None,
+         "relevant": None},
+
+        # ---------------- I. DATOS DEMOGRÁFICOS ----------------
+        {"tipo_ui": "Selección única", "label": "1. Cantón:", "name": "canton", "required": True,
+         "opciones": [], "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección única", "label": "2. Distrito:", "name": "distrito", "required": True,
+         "opciones": [], "appearance": None, "choice_filter": "canton_key=${canton}", "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "3. Edad (en años cumplidos): marque una categoría que incluya su edad.",
+         "name": "edad_rango",
+         "required": True,
+         "opciones": ["18 a 29 años", "30 a 44 años", "45 a 64 años", "65 años o más"],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "4. ¿Con cuál de estas opciones se identifica?",
+         "name": "genero",
+         "required": True,
+         "opciones": ["Femenino", "Masculino", "Persona no Binaria", "Prefiero no decir"],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "5. Escolaridad:",
+         "name": "escolaridad",
+         "required": True,
+         "opciones": [
+             "Ninguna",
+             "Primaria incompleta",
+             "Primaria completa",
+             "Secundaria incompleta",
+             "Secundaria completa",
+             "Técnico",
+             "Universitaria incompleta",
+             "Universitaria completa",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "6. ¿Cuál es su relación con la zona?",
+         "name": "relacion_zona",
+         "required": True,
+         "opciones": ["Vivo en la zona", "Trabajo en la zona", "Visito la zona", "Estudio en la zona"],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        # ---------------- II. PERCEPCIÓN CIUDADANA (7–11) ----------------
+        {"tipo_ui": "Selección única",
+         "label": "7. ¿Qué tan seguro percibe usted el distrito donde reside o transita?",
+         "name": "percep_seg_distrito",
+         "required": True,
+         "opciones": ["Muy inseguro", "Inseguro", "Ni seguro ni inseguro", "Seguro", "Muy seguro"],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "7.1. Indique por qué considera el distrito inseguro (Marque todas las situaciones que usted percibe que ocurren con mayor frecuencia en su comunidad):",
+         "name": "motivos_inseguridad_distrito",
+         "required": True,
+         "opciones": [
+             "Venta o distribución de drogas",
+             "Consumo de drogas en espacios públicos",
+             "Consumo de alcohol en espacios públicos",
+             "Riñas o peleas frecuentes",
+             "Asaltos o robos a personas",
+             "Robos a viviendas o comercios",
+             "Amenazas y extorsiones",
+             "Balaceras, detonaciones o ruidos similares",
+             "Presencia de grupos que generan temor",
+             "Vandalismo o daños intencionales",
+             "Poca iluminación en calles o espacios públicos",
+             "Lotes baldíos o abandonados",
+             "Casas o edificios abandonados",
+             "Calles en mal estado",
+             "Falta de limpieza o acumulación de basura",
+             "Paradas de bus inseguras",
+             "Falta de cámaras de seguridad",
+             "Comercios inseguros o sin control",
+             "Daños frecuentes a la propiedad",
+             "Presencia de personas en situación de calle que influye en su percepción de seguridad",
+             "Presencia de personas en situación de ocio (sin actividad laboral o educativa)",
+             "Ventas informales (ambulantes)",
+             "Zona donde se ejerce prostitución",
+             "Problemas con transporte informal",
+             "Falta de patrullajes visibles",
+             "Falta de presencia policial en la zona",
+             "Situaciones de violencia intrafamiliar",
+             "Situaciones de violencia de género",
+             "Otro problema que considere importante",
+         ],
+         "appearance": None,
+         "choice_filter": None,
+         "relevant": xlsform_or_expr([
+             f"${{percep_seg_distrito}}='{v_muy_inseguro}'",
+             f"${{percep_seg_distrito}}='{v_inseguro}'"
+         ])},
+
+        {"tipo_ui": "Párrafo (texto largo)",
+         "label": "Indique cuál es ese otro problema importante:",
+         "name": "otro_problema_inseg_distrito",
+         "required": True,
+         "opciones": [],
+         "appearance": None,
+         "choice_filter": None,
+         "relevant": f"selected(${{motivos_inseguridad_distrito}}, '{slugify_name('Otro problema que considere importante')}')"},
+
+        {"tipo_ui": "Selección única",
+         "label": "8. En comparación con los 12 meses anteriores, ¿cómo percibe que ha cambiado la seguridad en este distrito?",
+         "name": "cambio_seguridad_12m",
+         "required": True,
+         "opciones": ["Mucho menos seguro (1)", "Menos seguro (2)", "Se mantiene igual (3)", "Más seguro (4)", "Mucho más seguro (5)"],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Párrafo (texto largo)",
+         "label": "8.1. Indique por qué (explique brevemente la razón de su respuesta anterior):",
+         "name": "motivo_cambio_12m",
+         "required": True,
+         "opciones": [],
+         "appearance": None, "choice_filter": None, "relevant": "string-length(${cambio_seguridad_12m})>0"},
+
+        # 9. MATRIZ (todas comparten list_override = LISTA_MATRIZ_SEG)
+        {"tipo_ui": "Selección única", "label": "Discotecas, bares, sitios de entretenimiento", "name": "seg_discotecas_bares",
+         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
+         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
+
+        {"tipo_ui": "Selección única", "label": "Espacios recreativos (parques, play, plaza de deportes)", "name": "seg_espacios_recreativos",
+         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
+         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
+
+        {"tipo_ui": "Selección única", "label": "Lugar de residencia (casa de habitación)", "name": "seg_lugar_residencia",
+         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
+         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
+
+        {"tipo_ui": "Selección única", "label": "Paradas y/o estaciones de buses, taxis, trenes", "name": "seg_paradas_estaciones",
+         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
+         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
+
+        {"tipo_ui": "Selección única", "label": "Puentes peatonales", "name": "seg_puentes_peatonales",
+         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
+         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
+
+        {"tipo_ui": "Selección única", "label": "Transporte público", "name": "seg_transporte_publico",
+         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
+         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
+
+        {"tipo_ui": "Selección única", "label": "Zona bancaria", "name": "seg_zona_bancaria",
+         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
+         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
+
+        {"tipo_ui": "Selección única", "label": "Zona de comercio", "name": "seg_zona_comercio",
+         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
+         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
+
+        {"tipo_ui": "Selección única", "label": "Zonas residenciales (calles y barrios, distinto a su casa)", "name": "seg_zonas_residenciales",
+         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
+         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
+
+        {"tipo_ui": "Selección única", "label": "Zonas francas", "name": "seg_zonas_francas",
+         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
+         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
+
+        {"tipo_ui": "Selección única", "label": "Lugares de interés turístico", "name": "seg_lugares_turisticos",
+         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
+         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
+
+        {"tipo_ui": "Selección única", "label": "Centros educativos", "name": "seg_centros_educativos",
+         "required": True, "opciones": ["Muy inseguro (1)", "Inseguro (2)", "Ni seguro ni inseguro (3)", "Seguro (4)", "Muy seguro (5)", "No aplica"],
+         "appearance": None, "choice_filter": None, "relevant": None, "list_override": LISTA_MATRIZ_SEG},
+
+        {"tipo_ui": "Selección única",
+         "label": "10. Desde su percepción ¿cuál considera que es el principal foco de inseguridad en el distrito?",
+         "name": "foco_inseguridad",
+         "required": True,
+         "opciones": [
+             "Discotecas, bares, sitios de entretenimiento",
+             "Espacios recreativos (parques, play, plaza de deportes)",
+             "Lugar de residencia (casa de habitación)",
+             "Paradas y/o estaciones de buses, taxis, trenes",
+             "Puentes peatonales",
+             "Transporte público",
+             "Zona bancaria",
+             "Zona comercial",
+             "Zonas francas",
+             "Zonas residenciales (calles y barrios, distinto a su casa)",
+             "Lugares de interés turístico",
+             "Centros educativos",
+             "Otros",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Texto (corto)",
+         "label": "Indique cuál es ese otro foco de inseguridad:",
+         "name": "foco_inseguridad_otro",
+         "required": True,
+         "opciones": [],
+         "appearance": None, "choice_filter": None, "relevant": f"${{foco_inseguridad}}='{slugify_name('Otros')}'"},
+
+        {"tipo_ui": "Párrafo (texto largo)",
+         "label": "11. Describa brevemente las razones por las cuales considera inseguro el tipo de espacio seleccionado en la pregunta anterior:",
+         "name": "razones_foco_inseguridad",
+         "required": True,
+         "opciones": [],
+         "appearance": None, "choice_filter": None, "relevant": "string-length(${foco_inseguridad})>0"},
+
+        # ---------------- III. RIESGOS (12–17) ----------------
+        {"tipo_ui": "Selección múltiple",
+         "label": "12. Según su conocimiento u observación, seleccione las problemáticas que afectan su distrito:",
+         "name": "problematicas_distrito",
+         "required": True,
+         "opciones": [
+             "Problemas vecinales o conflictos entre vecinos",
+             "Presencia de personas en situación de calle (personas que viven permanentemente en la vía pública)",
+             "Zona donde se ejerce prostitución",
+             "Desvinculación escolar (deserción escolar)",
+             "Falta de oportunidades laborales",
+             "Acumulación de basura, aguas negras o mal alcantarillado",
+             "Carencia o inexistencia de alumbrado público",
+             "Lotes baldíos",
+             "Cuarterías",
+             "Asentamientos informales o precarios",
+             "Pérdida de espacios públicos (parques, polideportivos u otros)",
+             "Consumo de alcohol en vía pública",
+             "Consumo de drogas en espacios públicos",
+             "Ventas informales (ambulantes)",
+             "Escándalos musicales o ruidos excesivos",
+             "Otro problema que considere importante",
+             "No se observan estas problemáticas en el distrito",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Párrafo (texto largo)",
+         "label": "Indique cuál es ese otro problema importante:",
+         "name": "problematicas_otro",
+         "required": True,
+         "opciones": [],
+         "appearance": None, "choice_filter": None,
+         "relevant": f"selected(${{problematicas_distrito}}, '{slugify_name('Otro problema que considere importante')}')"},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "13. En relación con la oferta de servicios y oportunidades en su distrito (Inversión social), indique cuáles de las siguientes carencias identifica:",
+         "name": "carencias_inversion_social",
+         "required": True,
+         "opciones": [
+             "Falta de oferta educativa",
+             "Falta de oferta deportiva",
+             "Falta de oferta recreativa",
+             "Falta de actividades culturales",
+             "No se observan carencias",
+             "Otro problema que considere importante",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Párrafo (texto largo)",
+         "label": "Indique cuál es esa otra carencia importante:",
+         "name": "carencias_inversion_social_otro",
+         "required": True,
+         "opciones": [],
+         "appearance": None, "choice_filter": None,
+         "relevant": f"selected(${{carencias_inversion_social}}, '{slugify_name('Otro problema que considere importante')}')"},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "14. En los casos en que se observa consumo de drogas en el distrito, indique dónde ocurre:",
+         "name": "consumo_drogas_donde",
+         "required": True,
+         "opciones": [
+             "Áreas públicas (calles, parques, paradas, espacios abiertos)",
+             "Áreas privadas (viviendas, locales, espacios cerrados)",
+             "No se observa consumo de drogas",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "15. Indique las principales deficiencias de infraestructura vial que afectan su distrito:",
+         "name": "infra_vial_deficiencias",
+         "required": True,
+         "opciones": [
+             "Calles en mal estado",
+             "Falta de señalización de tránsito",
+             "Carencia o inexistencia de aceras",
+             "No se observan dificiencias de infraestructura",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "16. Según su conocimiento u observación, indique en qué tipo de espacios se identifica la existencia de puntos de venta de drogas en el distrito:",
+         "name": "puntos_venta_drogas",
+         "required": True,
+         "opciones": [
+             "Casa de habitación (espacio cerrado)",
+             "Edificación abandonada",
+             "Lote baldío",
+             "Otro tipo de espacio",
+             "No se observa",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Texto (corto)",
+         "label": "Indique cuál es ese otro tipo de espacio:",
+         "name": "puntos_venta_drogas_otro",
+         "required": True,
+         "opciones": [],
+         "appearance": None, "choice_filter": None,
+         "relevant": f"selected(${{puntos_venta_drogas}}, '{slugify_name('Otro tipo de espacio')}')"},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "17. Según su conocimiento u observación, indique si ha identificado situaciones de inseguridad asociadas al uso de los siguientes medios o modalidades de transporte en su distrito:",
+         "name": "inseguridad_transporte",
+         "required": True,
+         "opciones": [
+             "Transporte informal o no autorizado (taxis piratas)",
+             "Plataformas de transporte digital",
+             "Transporte público (buses)",
+             "Servicios de reparto o mensajería “exprés” (por ejemplo, repartidores en motocicleta o bicimoto)",
+             "Otro tipo de situación relacionada con el transporte",
+             "No se observa",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Texto (corto)",
+         "label": "Indique cuál es ese otro tipo de situación relacionada con el transporte:",
+         "name": "inseguridad_transporte_otro",
+         "required": True,
+         "opciones": [],
+         "appearance": None, "choice_filter": None,
+         "relevant": f"selected(${{inseguridad_transporte}}, '{slugify_name('Otro tipo de situación relacionada con el transporte')}')"},
+
+        # ---------------- Delitos (18–28) ----------------
+        {"tipo_ui": "Selección múltiple",
+         "label": "18. Seleccione los delitos que, según su conocimiento u observación, se presentan en el distrito:",
+         "name": "delitos_lista",
+         "required": True,
+         "opciones": [
+             "Disturbios en vía pública (riñas o agresiones)",
+             "Daños a la propiedad (viviendas, comercios, vehículos u otros bienes)",
+             "Daños al poliducto (perforaciones, tomas ilegales o vandalismo)",
+             "Extorsión (amenazas o intimidación para exigir dinero u otros beneficios)",
+             "Hurto (sustracción de artículos mediante el descuido)",
+             "Compra o venta de artículos robados (receptación)",
+             "Contrabando (licor, cigarrillos, medicinas, ropa, calzado, etc.)",
+             "Maltrato animal",
+             "Tráfico de personas (coyotaje)",
+             "Otro delito",
+             "No se observan delitos",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Texto (corto)",
+         "label": "Indique cuál es ese otro delito:",
+         "name": "delitos_otro",
+         "required": True,
+         "opciones": [],
+         "appearance": None, "choice_filter": None,
+         "relevant": f"selected(${{delitos_lista}}, '{slugify_name('Otro delito')}')"},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "19. Según su conocimiento u observación, ¿de qué forma se presenta la venta de drogas en el distrito?",
+         "name": "venta_drogas_forma",
+         "required": True,
+         "opciones": [
+             "En espacios cerrados (casas, edificaciones u otros inmuebles)",
+             "En vía pública",
+             "De forma ocasional o móvil (sin punto fijo)",
+             "No se observa venta de drogas",
+             "Otro",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Texto (corto)",
+         "label": "Indique cuál es ese otro modo de venta de drogas:",
+         "name": "venta_drogas_forma_otro",
+         "required": True,
+         "opciones": [],
+         "appearance": None, "choice_filter": None,
+         "relevant": f"selected(${{venta_drogas_forma}}, '{slugify_name('Otro')}')"},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "20. Delitos contra la vida",
+         "name": "delitos_vida",
+         "required": True,
+         "opciones": [
+             "Homicidios (muerte intencional de una persona)",
+             "Personas heridas de forma intencional (heridos)",
+             "Femicide (homicidio de una mujer por razones de género)",
+             "No se observan delitos contra la vida",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "21. Delitos sexuales",
+         "name": "delitos_sexuales",
+         "required": True,
+         "opciones": [
+             "Abuso sexual (tocamientos u otros actos sexuales sin consentimiento)",
+             "Violación (acceso sexual sin consentimiento)",
+             "Acoso sexual (insinuaciones, solicitudes o conductas sexuales no deseadas)",
+             "Acoso callejero (comentarios, gestos o conductas sexuales en espacios públicos)",
+             "No se observan delitos sexuales",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "22. Asaltos",
+         "name": "asaltos",
+         "required": True,
+         "opciones": [
+             "Asalto a personas",
+             "Asalto a comercio",
+             "Asalto a vivienda",
+             "Asalto a transporte público",
+             "No se observan asaltos",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "23. Estafas",
+         "name": "estafas",
+         "required": True,
+         "opciones": [
+             "Billetes falsos",
+             "Documentos falsos",
+             "Estafas relacionadas con la compra o venta de oro",
+             "Lotería falsa",
+             "Estafas informáticas (por internet, redes sociales o correos electrónicos)",
+             "Estafas telefónicas",
+             "Estafas con tarjetas (clonación, cargos no autorizados)",
+             "No se observan estafas",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "24. Robo (Sustracción de artículos mediante la utilización de la fuerza)",
+         "name": "robos",
+         "required": True,
+         "opciones": [
+             "Robo a comercios",
+             "Robo a edificaciones",
+             "Robo a viviendas",
+             "Robo de vehículos completos",
+             "Robo a vehículos (tacha)",
+             "Robo de ganado (destace)",
+             "Robo de bienes agrícolas",
+             "Robo de cultivos",
+             "Robo de cable",
+             "No se observan robos",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "25. Abandono de personas",
+         "name": "abandono",
+         "required": True,
+         "opciones": [
+             "Abandono de adulto mayor",
+             "Abandono de menor de edad",
+             "Abandono de incapaz",
+             "No se observan situaciones de abandono",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "26. Explotación infantil",
+         "name": "explotacion_infantil",
+         "required": True,
+         "opciones": [
+             "Sexual",
+             "Laboral",
+             "No se observan",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "27. Delitos ambientales",
+         "name": "delitos_ambientales",
+         "required": True,
+         "opciones": [
+             "Caza ilegal",
+             "Pesca ilegal",
+             "Tala ilegal",
+             "Extracción ilegal de material minero",
+             "No se observan delitos ambientales",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "28. Trata de personas",
+         "name": "trata_personas",
+         "required": True,
+         "opciones": [
+             "Con fines laborales",
+             "Con fines sexuales",
+             "No se observan situaciones de trata de personas",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        # ---------------- Victimización — Apartado A: Violencia intrafamiliar (29–29.3) ----------------
+        {"tipo_ui": "Selección única",
+         "label": "29. Durante los últimos 12 meses, ¿usted o algún miembro de su hogar ha sido afectado por alguna situación de violencia intrafamiliar (violencia doméstica)?",
+         "name": "vi_12m",
+         "required": True,
+         "opciones": ["Sí", "No"],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "29.1. ¿Qué tipo(s) de violencia intrafamiliar (violencia doméstica) se presentaron?",
+         "name": "vi_tipos",
+         "required": True,
+         "opciones": [
+             "Violencia psicológica (gritos, amenazas, humillaciones, maltratos, entre otros)",
+             "Violencia física (agresiones físicas, empujones, golpes, entre otros)",
+             "Violencia vicaria (uso de hijas, hijos u otras personas para causar daño emocional)",
+             "Violencia patrimonial (destrucción, retención o control de bienes, documentos o dinero)",
+             "Violencia sexual (actos de carácter sexual sin consentimiento)",
+         ],
+         "appearance": None, "choice_filter": None, "relevant": f"${{vi_12m}}='{SLUG_SI}'"},
+
+        {"tipo_ui": "Selección única",
+        "label": "29.2 ¿En relación con la situación de violencia intrafamiliar indicada anteriormente, usted o algún miembro de su hogar solicitó medidas de protección?",
+        "name": "vi_medidas_proteccion",
+        "required": True,
+        "opciones": ["Sí", "No", "No recuerda"],
+        "appearance": None,
+        "choice_filter": None,
+        "relevant": f"${{vi_12m}}='{SLUG_SI}'"},
+
+        {"tipo_ui": "Selección única",
+        "label": "29.3. En caso de haber existido intervención de la Fuerza Pública, ¿Cómo valora el abordaje brindado?",
+        "name": "vi_valoracion_fp",
+        "required": True,
+        "opciones": ["Excelente", "Bueno", "Regular", "Malo", "Muy malo","No hubo intervención de la Fuerza Pública / No aplica "],
+        "appearance": None,
+        "choice_filter": None,
+        "relevant": f"${{vi_12m}}='{SLUG_SI}' and ${{vi_medidas_proteccion}}='{SLUG_SI}'"},
+
+
+        # ---------------- Victimización — Apartado B: Otros delitos (30–30.4) ----------------
+        {"tipo_ui": "Selección única",
+         "label": "30. Durante los últimos 12 meses, ¿usted o algún miembro de su hogar fue afectado por algún delito?",
+         "name": "vict_delito_12m",
+         "required": True,
+         "opciones": ["NO", "Sí, y denuncié", "Sí, pero no denuncié"],
+         "appearance": None, "choice_filter": None, "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": (
+             "30.1 ¿Cuál de las siguientes situaciones afectó a usted o a algún miembro de su hogar?\n\n"
+             "A. Robo y Asalto (Violencia y fuerza)\n\n"
+             "Seleccione las opciones que correspondan:"
+         ),
+         "name": "vict_301_robo_asalto",
+         "required": True,
+         "opciones": [
+             "Asalto a mano armada (amenaza con arma o uso de violencia) en la calle o espacio público.",
+             "Asalto en transporte público (bus, taxi, metro, etc.).",
+             "Asalto o robo de su vehículo (coche, motocicleta, etc.).",
+             "Robo de accesorios o partes de su vehículo (espejos, llantas, radio).",
+             "Robo o intento de robo con fuerza a su vivienda (ej. forzar una puerta o ventana).",
+             "Robo o intento de robo con fuerza a su comercio o negocio.",
+             "No aplica",
+         ],
+         "appearance": "columns", "choice_filter": None,
+         "relevant": f"${{vict_delito_12m}}!='{slugify_name('NO')}'"},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "30.1 B. Hurto y Daños (Sin violencia directa). Seleccione las opciones que correspondan:",
+         "name": "vict_301_hurto_danos",
+         "required": True,
+         "opciones": [
+             "Hurto de su cartera, bolso o celular (sin que se diera cuenta, por descuido).",
+             "Daños a su propiedad (ej. grafitis, rotura de cristales, destrucción de cercas).",
+             "Receptación (Alguien en su hogar compró o recibió un artículo que luego supo que era robado).",
+             "Pérdida de artículos (celular, bicicleta, etc.) por descuido.",
+             "No aplica",
+         ],
+         "appearance": "columns", "choice_filter": None,
+         "relevant": f"${{vict_delito_12m}}!='{slugify_name('NO')}'"},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "30.1 C. Fraude y Engaño (Estafas). Seleccione las opciones que correspondan:",
+         "name": "vict_301_estafas",
+         "required": True,
+         "opciones": [
+             "Estafa telefónica (ej. llamadas para pedir dinero o datos personales).",
+             "Estafa o fraude informático (ej. a través de internet, redes sociales o correo electrónico).",
+             "Fraude con tarjetas bancarias (clonación o uso no autorizado).",
+             "Ser víctima de billetes o documentos falsos.",
+             "No aplica",
+         ],
+         "appearance": "columns", "choice_filter": None,
+         "relevant": f"${{vict_delito_12m}}!='{slugify_name('NO')}'"},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "30.1 D. Otros delitos y problemas personales. Seleccione las opciones que correspondan:",
+         "name": "vict_301_otros",
+         "required": True,
+         "opciones": [
+             "Extorsión (intimidación o amenaza para obtener dinero u otro beneficio).",
+             "Maltrato animal (si usted o alguien de su hogar fue testigo o su mascota fue la víctima).",
+             "Acoso o intimidación sexual en un espacio público.",
+             "Algún tipo de delito sexual (abuso, violación).",
+             "Lesiones personales (haber sido herido en una riña o agresión).",
+             "No aplica",
+             "Otro.",
+         ],
+         "appearance": "columns", "choice_filter": None,
+         "relevant": f"${{vict_delito_12m}}!='{slugify_name('NO')}'"},
+
+        {"tipo_ui": "Párrafo (texto largo)",
+         "label": "30.1 Indique cuál fue ese otro delito o situación:",
+         "name": "vict_301_otros_detalle",
+         "required": True,
+         "opciones": [],
+         "appearance": "multiline",
+         "choice_filter": None,
+         "relevant": f"selected(${{vict_301_otros}}, '{slugify_name('Otro.')}')"},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "30.2 En caso de NO haber realizado la denuncia, indique ¿cuál o cuáles fueron el motivo?",
+         "name": "vict_302_motivos_no_denuncia",
+         "required": True,
+         "opciones": [
+             "Distancia o dificultad de acceso a oficinas para denunciar",
+             "Miedo a represalias.",
+             "Falta de respuesta o seguimiento en denuncias anteriores",
+             "Complejidad o dificultad para realizar la denuncia (trámites, requisitos, tiempo)",
+             "Desconocimiento de dónde colocar la denuncia (falta de información)",
+             "El Policía me dijo que era mejor no denunciar.",
+             "Falta de tiempo para colocar la denuncia",
+             "Desconfianza en las autoridades o en el proceso de denuncia",
+             "Otro motivo:",
+         ],
+         "appearance": None, "choice_filter": None,
+         "relevant": f"${{vict_delito_12m}}='{slugify_name('Sí, pero no denuncié')}'"},
+
+        {"tipo_ui": "Párrafo (texto largo)",
+         "label": "Indique cuál fue ese otro motivo:",
+         "name": "vict_302_motivos_no_denuncia_otro",
+         "required": True,
+         "opciones": [],
+         "appearance": "multiline",
+         "choice_filter": None,
+         "relevant": f"selected(${{vict_302_motivos_no_denuncia}}, '{slugify_name('Otro motivo:')}')"},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "30.3 ¿Tiene conocimiento sobre el horario en el cual se presentó el hecho o situación que le afectó a usted o un familiar?",
+         "name": "vict_303_horario",
+         "required": True,
+         "opciones": [
+             "00:00 – 02:59 (madrugada)",
+             "03:00 – 05:59 (madrugada)",
+             "06:00 – 08:59 (mañana)",
+             "09:00 – 11:59 (mañana)",
+             "12:00 – 14:59 (mediodía / tarde)",
+             "15:00 – 17:59 (tarde)",
+             "18:00 – 20:59 (noche)",
+             "21:00 – 23:59 (noche)",
+             "Desconocido",
+         ],
+         "appearance": "columns", "choice_filter": None,
+         "relevant": f"${{vict_delito_12m}}!='{slugify_name('NO')}'"},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "30.4 ¿Cuál fue la forma o modo en que ocurrió la situación que afectó a usted o a algún miembro de su hogar?",
+         "name": "vict_304_modo",
+         "required": True,
+         "opciones": [
+             "Arma blanca (cuchillo, machete, tijeras).",
+             "Arma de fuego.",
+             "Amenazas o intimidación",
+             "Arrebato (le quitaron un objeto de forma rápida o sorpresiva)",
+             "Boquete (ingreso mediante apertura de huecos en paredes, techos o estructuras)",
+             "Ganzúa (pata de chancho, llaves falsas u objetos similares)",
+             "Engaño (mediante mentiras, falsas ofertas o distracción)",
+             "Escalamiento (ingreso trepando muros, rejas o techos)",
+             "Otro.",
+             "No sabe / No recuerda",
+         ],
+         "appearance": "columns", "choice_filter": None,
+         "relevant": f"${{vict_delito_12m}}!='{slugify_name('NO')}'"},
+
+        {"tipo_ui": "Párrafo (texto largo)",
+         "label": "30.4.1 Indique cuál fue ese otro modo:",
+         "name": "vict_304_modo_otro",
+         "required": True,
+         "opciones": [],
+         "appearance": "multiline",
+         "choice_filter": None,
+         "relevant": f"selected(${{vict_304_modo}}, '{slugify_name('Otro.')}')"},
+
+        # ---------------- Confianza Policial (31–41) ----------------
+        {"tipo_ui": "Selección única",
+         "label": "31. ¿Identifica usted a los policías de la Fuerza Pública de Costa Rica en su comunidad?",
+         "name": "identifica_policias",
+         "required": True,
+         "opciones": ["Sí", "No"],
+         "appearance": "horizontal",
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "31.1 ¿Cuáles de los siguientes tipos de atención ha tenido?",
+         "name": "tipos_atencion",
+         "required": True,
+         "opciones": [
+             "Solicitud de ayuda o auxilio.",
+             "Atención relacionada con una denuncia.",
+             "Atención cordial o preventiva durante un patrullaje.",
+             "Fui abordado o registrado para identificación.",
+             "Fui objeto de una infracción o conflicto.",
+             "Evento preventivos (Cívico policial, Reunión Comunitaria)",
+             "Otra (especifique):",
+         ],
+         "appearance": None,
+         "choice_filter": None,
+         "relevant": f"${{identifica_policias}}='{SLUG_SI}'"},
+
+        {"tipo_ui": "Texto (corto)",
+         "label": "Indique cuál es esa otra atención:",
+         "name": "tipos_atencion_otro",
+         "required": True,
+         "opciones": [],
+         "appearance": None,
+         "choice_filter": None,
+         "relevant": f"selected(${{tipos_atencion}}, '{slugify_name('Otra (especifique):')}')"},
+
+        {"tipo_ui": "Selección única",
+         "label": "32. ¿Cuál es el nivel de confianza en la policía de la Fuerza Pública de Costa Rica de su comunidad?\nEscala de 1 a 10 (1=Ninguna Confianza, 10=Mucha Confianza)",
+         "name": "nivel_confianza_policia",
+         "required": True,
+         "opciones": ESCALA_1_10,
+         "appearance": "horizontal",
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "33. En una escala del 1 al 10, donde 1 es “Nada profesional” y 10 es “Muy profesional”, ¿cómo calificaría la profesionalidad de la Fuerza Pública en su distrito?",
+         "name": "profesionalidad_fp",
+         "required": True,
+         "opciones": ESCALA_1_10,
+         "appearance": "horizontal",
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "34. En una escala del 1 al 10, donde 1 es “Muy mala” y 10 es “Muy buena”, ¿cómo califica la calidad del servicio policial en su distrito?",
+         "name": "calidad_servicio_policial",
+         "required": True,
+         "opciones": ESCALA_1_10,
+         "appearance": "horizontal",
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "35. En una escala del 1 al 10, donde 1 es “Nada satisfecho(a)” y 10 es “Muy satisfecho(a)”, ¿qué tan satisfecho(a) está con el trabajo preventivo que realiza la Fuerza Pública en su distrito?",
+         "name": "satisfaccion_trabajo_preventivo",
+         "required": True,
+         "opciones": ESCALA_1_10,
+         "appearance": "horizontal",
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "36. En una escala del 1 al 10, donde 1 es “No contribuye en nada” y 10 es “Contribuye muchísimo”, indique: ¿En qué medida considera que la presencia policial ayuda a reducir el crimen en su distrito?",
+         "name": "contribucion_presencia_policial",
+         "required": True,
+         "opciones": ESCALA_1_10,
+         "appearance": "horizontal",
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "37. ¿Con qué frecuencia observa presencia policial en su distrito?",
+         "name": "frecuencia_presencia_policial",
+         "required": True,
+         "opciones": ["Todos los días", "Varias veces por semana", "Una vez por semana", "Casi nunca", "Nunca"],
+         "appearance": None,
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "38. ¿Considera que la presencia policial es consistente a lo largo del día en su distrito?",
+         "name": "presencia_consistente_dia",
+         "required": True,
+         "opciones": ["Sí", "No", "A veces"],
+         "appearance": "horizontal",
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "39. ¿Considera que la policía trata a las personas de manera justa e imparcial en su distrito?",
+         "name": "trato_justo_imparcial",
+         "required": True,
+         "opciones": ["Sí", "No", "A veces"],
+         "appearance": "horizontal",
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "40. ¿Cree usted que puede expresar preocupaciones o quejas a la policía sin temor a represalias?",
+         "name": "expresar_quejas_sin_temor",
+         "required": True,
+         "opciones": ["Sí", "No", "No estoy seguro(a)"],
+         "appearance": "horizontal",
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Selección única",
+         "label": "41. ¿Considera que la policía proporciona información veraz, clara y oportuna a la comunidad?",
+         "name": "info_veraz_clara_oportuna",
+         "required": True,
+         "opciones": ["Sí", "No", "A veces"],
+         "appearance": "horizontal",
+         "choice_filter": None,
+         "relevant": None},
+
+        # ---------------- Propuestas ciudadanas para la mejora de la seguridad (42–46) ----------------
+        {"tipo_ui": "Selección múltiple",
+         "label": "42. ¿Qué actividad considera que deba realizar la Fuerza Pública para mejorar la seguridad en su comunidad?",
+         "name": "propuestas_fp",
+         "required": True,
+         "opciones": [
+             "Mayor presencia policial y patrullaje",
+             "Acciones disuasivas en puntos conflictivos",
+             "Acciones contra consumo y venta de drogas",
+             "Mejorar el servicio policial a la comunidad",
+             "Acercamiento comunitario y comercial",
+             "Actividades de prevención y educación",
+             "Coordinación interinstitucional",
+             "Integridad y credibilidad policial",
+             "Otro:",
+             "No tiene una opinión al respecto",
+         ],
+         "appearance": None,
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Texto (corto)",
+         "label": "Indique cuál es ese otro aporte para Fuerza Pública:",
+         "name": "propuestas_fp_otro",
+         "required": True,
+         "opciones": [],
+         "appearance": None,
+         "choice_filter": None,
+         "relevant": f"selected(${{propuestas_fp}}, '{slugify_name('Otro:')}')"},
+
+        {"tipo_ui": "Selección múltiple",
+         "label": "43. ¿Qué actividad considera que deba realizar la municipalidad para mejorar la seguridad en su comunidad?",
+         "name": "propuestas_muni",
+         "required": True,
+         "opciones": [
+             "Mantenimiento e iluminación del espacio público",
+             "Limpieza y ordenamiento urbano",
+             "Instalación de cámaras y seguridad municipal",
+             "Control del comercio informal y transporte",
+             "Creación y mejoramiento de espacios públicos",
+             "Desarrollo social y generación de empleo",
+             "Coordinación interinstitucional",
+             "Acercamiento municipal a comercio y comunidad",
+             "Otro:",
+             "No tiene una opinión al respecto",
+         ],
+         "appearance": None,
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Texto (corto)",
+         "label": "Indique cuál es ese otro aporte para municipalidad:",
+         "name": "propuestas_muni_otro",
+         "required": True,
+         "opciones": [],
+         "appearance": None,
+         "choice_filter": None,
+         "relevant": f"selected(${{propuestas_muni}}, '{slugify_name('Otro:')}')"},
+
+        {"tipo_ui": "Selección única",
+         "label": "44. ¿Usted tiene información de alguna persona o grupo que se dedique a realizar algún delito en su comunidad?",
+         "name": "info_persona_grupo_delito",
+         "required": True,
+         "opciones": ["Sí", "No"],
+         "appearance": "horizontal",
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Párrafo (texto largo)",
+         "label": "44.1. Si su respuesta es “Sí”, describa aquellas características que pueda aportar tales como nombre de estructura o banda criminal… (nombre de personas, alias, domicilio, vehículos, etc.)",
+         "name": "info_persona_grupo_delito_detalle",
+         "required": True,
+         "opciones": [],
+         "appearance": None,
+         "choice_filter": None,
+         "relevant": f"${{info_persona_grupo_delito}}='{SLUG_SI}'"},
+
+        {"tipo_ui": "Párrafo (texto largo)",
+         "label": "45. En el siguiente espacio de forma voluntaria podrá anotar su nombre, teléfono o correo electrónico en el cual desee ser contactado y continuar colaborando de forma confidencial con Fuerza Pública.",
+         "name": "contacto_voluntario",
+         "required": False,
+         "opciones": [],
+         "appearance": "multiline",
+         "choice_filter": None,
+         "relevant": None},
+
+        {"tipo_ui": "Párrafo (texto largo)",
+         "label": "46. En el siguiente espacio podrá registrar alguna otra información que estime pertinente.",
+         "name": "info_adicional_final",
+         "required": False,
+         "opciones": [],
+         "appearance": "multiline",
+         "choice_filter": None,
+         "relevant": None},
+    ]
+
+    for q in seed:
+        q["pagina"] = _PAGINA_POR_NAME.get(q["name"])
+
+    return seed
+
+# Plantilla del seed compartida por todas las sesiones del proceso: preguntas de solo lectura
+# (MappingProxyType, opciones en tuplas) con qid fijo. La sesión guarda referencias y copia
+# una pregunta solo la primera vez que la edita (copiar_pregunta).
+_SEED_PLANTILLA = None
+
+def plantilla_seed() -> tuple:
+    """Seed inmutable, construido una vez por proceso (una carrera entre hilos solo lo construye dos veces)."""
+    global _SEED_PLANTILLA
+    if _SEED_PLANTILLA is None:
+        tuplas = {}  # listas de opciones iguales (Sí/No, escala 1–10, ...) comparten la misma tupla
+        plantilla = []
+        for i, q in enumerate(seed_preguntas(), start=1):
+            fija = {k: (tuplas.setdefault(tuple(v), tuple(v)) if isinstance(v, list) else v) for k, v in q.items()}
+            fija["qid"] = f"seed_{i:03d}"
+            plantilla.append(MappingProxyType(fija))
+        _SEED_PLANTILLA = tuple(plantilla)
+    return _SEED_PLANTILLA
+
+def es_de_plantilla(q) -> bool:
+    return isinstance(q, MappingProxyType)
+
+def copiar_pregunta(q) -> Dict:
+    """Copia editable (dict con listas) de una pregunta, sea de la plantilla o de la sesión."""
+    return {k: (list(v) if isinstance(v, (list, tuple)) else v) for k, v in q.items()}
+
+# ------------------------------------------------------------------------------------------
+# Optimización de expresiones relevant (se aplica a las filas survey ya generadas)
+# ------------------------------------------------------------------------------------------
+def _dividir_nivel_superior(expr: str, op: str) -> List[str]:
+    """Parte `expr` por " and " / " or " solo fuera de paréntesis y de comillas."""
+    sep = f" {op} "
+    partes, depth, quote, ini, i = [], 0, None, 0, 0
+    while i < len(expr):
+        ch = expr[i]
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and expr.startswith(sep, i):
+            partes.append(expr[ini:i])
+            i += len(sep)
+            ini = i
+            continue
+        i += 1
+    partes.append(expr[ini:])
+    return [p.strip() for p in partes]
+
+def _sin_parentesis_externos(expr: str) -> str:
+    expr = expr.strip()
+    while expr.startswith("(") and expr.endswith(")"):
+        depth, quote = 0, None
+        for i, ch in enumerate(expr):
+            if quote:
+                if ch == quote:
+                    quote = None
+            elif ch in ("'", '"'):
+                quote = ch
+            elif ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+                if depth == 0 and i < len(expr) - 1:
+                    return expr  # "(a) and (b)": los paréntesis no envuelven todo
+        expr = expr[1:-1].strip()
+    return expr
+
+def _unicos(items) -> List[str]:
+    return list(dict.fromkeys(items))
+
+def _disyuncion(expr: str) -> List[str]:
+    """Términos OR de `expr`, aplanados y sin repetir (un término con AND queda entre paréntesis)."""
+    terminos = []
+    for t in _dividir_nivel_superior(_sin_parentesis_externos(expr), "or"):
+        t = _sin_parentesis_externos(t)
+        if len(_dividir_nivel_superior(t, "or")) > 1:
+            terminos.extend(_disyuncion(t))
+        elif len(_dividir_nivel_superior(t, "and")) > 1:
+            terminos.append(f"({t})")
+        else:
+            terminos.append(t)
+    return _unicos(terminos)
+
+def _conjuncion(expr: str) -> List[str]:
+    """Términos AND de `expr`, aplanados y sin repetir (un OR queda como un solo término entre paréntesis)."""
+    expr = _sin_parentesis_externos(expr)
+    if len(_dividir_nivel_superior(expr, "or")) > 1:  # "or" de nivel superior: precedencia menor que "and"
+        ors = _disyuncion(expr)
+        return [ors[0] if len(ors) == 1 else "(" + " or ".join(ors) + ")"]
+    partes = _dividir_nivel_superior(expr, "and")
+    if len(partes) == 1:
+        return [expr] if expr else []
+    terminos = []
+    for t in partes:
+        terminos.extend(_conjuncion(t))
+    return _unicos(terminos)
+
+def optimizar_relevants(tipos: List[str], relevants: List[Optional[str]]) -> Dict:
+    """
+    Reescribe en su lugar (columna relevant de la hoja survey) la forma más corta de cada expresión:
+    aplana paréntesis, quita términos repetidos y los que ya exige el grupo contenedor
+    (un grupo no relevante oculta todo lo de adentro).
+    Devuelve {"bytes_antes", "bytes_despues"} del texto de los relevant.
+    """
+    antes = despues = 0
+    heredados = [frozenset()]
+    for i, tipo in enumerate(tipos):
+        if tipo == "end_group":
+            if len(heredados) > 1:
+                heredados.pop()
+            continue
+
+        rel = relevants[i]
+        propios = _conjuncion(rel) if rel else []
+        if rel:
+            nuevos = [t for t in propios if t not in heredados[-1]]
+            # Un OR que contiene un término ya garantizado por el grupo es siempre verdadero
+            nuevos = [t for t in nuevos
+                      if not (t.startswith("(") and any(d in heredados[-1] for d in _disyuncion(t)))]
+            if len(nuevos) == 1:
+                opt = _sin_parentesis_externos(nuevos[0])
+            else:
+                opt = " and ".join(nuevos)
+            antes += len(rel.encode("utf-8"))
+            despues += len(opt.encode("utf-8"))
+            relevants[i] = opt or None
+
+        if tipo == "begin_group":
+            heredados.append(heredados[-1] | frozenset(propios))
+    return {"bytes_antes": antes, "bytes_despues": despues}
+
+# ------------------------------------------------------------------------------------------
+# Hojas por columnas: {columna: [valores]} (sin listas de dicts ni uniones de claves)
+# ------------------------------------------------------------------------------------------
+COLUMNAS_SURVEY = ["type", "name", "label", "required", "appearance", "choice_filter",
+                   "relevant", "constraint", "constraint_message", "media::image"]
+COLUMNAS_CHOICES = ["list_name", "name", "label"]
+
+def _agregar_fila(tabla: Dict[str, list], fila: Dict, n: int):
+    """
+    Agrega `fila` como fila n de la tabla por columnas. Solo toca las columnas que trae la fila:
+    las que le faltan se rellenan con None cuando vuelven a usarse o en _completar_tabla.
+    """
+    for k, v in fila.items():
+        col = tabla.get(k)
+        if col is None:
+            col = tabla[k] = [None] * n
+        elif len(col) < n:
+            col.extend([None] * (n - len(col)))
+        col.append(v)
+
+def _completar_tabla(tabla: Dict[str, list], n: int):
+    """Deja todas las columnas con n valores (None en las filas que no la traían)."""
+    for col in tabla.values():
+        if len(col) < n:
+            col.extend([None] * (n - len(col)))
+
+def _tabla_a_dataframe(tabla: Dict[str, list], n: int, columnas_base: List[str], orden_preferido: bool) -> pd.DataFrame:
+    """Columnas base presentes (en ese orden) y luego el resto ordenado; sin copiar las listas."""
+    if orden_preferido:
+        cols = [c for c in columnas_base if c in tabla]
+    else:
+        cols = list(columnas_base)
+    cols += sorted(c for c in tabla if c not in cols)
+    _completar_tabla(tabla, n)
+    return pd.DataFrame({c: tabla.get(c) or [None] * n for c in cols}, columns=cols, copy=False)
+
+# ------------------------------------------------------------------------------------------
+# Dependencias entre preguntas (${name} en expresiones y reglas del panel)
+# ------------------------------------------------------------------------------------------
+CAMPOS_CON_REFERENCIAS = ("relevant", "choice_filter", "constraint")
+_REF_RE = re.compile(r"\$\{([^}\s]+)\}")
+
+def referencias(expr: Optional[str]) -> List[str]:
+    return _unicos(_REF_RE.findall(expr)) if expr else []
+
+def grafo_dependencias(preguntas, reglas_vis, reglas_fin) -> Dict[str, List[Dict]]:
+    """
+    Índice inverso construido parseando cada expresión una sola vez:
+      name referenciado → [{"origen": name|None, "lugar": campo o "regla_vis"/"regla_fin", "i": posición}, ...]
+    ("origen" es la pregunta que depende; en reglas de finalización es None: afectan a todo lo posterior).
+    """
+    usado_por = {}
+    for i, q in enumerate(preguntas):
+        for campo in CAMPOS_CON_REFERENCIAS:
+            for ref in referencias(q.get(campo)):
+                usado_por.setdefault(ref, []).append({"origen": q.get("name"), "lugar": campo, "i": i})
+    for i, r in enumerate(reglas_vis):
+        usado_por.setdefault(r["src"], []).append({"origen": r["target"], "lugar": "regla_vis", "i": i})
+        usado_por.setdefault(r["target"], []).append({"origen": None, "lugar": "regla_vis_target", "i": i})
+    for i, r in enumerate(reglas_fin):
+        usado_por.setdefault(r["src"], []).append({"origen": None, "lugar": "regla_fin", "i": i})
+    return usado_por
+
+def describir_dependencia(dep: Dict) -> str:
+    if dep["lugar"] == "regla_vis":
+        return f"regla de visibilidad #{dep['i'] + 1} (muestra `{dep['origen']}`)"
+    if dep["lugar"] == "regla_vis_target":
+        return f"regla de visibilidad #{dep['i'] + 1} (como target)"
+    if dep["lugar"] == "regla_fin":
+        return f"regla de finalización #{dep['i'] + 1}"
+    return f"{dep['lugar']} de `{dep['origen']}`"
+
+def orden_emision(preguntas, paginas: List[Dict]) -> Dict[str, int]:
+    """name → posición en la que construir_xlsform emite la pregunta (consentimiento y luego páginas en orden)."""
+    idx_consent = {q.get("name"): i for i, q in enumerate(preguntas)}.get("consentimiento")
+    orden = [preguntas[idx_consent]] if idx_consent is not None else []
+    por_pagina = agrupar_por_pagina(preguntas, paginas, idx_consent)
+    for pag in paginas:
+        orden.extend(q for _, q in por_pagina[pag["id"]])
+    pos = {}
+    for i, q in enumerate(orden):
+        pos.setdefault(q.get("name"), i)
+    return pos
+
+def validar_dependencias(preguntas, reglas_vis, reglas_fin, paginas: List[Dict] = None,
+                         usado_por: Dict[str, List[Dict]] = None) -> Dict[str, List[str]]:
+    """
+    Validación O(V+E) antes de exportar:
+      errores: referencias a names que no existen y ciclos (una pregunta que depende de sí misma, directa o indirectamente)
+      avisos:  referencias hacia adelante (la pregunta usa otra que se muestra después)
+    """
+    if usado_por is None:
+        usado_por = grafo_dependencias(preguntas, reglas_vis, reglas_fin)
+    pos = orden_emision(preguntas, paginas or paginas_por_defecto())
+    errores, avisos = [], []
+    depende_de = {}
+
+    for ref, deps in usado_por.items():
+        for dep in deps:
+            if ref not in pos:
+                errores.append(f"{describir_dependencia(dep)} referencia `${{{ref}}}`, que no existe.")
+                continue
+            origen = dep["origen"]
+            if origen is None or origen not in pos:
+                continue
+            depende_de.setdefault(origen, set()).add(ref)
+            if pos[ref] > pos[origen]:
+                avisos.append(f"{describir_dependencia(dep)} usa `{ref}`, que se muestra después.")
+
+    # Ciclos: DFS iterativo (blanco=0, en pila=1, terminado=2)
+    color = {}
+    for inicio in depende_de:
+        if color.get(inicio):
+            continue
+        pila = [(inicio, iter(sorted(depende_de.get(inicio, ()))))]
+        camino = [inicio]
+        color[inicio] = 1
+        while pila:
+            nodo, hijos = pila[-1]
+            hijo = next(hijos, None)
+            if hijo is None:
+                color[nodo] = 2
+                pila.pop()
+                camino.pop()
+            elif color.get(hijo, 0) == 0:
+                color[hijo] = 1
+                camino.append(hijo)
+                pila.append((hijo, iter(sorted(depende_de.get(hijo, ())))))
+            elif color[hijo] == 1:
+                ciclo = camino[camino.index(hijo):] + [hijo]
+                errores.append("Dependencia circular: " + " → ".join(f"`{n}`" for n in ciclo))
+    return {"errores": errores, "avisos": avisos}
+
+def renombrar_referencias(estado, viejo: str, nuevo: str, usado_por: Dict[str, List[Dict]] = None) -> int:
+    """
+    Propaga un cambio de name a todo lo que lo referencia (expresiones ${viejo} y reglas del panel).
+    Solo toca los dependientes que da el índice; copia (copy-on-write) las preguntas de la plantilla.
+    Devuelve cuántas referencias se actualizaron.
+    """
+    if viejo == nuevo:
+        return 0
+    if usado_por is None:
+        usado_por = grafo_dependencias(estado["preguntas"], estado["reglas_visibilidad"], estado["reglas_finalizar"])
+    patron = re.compile(r"\$\{" + re.escape(viejo) + r"\}")
+    n = 0
+    for dep in usado_por.get(viejo, []):
+        lugar, i = dep["lugar"], dep["i"]
+        if lugar in CAMPOS_CON_REFERENCIAS:
+            q = estado["preguntas"][i]
+            if es_de_plantilla(q):
+                q = estado["preguntas"][i] = copiar_pregunta(q)
+            q[lugar] = patron.sub(f"${{{nuevo}}}", q[lugar])
+        elif lugar == "regla_vis":
+            estado["reglas_visibilidad"][i]["src"] = nuevo
+        elif lugar == "regla_vis_target":
+            estado["reglas_visibilidad"][i]["target"] = nuevo
+        elif lugar == "regla_fin":
+            estado["reglas_finalizar"][i]["src"] = nuevo
+        n += 1
+    return n
+
+# ------------------------------------------------------------------------------------------
+# Construcción XLSForm (Intro + Consentimiento + Páginas)
+# ------------------------------------------------------------------------------------------
+def _fingerprint_pregunta(q: Dict, rules_q: List[Dict], fin_rel: Optional[str], es_catalogo_real: bool) -> str:
+    """Huella de todo lo que determina las filas de UNA pregunta (definición, reglas propias y flag de finalización)."""
+    payload = [{k: v for k, v in q.items() if k != "qid"}, rules_q, fin_rel, es_catalogo_real]
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def construir_xlsform(preguntas, form_title: str, idioma: str, version: str,
+                      reglas_vis, reglas_fin, estado, logo_media_name: str = DEFAULT_LOGO_MEDIA_NAME,
+                      frag_cache: Dict = None, stats: Dict = None):
+    """
+    estado: mapping con el catálogo (choices_ext_*), textos_fijos y paginas (st.session_state en la app, dict en la CLI).
+    frag_cache (opcional): {qid: (huella, fila_survey, filas_choices)} de builds anteriores.
+    Solo se regeneran las preguntas cuya huella cambió; al final queda con las entradas usadas en este build.
+    stats (opcional): se completa con los bytes de relevant antes/después de optimizar_relevants.
+    """
+    # Hojas por columnas: cada fila se agrega directo a las listas de su columna
+    survey = {c: [] for c in ("type", "name", "label")}
+    choices = {c: [] for c in COLUMNAS_CHOICES}
+    n_filas = {"survey": 0, "choices": 0}
+    choices_keys = set()  # dedup choices por (list_name,name)
+
+    def emitir(row: Dict):
+        _agregar_fila(survey, row, n_filas["survey"])
+        n_filas["survey"] += 1
+
+    def _choices_add_unique(row: Dict):
+        key = (row.get("list_name"), row.get("name"))
+        if key not in choices_keys:
+            _agregar_fila(choices, row, n_filas["choices"])
+            n_filas["choices"] += 1
+            choices_keys.add(key)
+
+    idx_by_name = {q.get("name"): i for i, q in enumerate(preguntas)}
+
+    vis_by_target = {}
+    for r in reglas_vis:
+        vis_by_target.setdefault(r["target"], []).append(
+            {"src": r["src"], "op": r.get("op", "="), "values": r.get("values", [])}
+        )
+
+    # Finalización temprana: cada regla se compila en un calculate oculto y acumulativo
+    # (fin_flag_NN = 1 si esa regla o alguna anterior se cumplió). Cada pregunta o página referencia
+    # solo el último flag que le aplica, en vez de repetir un not(...) por regla.
+    # "Antes/después" es el orden en que se emiten las preguntas (consentimiento y luego páginas en orden),
+    # no el orden de la lista: una pregunta movida a una página anterior se emite antes aunque esté al final.
+    idx_consent = idx_by_name.get("consentimiento", None)
+    paginas = estado.get("paginas") or paginas_por_defecto()
+    por_pagina = agrupar_por_pagina(preguntas, paginas, idx_consent)
+    pos_emision = {idx_consent: 0} if idx_consent is not None else {}
+    for pag in paginas:
+        for i, _ in por_pagina[pag["id"]]:
+            pos_emision[i] = len(pos_emision)
+
+    # La posición de cada regla sale del src actual (no de un índice guardado al crearla, que queda
+    # desfasado al mover, insertar o borrar preguntas). Un src inexistente ya lo reporta validar_dependencias.
+    fin_conds = []
+    for r in reglas_fin:
+        if r["src"] not in idx_by_name:
+            continue
+        cond = build_relevant_expr([{"src": r["src"], "op": r.get("op", "="), "values": r.get("values", [])}])
+        if cond:
+            fin_conds.append((pos_emision.get(idx_by_name[r["src"]], len(preguntas)), cond))
+    fin_conds.sort(key=lambda t: t[0])
+    fin_srcs = [pos_src for pos_src, _ in fin_conds]
+    fin_flags = []
+    usados_names = set(idx_by_name)
+    for _ in fin_conds:
+        flag = asegurar_nombre_unico(f"fin_flag_{len(fin_flags) + 1:02d}", usados_names)
+        usados_names.add(flag)
+        fin_flags.append(flag)
+
+    def _n_fin(idx: int) -> int:
+        """Cantidad de reglas de finalización cuya fuente se emite antes de la pregunta idx."""
+        return bisect.bisect_left(fin_srcs, pos_emision.get(idx, len(preguntas)))
+
+    def _fin_rel(n: int) -> Optional[str]:
+        return f"${{{fin_flags[n - 1]}}}!=1" if n else None
+
+    def _aplicar_exclusividad_no_observa(row: Dict, q: Dict):
+        """
+        FIX: Si un select_multiple incluye opción tipo:
+        - "No se observa"
+        - "No se observan ..."
+        - "No se observa ..."
+        entonces esa opción debe ser EXCLUSIVA (no permitir combinar con otras).
+        """
+        if q.get("tipo_ui") != "Selección múltiple":
+            return
+
+        opts = q.get("opciones") or []
+        if not opts:
+            return
+
+        exclusivas = [o for o in opts if str(o).strip().lower().startswith("no se observa")]
+        if not exclusivas:
+            exclusivas = [o for o in opts if str(o).strip().lower().startswith("no se observan")]
+        if not exclusivas:
+            return
+
+        ex_label = exclusivas[0]
+        ex_slug = slugify_name(ex_label)
+        nm = q["name"]
+
+        row["constraint"] = f"not(selected(${{{nm}}}, '{ex_slug}') and count-selected(${{{nm}}})>1)"
+        row["constraint_message"] = f"Si selecciona “{ex_label}”, no puede marcar otras opciones."
+
+    # Se consulta una sola vez por build (es O(1), pero no cambia durante la construcción)
+    es_catalogo_real = hay_catalogo_real(estado)
+
+    frags_usados = {}
+
+    def _generar_fragmento(q, rules_q, fin_rel):
+        x_type, default_app, list_name = map_tipo_to_xlsform(q["tipo_ui"], q["name"])
+
+        # FIX MATRIZ: permitir forzar list_name compartido con list_override
+        list_override = q.get("list_override")
+        if list_override and isinstance(x_type, str):
+            if x_type.startswith("select_one "):
+                x_type = f"select_one {list_override}"
+                list_name = list_override
+            elif x_type.startswith("select_multiple "):
+                x_type = f"select_multiple {list_override}"
+                list_name = list_override
+
+        rel_manual = q.get("relevant") or None
+        rel_panel = build_relevant_expr(rules_q)
+
+        parts = [p for p in [rel_manual, rel_panel, fin_rel] if p]
+        rel_final = parts[0] if parts and len(parts) == 1 else ("(" + ") and (".join(parts) + ")" if parts else None)
+
+        row = {"type": x_type, "name": q["name"], "label": q["label"]}
+        if q.get("required"):
+            row["required"] = "yes"
+        app = q.get("appearance") or default_app
+        if app:
+            row["appearance"] = app
+        if q.get("choice_filter"):
+            row["choice_filter"] = q["choice_filter"]
+        if rel_final:
+            row["relevant"] = rel_final
+
+        # Constraints placeholders SOLO si NO hay catálogo real
+        if not es_catalogo_real:
+            if q["name"] == "canton":
+                row["constraint"] = ". != '__pick_canton__'"
+                row["constraint_message"] = "Seleccione un cantón válido."
+            if q["name"] == "distrito":
+                row["constraint"] = ". != '__pick_distrito__'"
+                row["constraint_message"] = "Seleccione un distrito válido."
+
+        # ✅ Exclusividad "No se observa / No se observan..."
+        _aplicar_exclusividad_no_observa(row, q)
+
+        # Generar choices (excepto Cantón/Distrito)
+        q_choices = []
+        if list_name and q["name"] not in {"canton", "distrito"}:
+            usados, siguiente = set(), {}
+            for opt_label in (q.get("opciones") or []):
+                base = slugify_name(opt_label)
+                opt_name = asegurar_nombre_unico(base, usados, siguiente)
+                usados.add(opt_name)
+                q_choices.append({"list_name": list_name, "name": opt_name, "label": str(opt_label)})
+
+        return row, q_choices
+
+    def add_q(q, idx, n_fin_grupo: int = 0):
+        """n_fin_grupo: flags que ya aplica la página contenedora (la pregunta solo agrega uno posterior)."""
+        rules_q = vis_by_target.get(q["name"], [])
+        n_fin = _n_fin(idx)
+        fin_rel = _fin_rel(n_fin) if n_fin > n_fin_grupo else None
+
+        qid = q.get("qid")
+        if frag_cache is not None and qid:
+            fp = _fingerprint_pregunta(q, rules_q, fin_rel, es_catalogo_real)
+            frag = frag_cache.get(qid)
+            if not frag or frag[0] != fp:
+                frag = (fp, *_generar_fragmento(q, rules_q, fin_rel))
+            frags_usados[qid] = frag
+            _, row, q_choices = frag
+        else:
+            row, q_choices = _generar_fragmento(q, rules_q, fin_rel)
+
+        emitir(row)
+        for c in q_choices:
+            _choices_add_unique(c)
+
+    # Página 1: Intro
+    for row in [
+        {"type": "begin_group", "name": "p1_intro", "label": "Introducción", "appearance": "field-list"},
+        {"type": "note", "name": "intro_logo", "label": form_title, "media::image": logo_media_name},
+        {"type": "note", "name": "intro_texto", "label": INTRO_COMUNIDAD},
+        {"type": "end_group", "name": "p1_end"},
+    ]:
+        emitir(row)
+
+    # Página 2: Consentimiento
+    emitir({"type": "begin_group", "name": "p2_consentimiento", "label": "Consentimiento informado", "appearance": "field-list"})
+    emitir({"type": "note", "name": "cons_title", "label": CONSENTIMIENTO_TITULO})
+    for i, txt in enumerate(CONSENTIMIENTO_BLOQUES, start=1):
+        emitir({"type": "note", "name": f"cons_b{i:02d}", "label": txt})
+    if idx_consent is not None:
+        add_q(preguntas[idx_consent], idx_consent)
+    emitir({"type": "end_group", "name": "p2_consentimiento_end"})
+
+    # Página final si NO acepta
+    emitir({
+        "type": "begin_group",
+        "name": "p_fin_no",
+        "label": "Finalización",
+        "appearance": "field-list",
+        "relevant": f"${{consentimiento}}='{CONSENT_NO}'"
+    })
+    emitir({
+        "type": "note",
+        "name": "fin_no_texto",
+        "label": "Gracias. Al no aceptar participar, la encuesta finaliza en este punto."
+    })
+    emitir({"type": "end_group", "name": "p_fin_no_end"})
+
+    # Flags de finalización: a nivel raíz (fuera de toda página) para que ninguna relevancia
+    # —incluida la que ellos mismos provocan— los deje en blanco.
+    for k, ((_, cond), flag) in enumerate(zip(fin_conds, fin_flags)):
+        calc = cond if k == 0 else f"${{{fin_flags[k - 1]}}}=1 or {cond}"
+        emitir({"type": "calculate", "name": flag, "calculation": f"if({calc}, 1, 0)"})
+
+    # Desde aquí, todo se muestra SOLO si consentimiento = Sí
+    rel_si = f"${{consentimiento}}='{CONSENT_SI}'"
+
+    def add_page(group_name, page_label, preguntas_pagina, intro_note_text: str = None,
+                 group_appearance: str = "field-list", group_relevant: str = None, extra_notes: List[str] = None):
+        # Los flags que aplican a TODAS las preguntas de la página van una sola vez en el grupo
+        n_fin_grupo = min((_n_fin(i) for i, _ in preguntas_pagina), default=0)
+        if n_fin_grupo:
+            fin_grupo = _fin_rel(n_fin_grupo)
+            group_relevant = f"{group_relevant} and {fin_grupo}" if group_relevant else fin_grupo
+
+        row = {"type": "begin_group", "name": group_name, "label": page_label, "appearance": group_appearance}
+        if group_relevant:
+            row["relevant"] = group_relevant
+        emitir(row)
+
+        if intro_note_text:
+            note = {"type": "note", "name": f"{group_name}_intro", "label": intro_note_text}
+            if group_relevant:
+                note["relevant"] = group_relevant
+            emitir(note)
+
+        if extra_notes:
+            for j, t in enumerate(extra_notes, start=1):
+                nn = {"type": "note", "name": f"{group_name}_note{j:02d}", "label": t}
+                if group_relevant:
+                    nn["relevant"] = group_relevant
+                emitir(nn)
+
+        # Matriz 9: sus filas van dentro de un begin_group table-list (ya comparten list_override),
+        # abierto antes de la primera y cerrado después de la última (solo en la primera página que la tenga)
+        pos_matriz = [] if matriz_emitida else [k for k, (_, qq) in enumerate(preguntas_pagina) if qq["name"] in MATRIZ_9_NAMES]
+        for k, (i, qq) in enumerate(preguntas_pagina):
+            if pos_matriz and k == pos_matriz[0]:
+                emitir({"type": "begin_group", "name": "matriz_seguridad_9", "label": matriz_label, "appearance": "table-list"})
+            add_q(qq, i, n_fin_grupo)
+            if pos_matriz and k == pos_matriz[-1]:
+                emitir({"type": "end_group", "name": "matriz_seguridad_9_end"})
+                matriz_emitida.append(True)
+
+        emitir({"type": "end_group", "name": f"{group_name}_end"})
+
+    matriz_label = (estado.get("textos_fijos") or {}).get("matriz_9_label", MATRIZ_9_LABEL_DEFAULT)
+    matriz_emitida = []
+
+    for pag in paginas:
+        rel_pag = f"{rel_si} and ({pag['relevant']})" if pag.get("relevant") else rel_si
+        add_page(pag["id"], pag["label"], por_pagina[pag["id"]], intro_note_text=pag.get("intro"),
+                 group_appearance="field-list", group_relevant=rel_pag, extra_notes=pag.get("notas"))
+
+    if frag_cache is not None:
+        frag_cache.clear()
+        frag_cache.update(frags_usados)
+
+    # Choices del catálogo (filtrando placeholders si hay catálogo real)
+    asegurar_placeholders_catalogo(estado)
+    # Sin copiar las filas: _agregar_fila solo lee sus valores hacia las columnas
+    for r in filtrar_placeholders_si_hay_catalogo(estado, estado["choices_ext_rows"]):
+        _choices_add_unique(r)
+
+    # Relevant más cortos (sin lo que ya exige el grupo, sin repetidos ni paréntesis de más)
+    _completar_tabla(survey, n_filas["survey"])
+    if "relevant" in survey:
+        ahorro = optimizar_relevants(survey["type"], survey["relevant"])
+    else:
+        ahorro = {"bytes_antes": 0, "bytes_despues": 0}
+    if stats is not None:
+        stats.update(ahorro)
+
+    # DataFrames: una sola construcción por hoja, directo desde las columnas
+    df_survey = _tabla_a_dataframe(survey, n_filas["survey"], COLUMNAS_SURVEY, orden_preferido=True)
+    df_choices = _tabla_a_dataframe(choices, n_filas["choices"], COLUMNAS_CHOICES, orden_preferido=False)
+
+    df_settings = pd.DataFrame([{
+        "form_title": form_title,
+        "version": version,
+        "default_language": idioma,
+        "style": "pages",
+    }], columns=["form_title", "version", "default_language", "style"])
+
+    return df_survey, df_choices, df_settings
+
+XLSX_BLOQUE_FILAS = 5000
+
+def _escribir_hoja(wb, nombre: str, df: pd.DataFrame, fmt_hdr):
+    """Encabezado en negrita congelado + filas en orden (constant_memory exige escribir fila por fila)."""
+    ws = wb.add_worksheet(nombre)
+    cols = list(df.columns)
+    ws.freeze_panes(1, 0)
+    ws.set_row(0, None, fmt_hdr)
+    for col_idx, col_name in enumerate(cols):
+        ws.set_column(col_idx, col_idx, max(14, min(55, len(str(col_name)) + 8)))
+        ws.write(0, col_idx, col_name, fmt_hdr)
+
+    # Por bloques de filas: solo un bloque a la vez pasa a objetos Python (sin iterar filas de pandas)
+    for inicio in range(0, len(df), XLSX_BLOQUE_FILAS):
+        bloque = df.iloc[inicio:inicio + XLSX_BLOQUE_FILAS]
+        columnas = [bloque[c].tolist() for c in cols]
+        for fila, valores in enumerate(zip(*columnas), start=inicio + 1):
+            for col_idx, v in enumerate(valores):
+                if v is None or v != v:  # None / NaN → celda vacía
+                    continue
+                ws.write(fila, col_idx, v)
+
+def escribir_xlsform(destino, df_survey, df_choices, df_settings):
+    """
+    Escribe el XLSForm en `destino` (ruta o archivo binario, p. ej. un miembro de un zip abierto con zf.open(..., "w")).
+    xlsxwriter en modo constant_memory: cada fila se vuelca al archivo temporal de su hoja apenas se escribe,
+    así la memoria no crece con la hoja choices (catálogos nacionales).
+    """
+    wb = xlsxwriter.Workbook(destino, {"constant_memory": True})
+    fmt_hdr = wb.add_format({"bold": True, "align": "left"})
+    for sheet, df in (("survey", df_survey), ("choices", df_choices), ("settings", df_settings)):
+        _escribir_hoja(wb, sheet, df, fmt_hdr)
+    wb.close()
+
+def excel_xlsform_bytes(df_survey, df_choices, df_settings) -> bytes:
+    buffer = BytesIO()
+    escribir_xlsform(buffer, df_survey, df_choices, df_settings)
+    return buffer.getvalue()
+
+def xlsform_temporal(df_survey, df_choices, df_settings, directorio: str = None) -> str:
+    """Escribe el XLSForm en un .xlsx temporal y devuelve su ruta (quien lo usa lo borra)."""
+    fd, ruta = tempfile.mkstemp(suffix=".xlsx", prefix="xlsform_", dir=directorio)
+    with os.fdopen(fd, "wb") as fh:
+        escribir_xlsform(fh, df_survey, df_choices, df_settings)
+    return ruta
+
+# ------------------------------------------------------------------------------------------
+# Formatos impresos (Word / PDF): mismas páginas y preguntas que el XLSForm, para papel
+# ------------------------------------------------------------------------------------------
+FORMATO_LINEA = "_" * 60
+FORMATO_RESPUESTA_ABIERTA = {
+    "Texto (corto)": FORMATO_LINEA,
+    "Párrafo (texto largo)": f"Espacio abierto para detallar: {FORMATO_LINEA}\n{FORMATO_LINEA}",
+    "Número": "Número: ____________",
+    "Fecha": "Fecha: ____ / ____ / ________",
+    "Hora": "Hora: ____ : ____",
+    "GPS (ubicación)": f"Ubicación: {FORMATO_LINEA}",
+}
+FORMATO_NOTA_CATALOGO = "Nota: La respuesta es de opción desplegable."
+FORMATO_NOTA_MULTIPLE = "Nota: esta pregunta es de selección múltiple."
+FORMATO_FIN_NO = "Si no acepta participar, la encuesta finaliza en este punto."
+
+def recorrer_formato(preguntas, estado):
+    """
+    Recorre el cuestionario en el orden de construir_xlsform para los formatos impresos:
+      ("consentimiento", q | None), luego por página ("pagina", pag), ("pregunta", q) y ("matriz", titulo, filas).
+    """
+    idx_by_name = {q.get("name"): i for i, q in enumerate(preguntas)}
+    idx_consent = idx_by_name.get("consentimiento", None)
+    yield ("consentimiento", preguntas[idx_consent] if idx_consent is not None else None)
+
+    paginas = estado.get("paginas") or paginas_por_defecto()
+    por_pagina = agrupar_por_pagina(preguntas, paginas, idx_consent)
+    matriz_label = (estado.get("textos_fijos") or {}).get("matriz_9_label", MATRIZ_9_LABEL_DEFAULT)
+    matriz_emitida = False
+
+    for pag in paginas:
+        yield ("pagina", pag)
+        items = [qq for _, qq in por_pagina[pag["id"]]]
+        # Matriz 9 en una sola tabla (primera página que la tenga), como el table-list del XLSForm
+        matriz = [] if matriz_emitida else [qq for qq in items if qq["name"] in MATRIZ_9_NAMES]
+        for qq in items:
+            if matriz and qq["name"] in MATRIZ_9_NAMES:
+                if qq is matriz[0]:
+                    yield ("matriz", matriz_label, matriz)
+                    matriz_emitida = True
+                continue
+            yield ("pregunta", qq)
+
+# ------------------------------------------------------------------------------------------
+# Formato de encuesta en Word (.docx)
+# ------------------------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=1)
+def _docx_base_bytes() -> bytes:
+    """
+    Documento base (carta, márgenes, estilos, Introducción y textos del Consentimiento):
+    se arma una sola vez por proceso y cada exportación parte de una copia.
+    """
+    doc = Document()
+    sec = doc.sections[0]
+    sec.page_width, sec.page_height = Cm(21.59), Cm(27.94)
+    sec.left_margin = sec.right_margin = Cm(3)
+    sec.top_margin = sec.bottom_margin = Cm(2.5)
+
+    normal = doc.styles["Normal"]
+    normal.font.name = "Calibri"
+    normal.font.size = Pt(11)
+    normal.paragraph_format.space_after = Pt(4)
+
+    doc.add_heading("Introducción", level=1)
+    doc.add_paragraph(INTRO_COMUNIDAD).alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+
+    doc.add_heading("Consentimiento informado", level=1)
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p.add_run(CONSENTIMIENTO_TITULO).bold = True
+    for txt in CONSENTIMIENTO_BLOQUES:
+        doc.add_paragraph(txt).alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+def _docx_pregunta(doc, q: Dict):
+    """Enunciado en negrita + casillas de opciones (o línea de respuesta) en un solo párrafo."""
+    p = doc.add_paragraph()
+    p.paragraph_format.keep_with_next = True
+    p.paragraph_format.space_before = Pt(8)
+    p.add_run(q.get("label") or q["name"]).bold = True
+
+    tipo = q.get("tipo_ui")
+    if tipo in ("Selección única", "Selección múltiple"):
+        opts = q.get("opciones") or []
+        if not opts:
+            # Cantón/Distrito: lista del catálogo
+            doc.add_paragraph(FORMATO_NOTA_CATALOGO).runs[0].italic = True
+            return
+        marca = "( )" if tipo == "Selección única" else "☐"
+        doc.add_paragraph("\n".join(f"{marca} {o}" for o in opts))
+        if tipo == "Selección múltiple":
+            doc.add_paragraph(FORMATO_NOTA_MULTIPLE).runs[0].italic = True
+    else:
+        doc.add_paragraph(FORMATO_RESPUESTA_ABIERTA.get(tipo, FORMATO_LINEA))
+
+def _docx_matriz(doc, titulo: str, filas: List[Dict]):
+    """Matriz 9 como tabla: una fila por espacio, una columna por opción de la escala."""
+    p = doc.add_paragraph()
+    p.paragraph_format.keep_with_next = True
+    p.paragraph_format.space_before = Pt(8)
+    p.add_run(titulo).bold = True
+
+    escala = filas[0].get("opciones") or []
+    tabla = doc.add_table(rows=len(filas) + 1, cols=len(escala) + 1)
+    tabla.style = doc.styles["Table Grid"]
+    celdas = tabla._cells  # una sola pasada sobre el XML (row.cells recorre la tabla cada vez)
+    ancho = len(escala) + 1
+    celdas[0].paragraphs[0].add_run("Zona").bold = True
+    for j, o in enumerate(escala, start=1):
+        celdas[j].paragraphs[0].add_run(str(o)).bold = True
+    for i, q in enumerate(filas, start=1):
+        celdas[i * ancho].text = q.get("label") or q["name"]
+        for j in range(1, ancho):
+            celdas[i * ancho + j].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+            celdas[i * ancho + j].text = "( )"
+
+def _docx_cuestionario(preguntas, estado):
+    """Documento base + consentimiento y páginas en el mismo orden que construir_xlsform (sin portada)."""
+    doc = Document(BytesIO(_docx_base_bytes()))
+    for evento in recorrer_formato(preguntas, estado):
+        if evento[0] == "consentimiento":
+            if evento[1] is not None:
+                _docx_pregunta(doc, evento[1])
+            doc.add_paragraph(FORMATO_FIN_NO).runs[0].italic = True
+        elif evento[0] == "pagina":
+            pag = evento[1]
+            doc.add_heading(pag["label"], level=1)
+            if pag.get("intro"):
+                doc.add_paragraph(pag["intro"]).alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+            for t in pag.get("notas") or []:
+                doc.add_paragraph(t)
+        elif evento[0] == "matriz":
+            _docx_matriz(doc, evento[1], evento[2])
+        else:
+            _docx_pregunta(doc, evento[1])
+    return doc
+
+def docx_cuestionario_bytes(preguntas, estado) -> bytes:
+    """Cuestionario sin portada: en un lote es igual para todas las delegaciones y se arma una sola vez."""
+    buffer = BytesIO()
+    _docx_cuestionario(preguntas, estado).save(buffer)
+    return buffer.getvalue()
+
+def construir_docx(preguntas, form_title: str, estado, logo_bytes: bytes = None, cuestionario: bytes = None):
+    """
+    Formato de encuesta en Word (devuelve el Document).
+    cuestionario (opcional): resultado de docx_cuestionario_bytes para no volver a armar las preguntas.
+    """
+    if cuestionario is not None:
+        doc = Document(BytesIO(cuestionario))
+    else:
+        doc = _docx_cuestionario(preguntas, estado)
+
+    # Portada: logo + título antes de la Introducción
+    primero = doc.paragraphs[0]
+    if logo_bytes:
+        p = primero.insert_paragraph_before()
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        p.add_run().add_picture(BytesIO(logo_bytes), width=Cm(3))
+    p = primero.insert_paragraph_before()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run(form_title)
+    run.bold = True
+    run.font.size = Pt(16)
+    return doc
+
+def escribir_docx(destino, preguntas, form_title: str, estado, logo_bytes: bytes = None, cuestionario: bytes = None):
+    """Escribe el formato Word en `destino` (ruta o archivo binario)."""
+    construir_docx(preguntas, form_title, estado, logo_bytes=logo_bytes, cuestionario=cuestionario).save(destino)
+
+def word_encuesta_bytes(preguntas, form_title: str, estado, logo_bytes: bytes = None, cuestionario: bytes = None) -> bytes:
+    buffer = BytesIO()
+    escribir_docx(buffer, preguntas, form_title, estado, logo_bytes=logo_bytes, cuestionario=cuestionario)
+    return buffer.getvalue()
+
+# ------------------------------------------------------------------------------------------
+# Formato de encuesta en PDF (reportlab)
+# ------------------------------------------------------------------------------------------
+PDF_LOGO_ANCHO = 2.2 * cm
+PDF_LOGO_PX = 260
+
+@functools.lru_cache(maxsize=1)
+def _pdf_estilos() -> Dict[str, ParagraphStyle]:
+    """Estilos de párrafo (una vez por proceso)."""
+    base = getSampleStyleSheet()
+    normal = ParagraphStyle("encuesta_normal", parent=base["Normal"], fontName="Helvetica", fontSize=10, leading=13,
+                            spaceAfter=4)
+    return {
+        "titulo": ParagraphStyle("encuesta_titulo", parent=base["Title"], fontSize=16, leading=20, spaceAfter=10),
+        "pagina": ParagraphStyle("encuesta_pagina", parent=base["Heading2"], spaceBefore=12, spaceAfter=6),
+        "normal": normal,
+        "centrado": ParagraphStyle("encuesta_centrado", parent=normal, alignment=TA_CENTER, fontName="Helvetica-Bold"),
+        "justificado": ParagraphStyle("encuesta_justificado", parent=normal, alignment=TA_JUSTIFY),
+        "pregunta": ParagraphStyle("encuesta_pregunta", parent=normal, fontName="Helvetica-Bold", spaceBefore=6,
+                                   spaceAfter=2),
+        "nota": ParagraphStyle("encuesta_nota", parent=normal, fontName="Helvetica-Oblique", fontSize=9, leading=11),
+        "celda": ParagraphStyle("encuesta_celda", parent=normal, fontSize=8, leading=10, spaceAfter=0),
+    }
+
+@functools.lru_cache(maxsize=8)
+def _pdf_logo(logo_bytes: bytes) -> ImageReader:
+    """
+    Logo decodificado y reducido una vez por proceso al tamaño del encabezado (~300 dpi):
+    codificar la imagen original en cada PDF del lote era la parte más lenta.
+    """
+    img = PILImage.open(BytesIO(logo_bytes))
+    img.thumbnail((PDF_LOGO_PX, PDF_LOGO_PX))
+    return ImageReader(img)
+
+def _pdf_texto(txt) -> str:
+    """Texto plano → markup de Paragraph (escapa &, <, > y respeta saltos de línea)."""
+    return xml_escape(str(txt)).replace("\n", "<br/>")
+
+def _pdf_pregunta(q: Dict, e: Dict) -> KeepTogether:
+    """Enunciado + casillas (o línea de respuesta) sin cortarse entre páginas."""
+    partes = [Paragraph(_pdf_texto(q.get("label") or q["name"]), e["pregunta"])]
+    tipo = q.get("tipo_ui")
+    if tipo in ("Selección única", "Selección múltiple"):
+        opts = q.get("opciones") or []
+        if not opts:
+            partes.append(Paragraph(FORMATO_NOTA_CATALOGO, e["nota"]))
+        else:
+            # Helvetica (WinAnsi) no tiene ☐: casilla cuadrada como [ ]
+            marca = "( )" if tipo == "Selección única" else "[ ]"
+            partes.append(Paragraph("<br/>".join(f"{marca} {_pdf_texto(o)}" for o in opts), e["normal"]))
+            if tipo == "Selección múltiple":
+                partes.append(Paragraph(FORMATO_NOTA_MULTIPLE, e["nota"]))
+    else:
+        partes.append(Paragraph(_pdf_texto(FORMATO_RESPUESTA_ABIERTA.get(tipo, FORMATO_LINEA)), e["normal"]))
+    return KeepTogether(partes)
+
+def _pdf_matriz(titulo: str, filas: List[Dict], e: Dict, ancho: float) -> KeepTogether:
+    """Matriz 9 como tabla con grilla: una fila por espacio, una columna por opción de la escala."""
+    escala = filas[0].get("opciones") or []
+    datos = [[Paragraph("<b>Zona</b>", e["celda"])] + [Paragraph(f"<b>{_pdf_texto(o)}</b>", e["celda"]) for o in escala]]
+    datos += [[Paragraph(_pdf_texto(q.get("label") or q["name"]), e["celda"])] + ["( )"] * len(escala) for q in filas]
+    col0 = ancho * 0.34
+    tabla = Table(datos, colWidths=[col0] + [(ancho - col0) / max(1, len(escala))] * len(escala), repeatRows=1)
+    tabla.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#EDEDED")),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("ALIGN", (1, 1), (-1, -1), "CENTER"),
+        ("FONTSIZE", (1, 1), (-1, -1), 8),
+    ]))
+    return KeepTogether([Paragraph(_pdf_texto(titulo), e["pregunta"]), Spacer(1, 4), tabla])
+
+def _pdf_flowables(preguntas, form_title: str, estado, ancho: float) -> List:
+    """Flowables del documento en el orden del cuestionario (recorrer_formato)."""
+    e = _pdf_estilos()
+    flowables = [
+        Paragraph(_pdf_texto(form_title), e["titulo"]),
+        Paragraph("Introducción", e["pagina"]),
+        Paragraph(_pdf_texto(INTRO_COMUNIDAD), e["justificado"]),
+        Paragraph("Consentimiento informado", e["pagina"]),
+        Paragraph(_pdf_texto(CONSENTIMIENTO_TITULO), e["centrado"]),
+    ]
+    for txt in CONSENTIMIENTO_BLOQUES:
+        flowables.append(Paragraph(_pdf_texto(txt), e["justificado"]))
+
+    for evento in recorrer_formato(preguntas, estado):
+        if evento[0] == "consentimiento":
+            if evento[1] is not None:
+                flowables.append(_pdf_pregunta(evento[1], e))
+            flowables.append(Paragraph(FORMATO_FIN_NO, e["nota"]))
+        elif evento[0] == "pagina":
+            pag = evento[1]
+            flowables.append(Paragraph(_pdf_texto(pag["label"]), e["pagina"]))
+            if pag.get("intro"):
+                flowables.append(Paragraph(_pdf_texto(pag["intro"]), e["justificado"]))
+            for t in pag.get("notas") or []:
+                flowables.append(Paragraph(_pdf_texto(t), e["normal"]))
+        elif evento[0] == "matriz":
+            flowables.append(_pdf_matriz(evento[1], evento[2], e, ancho))
+        else:
+            flowables.append(_pdf_pregunta(evento[1], e))
+    return flowables
+
+def escribir_pdf(destino, preguntas, form_title: str, estado, logo_bytes: bytes = None):
+    """
+    Escribe el formato de encuesta en PDF en `destino` (ruta o archivo binario).
+    El logo va en el encabezado de cada página, pero el PDF lo incrusta una sola vez (un Form XObject compartido).
+    """
+    logo = _pdf_logo(logo_bytes) if logo_bytes else None
+    doc = SimpleDocTemplate(destino, pagesize=letter, leftMargin=2 * cm, rightMargin=2 * cm,
+                            topMargin=2.8 * cm, bottomMargin=2 * cm, title=form_title)
+    ancho_pag, alto_pag = letter
+
+    def _encabezado(canvas, _doc):
+        canvas.saveState()
+        if logo is not None:
+            # Form XObject: la imagen se codifica en la primera página y las demás solo la referencian
+            # (drawImage por página volvería a codificarla y calcular su md5 cada vez)
+            if not canvas.hasForm("logo_encabezado"):
+                w, h = logo.getSize()
+                alto = PDF_LOGO_ANCHO * h / w
+                canvas.beginForm("logo_encabezado")
+                canvas.drawImage(logo, 2 * cm, alto_pag - 0.8 * cm - alto, width=PDF_LOGO_ANCHO, height=alto, mask="auto")
+                canvas.endForm()
+            canvas.doForm("logo_encabezado")
+        canvas.setFont("Helvetica", 8)
+        canvas.drawRightString(ancho_pag - 2 * cm, alto_pag - 1.2 * cm, form_title)
+        canvas.drawRightString(ancho_pag - 2 * cm, 1.2 * cm, f"Página {canvas.getPageNumber()}")
+        canvas.restoreState()
+
+    # reportlab diagrama a partir de la lista completa: todos los flowables existen a la vez durante build
+    doc.build(_pdf_flowables(preguntas, form_title, estado, doc.width),
+              onFirstPage=_encabezado, onLaterPages=_encabezado)
+
+def pdf_encuesta_bytes(preguntas, form_title: str, estado, logo_bytes: bytes = None) -> bytes:
+    buffer = BytesIO()
+    escribir_pdf(buffer, preguntas, form_title, estado, logo_bytes=logo_bytes)
+    return buffer.getvalue()
+
+# ------------------------------------------------------------------------------------------
+# Proyecto Survey123 Connect (.zip): <carpeta>/<carpeta>.xlsx + <carpeta>/media/
+# ------------------------------------------------------------------------------------------
+def _zipinfo(ruta: str, comprimir: bool) -> zipfile.ZipInfo:
+    zi = zipfile.ZipInfo(ruta, date_time=time.localtime()[:6])
+    # .xlsx y .png ya vienen comprimidos: guardarlos tal cual evita recomprimir sin ganancia
+    zi.compress_type = zipfile.ZIP_DEFLATED if comprimir else zipfile.ZIP_STORED
+    return zi
+
+def agregar_bundle_survey123(zf: zipfile.ZipFile, carpeta: str, dfs=None, xlsx_bytes: bytes = None,
+                             logo_media_name: str = None, logo_bytes: bytes = None, csv_externos: Dict = None,
+                             xlsx_ruta: str = None, docx_bytes: bytes = None, pdf_bytes: bytes = None):
+    """
+    Agrega al zip una carpeta con el layout de Survey123 Connect:
+      <carpeta>/<carpeta>.xlsx, <carpeta>/media/<logo> y <carpeta>/media/<lista>.csv
+    dfs: (df_survey, df_choices, df_settings) → el .xlsx se escribe directo al miembro del zip (sin copia intermedia).
+    xlsx_bytes: alternativa si el .xlsx ya está construido (p. ej. memo de la app).
+    xlsx_ruta: alternativa si el .xlsx ya está en disco (p. ej. temporal de un proceso del lote); se copia por bloques.
+    docx_bytes / pdf_bytes (opcionales): formato de encuesta → <carpeta>/<carpeta>_formato.docx / .pdf.
+    csv_externos: {"archivo.csv": (columnas, filas_dict)} para listas externas (select_one_from_file / search()).
+    """
+    with zf.open(_zipinfo(f"{carpeta}/{carpeta}.xlsx", comprimir=False), "w") as fh:
+        if xlsx_bytes is not None:
+            fh.write(xlsx_bytes)
+        elif xlsx_ruta is not None:
+            with open(xlsx_ruta, "rb") as src:
+                shutil.copyfileobj(src, fh)
+        else:
+            escribir_xlsform(fh, *dfs)
+
+    if docx_bytes:
+        zf.writestr(_zipinfo(f"{carpeta}/{carpeta}_formato.docx", comprimir=False), docx_bytes)
+
+    if pdf_bytes:
+        zf.writestr(_zipinfo(f"{carpeta}/{carpeta}_formato.pdf", comprimir=False), pdf_bytes)
+
+    if logo_bytes:
+        zf.writestr(_zipinfo(f"{carpeta}/media/{logo_media_name or DEFAULT_LOGO_MEDIA_NAME}", comprimir=False), logo_bytes)
+
+    for nombre_csv, (columnas, filas) in (csv_externos or {}).items():
+        with zf.open(_zipinfo(f"{carpeta}/media/{nombre_csv}", comprimir=True), "w") as fh:
+            txt = io.TextIOWrapper(fh, encoding="utf-8", newline="")
+            w = csv.DictWriter(txt, fieldnames=list(columnas), extrasaction="ignore")
+            w.writeheader()
+            w.writerows(filas)
+            txt.flush()
+            txt.detach()
+
+def bundle_survey123_bytes(carpeta: str, dfs=None, xlsx_bytes: bytes = None, logo_media_name: str = None,
+                           logo_bytes: bytes = None, csv_externos: Dict = None) -> bytes:
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        agregar_bundle_survey123(zf, carpeta, dfs=dfs, xlsx_bytes=xlsx_bytes, logo_media_name=logo_media_name,
+                                 logo_bytes=logo_bytes, csv_externos=csv_externos)
+    return buffer.getvalue()
+
+def clave_xlsform(estado, preguntas, form_title: str, idioma: str, version: str, reglas_vis, reglas_fin,
+                  logo_media_name: str = DEFAULT_LOGO_MEDIA_NAME) -> str:
+    """Hash estable de TODO lo que influye en construir_xlsform (el qid no afecta la salida y se excluye)."""
+    payload = {
+        "preguntas": [{k: v for k, v in q.items() if k != "qid"} for q in preguntas],
+        "reglas_visibilidad": reglas_vis,
+        "reglas_finalizar": reglas_fin,
+        "catalogo": hash_catalogo(estado),
+        "textos_fijos": estado.get("textos_fijos") or {},
+        "paginas": estado.get("paginas") or [],
+        "form_title": form_title,
+        "idioma": idioma,
+        "version": version,
+        "logo": logo_media_name,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# ------------------------------------------------------------------------------------------
+# Proyecto JSON (mismo formato que Exportar/Importar proyecto en la app)
+# ------------------------------------------------------------------------------------------
+def proyecto_a_dict(estado, form_title: str, idioma: str, version: str, logo_media_name: str = None) -> Dict:
+    proj = {
+        "form_title": form_title,
+        "idioma": idioma,
+        "version": version,
+        "preguntas": [copiar_pregunta(q) if es_de_plantilla(q) else q for q in estado["preguntas"]],  # incluye qid
+        "reglas_visibilidad": estado["reglas_visibilidad"],
+        "reglas_finalizar": estado["reglas_finalizar"],
+        "choices_ext_rows": estado["choices_ext_rows"],
+        "choices_extra_cols": sorted(estado["choices_extra_cols"]),
+        "textos_fijos": estado["textos_fijos"],
+        "paginas": estado["paginas"],
+    }
+    if logo_media_name:
+        proj["logo_media_name"] = logo_media_name
+    return proj
+
+def estado_desde_proyecto(data: Dict, estado=None):
+    """
+    Carga un proyecto JSON (dict) en `estado` (nuevo dict si no se indica).
+    Las preguntas sin qid o sin página (JSON viejo) reciben uno / la que les toca por name.
+    """
+    estado = {} if estado is None else estado
+    estado["preguntas"] = [ensure_qid(q) for q in list(data.get("preguntas", []))]
+    for q in estado["preguntas"]:
+        if not q.get("pagina"):
+            q["pagina"] = _PAGINA_POR_NAME.get(q.get("name"))
+    estado["paginas"] = [dict(p) for p in data["paginas"]] if data.get("paginas") else paginas_por_defecto()
+    estado["reglas_visibilidad"] = list(data.get("reglas_visibilidad", []))
+    estado["reglas_finalizar"] = list(data.get("reglas_finalizar", []))
+    estado["choices_extra_cols"] = set(data.get("choices_extra_cols", []))
+    estado["textos_fijos"] = dict(data.get("textos_fijos", estado.get("textos_fijos") or {"matriz_9_label": MATRIZ_9_LABEL_DEFAULT}))
+    set_catalogo(estado, list(data.get("choices_ext_rows", [])))
+    return inicializar_estado(estado)
+
+
+# ------------------------------------------------------------------------------------------
+# Archivo de proyecto (.json / .json.gz): versionado, compacto y validado al cargar
+# ------------------------------------------------------------------------------------------
+# schema 1: el dict de proyecto_a_dict tal cual (archivos anteriores, sin clave "schema").
+# schema 2: {"schema": 2, ...} sin indentación; las listas de opciones repetidas (Sí/No, escalas) se
+#           guardan una vez en "listas" y cada pregunta lleva su índice; el catálogo va por tramos de
+#           filas seguidas con la misma lista y columnas extra (un distrito por cantón comparte
+#           canton_key) y cada etiqueta se guarda una vez en "textos".
+# Los archivos de un schema anterior se migran al cargar; uno más nuevo que PROYECTO_SCHEMA se rechaza.
+PROYECTO_SCHEMA = 2
+_PREGUNTA_NULABLES = ("appearance", "choice_filter", "relevant")  # None se omite al guardar y se repone al leer
+OPERADORES_REGLA = ("=", "!=", "selected")
+
+def _catalogo_compacto(rows: List[Dict]) -> Dict:
+    textos, idx_texto = [], {}
+    tramos, clave_ant = [], None
+    for r in rows:
+        extra = {k: v for k, v in r.items() if k not in ("list_name", "name", "label")}
+        clave = (r.get("list_name"), tuple(extra.items()))
+        if clave != clave_ant:
+            tramos.append({"lista": r.get("list_name"), "extra": extra, "names": [], "labels": []})
+            clave_ant = clave
+        label = r.get("label")
+        i = idx_texto.get(label)
+        if i is None:
+            i = idx_texto[label] = len(textos)
+            textos.append(label)
+        tramos[-1]["names"].append(r.get("name"))
+        tramos[-1]["labels"].append(i)
+    for t in tramos:
+        if not t["extra"]:
+            del t["extra"]
+    return {"textos": textos, "tramos": tramos}
+
+def _catalogo_desde_compacto(cat: Dict) -> List[Dict]:
+    textos = cat["textos"]
+    rows = []
+    for t in cat["tramos"]:
+        lista, extra, names, labels = t["lista"], t.get("extra"), t["names"], t["labels"]
+        if len(names) != len(labels):
+            raise ValueError(f"Tramo del catálogo '{lista}' con names y labels de distinto largo.")
+        if extra:
+            rows.extend({"list_name": lista, "name": n, "label": textos[e], **extra} for n, e in zip(names, labels))
+        else:
+            rows.extend({"list_name": lista, "name": n, "label": textos[e]} for n, e in zip(names, labels))
+    return rows
+
+def proyecto_compacto(proj: Dict) -> Dict:
+    """Dict de proyecto_a_dict → schema 2 (opciones y etiquetas del catálogo sin repetir)."""
+    listas, idx_lista = [], {}
+    preguntas = []
+    for q in proj["preguntas"]:
+        d = {k: v for k, v in q.items() if v is not None or k not in _PREGUNTA_NULABLES}
+        clave = tuple(q.get("opciones") or ())
+        i = idx_lista.get(clave)
+        if i is None:
+            i = idx_lista[clave] = len(listas)
+            listas.append(list(clave))
+        d["opciones"] = i
+        preguntas.append(d)
+    compacto = {"schema": PROYECTO_SCHEMA}
+    compacto.update((k, v) for k, v in proj.items() if k not in ("preguntas", "choices_ext_rows"))
+    compacto.update(listas=listas, preguntas=preguntas, catalogo=_catalogo_compacto(proj.get("choices_ext_rows") or []))
+    return compacto
+
+def _proyecto_schema_1(data: Dict) -> Dict:
+    return data
+
+def _proyecto_schema_2(data: Dict) -> Dict:
+    listas = data["listas"]
+    proj = {k: v for k, v in data.items() if k not in ("schema", "listas", "catalogo")}
+    preguntas = []
+    for q in data["preguntas"]:
+        d = dict.fromkeys(_PREGUNTA_NULABLES)
+        d.update(q)
+        d["opciones"] = list(listas[q["opciones"]])  # lista propia: la sesión la edita en el lugar
+        preguntas.append(d)
+    proj["preguntas"] = preguntas
+    proj["choices_ext_rows"] = _catalogo_desde_compacto(data.get("catalogo") or {"textos": [], "tramos": []})
+    return proj
+
+# schema del archivo → lector que devuelve el dict de proyecto_a_dict
+_LECTORES_PROYECTO = {1: _proyecto_schema_1, 2: _proyecto_schema_2}
+
+def validar_proyecto(proj: Dict) -> List[str]:
+    """Chequeo de estructura (tipos y claves obligatorias) del dict de proyecto; devuelve los errores."""
+    errores = []
+    if not isinstance(proj.get("preguntas"), list):
+        return ["Falta la lista 'preguntas' (¿es un proyecto de la app?)."]
+    for i, q in enumerate(proj["preguntas"], start=1):
+        if not isinstance(q, dict):
+            errores.append(f"Pregunta #{i}: no es un objeto.")
+            continue
+        if q.get("tipo_ui") not in TIPOS:
+            errores.append(f"Pregunta #{i} ({q.get('name')}): tipo_ui desconocido {q.get('tipo_ui')!r}.")
+        if not isinstance(q.get("name"), str) or not q["name"]:
+            errores.append(f"Pregunta #{i}: falta 'name'.")
+        if not isinstance(q.get("opciones", []), list) or not all(isinstance(o, str) for o in q.get("opciones", [])):
+            errores.append(f"Pregunta #{i} ({q.get('name')}): 'opciones' debe ser una lista de textos.")
+    for clave in ("reglas_visibilidad", "reglas_finalizar"):
+        for i, r in enumerate(proj.get(clave) or [], start=1):
+            if not isinstance(r, dict) or not isinstance(r.get("src"), str) or r.get("op") not in OPERADORES_REGLA \
+                    or not isinstance(r.get("values"), list):
+                errores.append(f"{clave} #{i}: se esperaba {{src, op ({', '.join(OPERADORES_REGLA)}), values}}.")
+    for i, pag in enumerate(proj.get("paginas") or [], start=1):
+        if not isinstance(pag, dict) or not pag.get("id") or not isinstance(pag.get("label"), str):
+            errores.append(f"Página #{i}: se esperaba {{id, label}}.")
+    rows = proj.get("choices_ext_rows") or []
+    if not isinstance(rows, list) or not all(isinstance(r, dict) and "list_name" in r and "name" in r for r in rows):
+        errores.append("choices_ext_rows: cada fila debe tener list_name y name.")
+    return errores
+
+def proyecto_a_archivo(proj: Dict, comprimir: bool = False) -> bytes:
+    """Proyecto → bytes del archivo (schema 2, JSON sin espacios; gzip si comprimir)."""
+    raw = json.dumps(proyecto_compacto(proj), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(raw, compresslevel=6, mtime=0) if comprimir else raw
+
+def proyecto_desde_archivo(raw: bytes) -> Dict:
+    """
+    Bytes de un archivo de proyecto (.json o .json.gz, cualquier schema conocido) → dict de proyecto_a_dict.
+    ValueError si no es un proyecto, es de un schema más nuevo o no pasa validar_proyecto.
+    """
+    if raw[:2] == b"\x1f\x8b":
+        try:
+            raw = gzip.decompress(raw)
+        except (OSError, EOFError) as e:
+            raise ValueError(f"El archivo .gz está dañado: {e}") from None
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"El archivo no es un JSON válido: {e}") from None
+    if not isinstance(data, dict):
+        raise ValueError("El archivo no es un proyecto (se esperaba un objeto JSON).")
+    schema = data.get("schema", 1)
+    lector = _LECTORES_PROYECTO.get(schema)
+    if lector is None:
+        raise ValueError(f"Proyecto con schema {schema!r}: esta versión de la app lee hasta el {PROYECTO_SCHEMA}.")
+    try:
+        proj = lector(data)
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError(f"Proyecto schema {schema} mal formado: {e!r}") from None
+    errores = validar_proyecto(proj)
+    if errores:
+        raise ValueError("Proyecto inválido:\n" + "\n".join(f"- {e}" for e in errores[:20]))
+    return proj
+
+
+# ------------------------------------------------------------------------------------------
+# Importar un XLSForm (.xlsx) existente → proyecto editable (inverso de construir_xlsform)
+# ------------------------------------------------------------------------------------------
+TIPOS_DESDE_XLSFORM = {
+    "text": "Texto (corto)",
+    "integer": "Número",
+    "decimal": "Número",
+    "date": "Fecha",
+    "time": "Hora",
+    "geopoint": "GPS (ubicación)",
+    "select_one": "Selección única",
+    "select_multiple": "Selección múltiple",
+}
+LISTAS_CATALOGO = ("list_canton", "list_distrito")
+GRUPOS_FIJOS = {"p1_intro", "p2_consentimiento", "p_fin_no"}
+
+_ATOMO_REGLA_RE = (
+    (re.compile(r"^\$\{(\w+)\}='([^']*)'$"), "="),
+    (re.compile(r"^\$\{(\w+)\}!='([^']*)'$"), "!="),
+    (re.compile(r"^selected\(\$\{(\w+)\},\s*'([^']*)'\)$"), "selected"),
+)
+_FIN_FLAG_RE = re.compile(r"^\$\{fin_flag_\d+\}!=1$")
+_FIN_CALC_RE = re.compile(r"^if\((.*), 1, 0\)$", re.S)
+
+def _filas_hoja(wb, nombre: str):
+    """Filas de una hoja como dicts {columna: valor}, en streaming (hoja read-only, fila por fila)."""
+    if nombre not in wb.sheetnames:
+        return
+    filas = wb[nombre].iter_rows(values_only=True)
+    cols = None
+    for row in filas:
+        if cols is None:
+            cols = [str(v).strip() if v is not None else None for v in row]
+            continue
+        fila = {c: v for c, v in zip(cols, row) if c and v is not None and str(v).strip() != ""}
+        if fila:
+            yield fila
+
+def _reglas_desde_expr(expr: str) -> Optional[List[Dict]]:
+    """
+    Inverso de build_relevant_expr: un OR de comparaciones simples → reglas [{src, op, values}]
+    (una por pregunta/operador, en orden de aparición). None si la expresión no tiene esa forma.
+    """
+    reglas = {}
+    for term in _disyuncion(expr):
+        for patron, op in _ATOMO_REGLA_RE:
+            m = patron.match(term)
+            if m:
+                reglas.setdefault((m.group(1), op), []).append(m.group(2))
+                break
+        else:
+            return None
+    return [{"src": src, "op": op, "values": vals} for (src, op), vals in reglas.items()]
+
+def _separar_relevant(expr: Optional[str], rel_si: str):
+    """
+    Quita de un relevant lo que construir_xlsform agrega solo (consentimiento y flags de finalización)
+    y devuelve (reglas del panel, relevant manual). Solo el último término AND puede venir del panel.
+    """
+    terms = [t for t in _conjuncion(expr or "") if t != rel_si and not _FIN_FLAG_RE.match(t)]
+    reglas = _reglas_desde_expr(terms[-1]) if terms else None
+    if reglas:
+        terms = terms[:-1]
+    manual = " and ".join(terms) if len(terms) != 1 else _sin_parentesis_externos(terms[0])
+    return reglas or [], manual or None
+
+def proyecto_desde_xlsform(origen) -> Tuple[Dict, List[str]]:
+    """
+    Lee un XLSForm (.xlsx: ruta o archivo binario) y arma un proyecto como el de proyecto_a_dict:
+    preguntas (con página, opciones y list_override), reglas de visibilidad y de finalización,
+    páginas, texto de la matriz 9 y catálogo Cantón→Distrito.
+    Las hojas se leen en streaming (read-only); de choices solo se guardan las listas que usa survey
+    y las del catálogo. Devuelve (proyecto, avisos) con lo que no se pudo representar.
+    """
+    avisos = []
+    wb = load_workbook(origen, read_only=True, data_only=True)
+    try:
+        if "survey" not in wb.sheetnames:
+            raise ValueError("El archivo no tiene hoja 'survey' (¿es un XLSForm?).")
+        settings = next(_filas_hoja(wb, "settings"), {})
+        rel_si = f"${{consentimiento}}='{CONSENT_SI}'"
+
+        preguntas, listas_de = [], {}
+        reglas_vis, fin_calcs = [], []
+        paginas, textos_fijos = [], {}
+        logo_media_name = None
+        grupos = []  # pila de begin_group abiertos (names)
+
+        for row in _filas_hoja(wb, "survey"):
+            tipo = str(row.get("type", "")).strip()
+            name = str(row.get("name", "")).strip()
+            label = row.get("label")
+            if tipo == "begin_group":
+                if not grupos and name not in GRUPOS_FIJOS:
+                    # El relevant propio de la página (sin consentimiento ni flags) se conserva tal cual
+                    rel_pag = " and ".join(
+                        t for t in _conjuncion(row.get("relevant") or "") if t != rel_si and not _FIN_FLAG_RE.match(t)
+                    ) or None
+                    paginas.append({"id": name, "label": str(label or name), "intro": None, "relevant": rel_pag, "notas": None})
+                elif name == "matriz_seguridad_9" and label:
+                    textos_fijos["matriz_9_label"] = str(label)
+                grupos.append(name)
+                continue
+            if tipo == "end_group":
+                if grupos:
+                    grupos.pop()
+                continue
+
+            pagina = grupos[0] if grupos else None
+            if tipo == "note":
+                if name == "intro_logo":
+                    logo_media_name = row.get("media::image") or logo_media_name
+                elif paginas and pagina == paginas[-1]["id"]:
+                    if name == f"{pagina}_intro":
+                        paginas[-1]["intro"] = str(label or "")
+                    elif name.startswith(f"{pagina}_note"):
+                        paginas[-1]["notas"] = (paginas[-1]["notas"] or []) + [str(label or "")]
+                    else:
+                        avisos.append(f"Nota `{name}` omitida (el constructor no tiene preguntas tipo nota).")
+                continue
+            if tipo == "calculate":
+                if name.startswith("fin_flag_"):
+                    fin_calcs.append(str(row.get("calculation") or ""))
+                else:
+                    avisos.append(f"calculate `{name}` omitido.")
+                continue
+
+            base, _, lista = tipo.partition(" ")
+            tipo_ui = TIPOS_DESDE_XLSFORM.get(base)
+            if tipo_ui is None:
+                avisos.append(f"Pregunta `{name}` de tipo '{tipo}' omitida (tipo no soportado).")
+                continue
+            appearance = row.get("appearance")
+            if tipo_ui == "Texto (corto)" and appearance == "multiline":
+                tipo_ui, appearance = "Párrafo (texto largo)", None
+
+            reglas_q, manual = _separar_relevant(row.get("relevant"), rel_si)
+            for r in reglas_q:
+                reglas_vis.append({"target": name, **r})
+            q = {
+                "tipo_ui": tipo_ui,
+                "label": str(label or name),
+                "name": name,
+                "required": str(row.get("required", "")).strip().lower() in ("yes", "true", "1"),
+                "opciones": [],
+                "appearance": appearance,
+                "choice_filter": row.get("choice_filter"),
+                "relevant": manual,
+                "pagina": PAGINA_CONSENTIMIENTO if pagina == "p2_consentimiento" else pagina,
+            }
+            if lista:
+                lista = lista.strip()
+                if lista != f"list_{name}" and lista not in LISTAS_CATALOGO:
+                    q["list_override"] = lista
+                listas_de.setdefault(lista, []).append(q)
+            if row.get("constraint") and name not in {"canton", "distrito"} and "count-selected" not in str(row["constraint"]):
+                avisos.append(f"constraint de `{name}` omitido (se regenera solo el de opciones exclusivas).")
+            preguntas.append(q)
+
+        # choices: opciones de las listas usadas + catálogo; el resto se descarta sin guardarlo
+        catalogo, extra_cols = [], set()
+        renombradas = set()
+        for row in _filas_hoja(wb, "choices"):
+            lista = str(row.get("list_name", "")).strip()
+            if lista in LISTAS_CATALOGO:
+                fila = {k: (str(v) if not isinstance(v, str) else v) for k, v in row.items()}
+                catalogo.append(fila)
+                extra_cols.update(k for k in fila if k not in ("list_name", "name", "label"))
+                continue
+            qs = listas_de.get(lista)
+            if not qs:
+                continue
+            label = str(row.get("label", row.get("name", "")))
+            for q in qs:
+                q["opciones"].append(label)
+            if slugify_name(label) != str(row.get("name", "")):
+                renombradas.add(lista)
+    finally:
+        wb.close()
+
+    for lista in sorted(renombradas):
+        avisos.append(f"Lista `{lista}`: hay opciones cuyo name no coincide con su etiqueta; al exportar se regeneran desde la etiqueta.")
+
+    # Finalización: fin_flag_NN = if([${flag anterior}=1 or ]cond, 1, 0)
+    idx_by_name = {q["name"]: i for i, q in enumerate(preguntas)}
+    reglas_fin = []
+    for k, calc in enumerate(fin_calcs):
+        m = _FIN_CALC_RE.match(calc.strip())
+        cond = m.group(1) if m else ""
+        if k and m:
+            partes = _dividir_nivel_superior(cond, "or")
+            cond = " or ".join(partes[1:]) if partes and re.match(r"^\$\{\w+\}=1$", partes[0]) else cond
+        reglas = _reglas_desde_expr(cond) if cond else None
+        if not reglas or len(reglas) != 1 or reglas[0]["src"] not in idx_by_name:
+            avisos.append(f"Regla de finalización #{k + 1} omitida (no se reconoce: {calc}).")
+            continue
+        reglas_fin.append(reglas[0])
+
+    proj = {
+        "form_title": settings.get("form_title") or "Encuesta comunidad",
+        "idioma": settings.get("default_language") or "es",
+        "version": str(settings.get("version") or "1"),
+        "preguntas": preguntas,
+        "reglas_visibilidad": reglas_vis,
+        "reglas_finalizar": reglas_fin,
+        "choices_ext_rows": catalogo,
+        "choices_extra_cols": sorted(extra_cols),
+        "textos_fijos": {"matriz_9_label": MATRIZ_9_LABEL_DEFAULT, **textos_fijos},
+        "paginas": paginas or paginas_por_defecto(),
+    }
+    if logo_media_name:
+        proj["logo_media_name"] = str(logo_media_name)
+    return proj, avisos
+
+# ------------------------------------------------------------------------------------------
+# Importar el "Formato de encuesta" en Word (.docx) → proyecto borrador
+# ------------------------------------------------------------------------------------------
+# Convenciones del formato: encabezados de sección en negrita ("I. DATOS ...", "Delitos"), preguntas en
+# negrita con número ("7.", "7.1.", "29.2", "31-"), opciones "( ) X" (única) o "☐ X" (múltiple) o en lista
+# numerada, escalas "1\t2\t...", notas "Nota: ..." (tipo de respuesta y lógica condicional) y la matriz 9
+# como tabla (fila de encabezado "Zona" + escala, una fila por espacio).
+_FORMATO_PREGUNTA_RE = re.compile(r"^(\d+(?:\.\d+)*)\.?(?:\s*-\s*|\s+|(?<=\.))(?=[¿\"“A-Za-zÁÉÍÓÚÑáéíóúñ])")
+_FORMATO_MARCA_RE = re.compile(r"\(\s*\)|☐")
+_FORMATO_LEYENDA_RE = re.compile(r"(\d+)\s*\(([^)]*)\)")
+_FORMATO_GRUPO_RE = re.compile(r"^[A-Z]\.\s")
+_FORMATO_SECCION_RE = re.compile(r"^[IVXLC]+\.\s")
+_FORMATO_NOTA_RE = re.compile(r"^\W*Nota\b|Lógica Condicional|se habilita", re.I)
+_FORMATO_LOGICA_RE = re.compile(r"Lógica Condicional|se habilita|pase a la pregunta|pasar a", re.I)
+# Prefijo de la línea de respuesta abierta → tipo (inverso de FORMATO_RESPUESTA_ABIERTA)
+_FORMATO_ABIERTA_POR_PREFIJO = tuple(
+    (linea.split("_")[0].strip(), tipo_ui) for tipo_ui, linea in FORMATO_RESPUESTA_ABIERTA.items() if linea.split("_")[0].strip()
+)
+_FORMATO_OTRO_RE = re.compile(r"[\s:]*_{3,}\s*$")
+_FORMATO_FIN_RE = re.compile(r"-{3,}\s*Fin de la Encuesta", re.I)
+
+def _formato_bloques(doc):
+    """Párrafos y tablas del cuerpo en orden de documento (python-docx los expone por separado)."""
+    from docx.table import Table as DocxTable
+    from docx.text.paragraph import Paragraph as DocxParagraph
+
+    for el in doc.element.body.iterchildren():
+        if el.tag.endswith("}p"):
+            yield DocxParagraph(el, doc)
+        elif el.tag.endswith("}tbl"):
+            yield DocxTable(el, doc)
+
+def _formato_negrita(par) -> bool:
+    """Empieza en negrita (el formato mezcla negrita y normal dentro de la misma pregunta)."""
+    run = next((r for r in par.runs if r.text.strip()), None)
+    if run is None:
+        return False
+    return bool(run.bold or (run.bold is None and par.style is not None and par.style.font.bold))
+
+def _formato_numerado(par) -> bool:
+    ppr = par._p.pPr
+    return ppr is not None and ppr.numPr is not None
+
+def _formato_opciones(texto: str) -> Tuple[List[str], List[str], bool]:
+    """Separa un párrafo en (líneas sin marca, opciones, ¿alguna con ☐?)."""
+    resto, opciones, multiple = [], [], False
+    for linea in texto.split("\n"):
+        marcas = _FORMATO_MARCA_RE.findall(linea)
+        if not marcas:
+            if linea.strip():
+                resto.append(linea.strip())
+            continue
+        piezas = _FORMATO_MARCA_RE.split(linea)
+        if piezas[0].strip():
+            resto.append(piezas[0].strip())
+        opciones.extend(" ".join(p.split()) for p in piezas[1:] if p.strip())
+        multiple = multiple or "☐" in marcas
+    return resto, opciones, multiple
+
+def _formato_siguiente(bloques, k: int) -> str:
+    """Texto del siguiente párrafo no vacío ("" si lo que sigue es una tabla o el final)."""
+    for b in bloques[k + 1:]:
+        if not hasattr(b, "runs"):
+            return ""
+        if b.text.strip():
+            return b.text.strip()
+    return ""
+
+def _formato_respuesta_abierta(texto: str) -> Optional[str]:
+    """Tipo de una línea de respuesta abierta ("Espacio abierto para detallar: ____", "Fecha: __ / __", "____")."""
+    if "___" not in texto or _FORMATO_MARCA_RE.search(texto):
+        return None
+    for prefijo, tipo_ui in _FORMATO_ABIERTA_POR_PREFIJO:
+        if texto.startswith(prefijo):
+            return tipo_ui
+    return "Texto (corto)" if not texto.strip("_ \n") else None
+
+def _formato_es_respuesta(texto: str) -> bool:
+    """¿El párrafo es la respuesta de una pregunta (opciones, escala, línea abierta o nota de catálogo)?"""
+    return bool(_FORMATO_MARCA_RE.search(texto) or _formato_respuesta_abierta(texto)
+                or texto == FORMATO_NOTA_CATALOGO or (texto.split() and all(t.isdigit() for t in texto.split())))
+
+def _formato_referencias(referencia) -> Tuple[Dict, Dict, Dict]:
+    """
+    Índices de la referencia para conservar names entre ediciones: etiqueta sin número → preguntas,
+    número → preguntas, y name → pregunta de seguimiento (la no numerada que le sigue, p. ej. el "Otro").
+    """
+    por_label, por_numero, seguimiento = {}, {}, {}
+    anterior = None
+    for q in referencia:
+        label = str(q.get("label") or "")
+        m = _FORMATO_PREGUNTA_RE.match(label)
+        por_label.setdefault(slugify_name(label[m.end():] if m else label), []).append(q)
+        if m:
+            por_numero.setdefault(m.group(1), []).append(q)
+            anterior = q
+        elif anterior is not None and q.get("name") not in MATRIZ_9_NAMES:
+            seguimiento.setdefault(anterior["name"], q)
+            anterior = None
+    return por_label, por_numero, seguimiento
+
+def _formato_libre(candidatas, usados: set) -> Optional[Dict]:
+    """Primera pregunta de referencia cuyo name no se asignó todavía (etiquetas repetidas: "Otro")."""
+    return next((q for q in candidatas or () if q.get("name") not in usados), None)
+
+def _formato_cerrar_pregunta(actual: Dict, proj: Dict, refs, usados: set, avisos: List[str]):
+    """Decide tipo / opciones de la pregunta abierta y la agrega (con su "Otro" de seguimiento)."""
+    por_label, por_numero, seguimiento = refs
+    label, numero, pistas = actual["label"], actual["numero"], " ".join(actual["notas"]).lower()
+    opciones = []
+    otros = []
+    for op in actual["leyenda"] or actual["opciones"]:
+        limpia = _FORMATO_OTRO_RE.sub("", op).strip()
+        if limpia != op.strip():
+            otros.append(limpia)
+        if limpia and limpia not in opciones:
+            opciones.append(limpia)
+
+    if "selección múltiple" in pistas or "todas las que" in pistas:
+        tipo_ui = "Selección múltiple"
+    elif "selección única" in pistas or "sección única" in pistas or "una única opción" in pistas:
+        tipo_ui = "Selección única"
+    elif actual["multiple"]:
+        tipo_ui = "Selección múltiple"
+    else:
+        tipo_ui = "Selección única"
+    catalogo = not opciones and "desplegable" in pistas
+    if not opciones and not catalogo:
+        tipo_ui = actual["abierta"] or "Texto (corto)"
+        if tipo_ui == "Texto (corto)" and "abiert" in pistas:
+            tipo_ui = "Párrafo (texto largo)"  # "____" con nota "La respuesta es abierta"
+
+    sin_numero = label[actual["inicio"]:]
+    ref = _formato_libre(por_label.get(slugify_name(sin_numero)), usados) or _formato_libre(por_numero.get(numero), usados)
+    if actual.get("name"):
+        base = actual["name"]
+    elif catalogo and slugify_name(sin_numero).split("_")[0] in ("canton", "distrito"):
+        base = slugify_name(sin_numero).split("_")[0]
+    elif ref is not None:
+        base = ref["name"]
+    else:
+        base = "_".join(slugify_name(sin_numero).split("_")[:4])
+    name = asegurar_nombre_unico(base, usados)
+    usados.add(name)
+
+    # Escalas (1..10) y respuestas cortas tipo Sí / No / A veces van en una fila, como en el seed
+    horizontal = opciones and (all(len(o) <= 3 for o in opciones) or (len(opciones) <= 3 and all(len(o) <= 20 for o in opciones)))
+    q = {
+        "tipo_ui": tipo_ui,
+        "label": label,
+        "name": name,
+        "required": True,
+        "opciones": opciones,
+        "appearance": "horizontal" if horizontal else None,
+        "choice_filter": "canton_key=${canton}" if catalogo and name == "distrito" else None,
+        "relevant": None,
+        "pagina": actual["pagina"],
+    }
+    proj["preguntas"].append(q)
+    if actual["logica"]:
+        avisos.append(f"Pregunta {numero or name}: lógica condicional no importada ({actual['logica'][0][:120]}).")
+
+    for op in otros[:1]:
+        ref_otro = seguimiento.get(name)
+        name_otro = asegurar_nombre_unico(ref_otro["name"] if ref_otro else f"{name}_otro", usados)
+        usados.add(name_otro)
+        proj["preguntas"].append({
+            "tipo_ui": ref_otro["tipo_ui"] if ref_otro else "Texto (corto)",
+            "label": ref_otro["label"] if ref_otro else f"Especifique {op[:1].lower()}{op[1:]}:",
+            "name": name_otro,
+            "required": True,
+            "opciones": [],
+            "appearance": None,
+            "choice_filter": None,
+            "relevant": None,
+            "pagina": actual["pagina"],
+        })
+        proj["reglas_visibilidad"].append({
+            "target": name_otro, "src": name,
+            "op": "selected" if tipo_ui == "Selección múltiple" else "=",
+            "values": [slugify_name(op)],
+        })
+
+def _formato_matriz(tabla, actual: Optional[Dict], proj: Dict, refs, usados: set, avisos: List[str]) -> bool:
+    """Tabla de la matriz 9: escala en la fila de encabezado, una pregunta seg_* por fila (list_override común)."""
+    filas = [[c.text.strip() for c in row.cells] for row in tabla.rows]
+    if len(filas) < 2 or len(filas[0]) < 2:
+        return False
+    escala = [" ".join(c.split()) for c in filas[0][1:] if c]
+    if any(n in MATRIZ_9_NAMES for n in usados):
+        avisos.append("Tabla omitida: el constructor admite una sola matriz (la 9).")
+        return True
+    por_label = refs[0]
+    nombres_ref = [q["name"] for qs in por_label.values() for q in qs if q.get("name") in MATRIZ_9_NAMES]
+    for k, fila in enumerate(filas[1:]):
+        zona = " ".join(fila[0].split())
+        if not zona:
+            continue
+        ref = _formato_libre(por_label.get(slugify_name(zona)), usados)
+        base = ref["name"] if ref else (nombres_ref[k] if k < len(nombres_ref) else "seg_" + "_".join(slugify_name(zona).split("_")[:3]))
+        name = asegurar_nombre_unico(base, usados)
+        usados.add(name)
+        proj["preguntas"].append({
+            "tipo_ui": "Selección única", "label": zona, "name": name, "required": True,
+            "opciones": list(escala), "appearance": None, "choice_filter": None, "relevant": None,
+            "list_override": "list_matriz_seguridad",
+            "pagina": actual["pagina"] if actual else (proj["paginas"][-1]["id"] if proj["paginas"] else None),
+        })
+    if actual is not None:
+        proj["textos_fijos"]["matriz_9_label"] = actual["label"]
+    return True
+
+def proyecto_desde_docx(origen, referencia: List[Dict] = None) -> Tuple[Dict, List[str]]:
+    """
+    Lee un documento con la estructura del "Formato de encuesta" (.docx: ruta o archivo binario) y arma
+    un proyecto borrador como el de proyecto_a_dict: páginas (encabezados + intro), preguntas con tipo
+    deducido de las marcas y notas, "Otro: ____" → pregunta de seguimiento, matriz 9 y consentimiento.
+    referencia: preguntas cuyos names se reutilizan si coincide la etiqueta o el número (por defecto el
+    seed), para que una nueva edición conserve los names de la anterior.
+    La lógica condicional escrita en notas no se interpreta: queda en avisos para revisarla a mano.
+    El documento no trae catálogo Cantón→Distrito (choices_ext_rows queda vacío).
+    """
+    doc = Document(origen)
+    avisos = []
+    refs = _formato_referencias(seed_preguntas() if referencia is None else referencia)
+    paginas_ref = {slugify_name(pag["label"]): pag["id"] for pag in PAGINAS_ENCUESTA}
+    proj = {
+        "form_title": doc.core_properties.title or "Encuesta comunidad",
+        "idioma": "es",
+        "version": "1",
+        "preguntas": [],
+        "reglas_visibilidad": [],
+        "reglas_finalizar": [],
+        "choices_ext_rows": [],
+        "choices_extra_cols": [],
+        "textos_fijos": {"matriz_9_label": MATRIZ_9_LABEL_DEFAULT},
+        "paginas": [],
+    }
+    usados = set()
+    actual = None          # pregunta abierta (se cierra con la siguiente pregunta / encabezado / fin)
+    consentimiento = []    # párrafos antes de la pregunta de consentimiento
+    en_consentimiento = True
+    con_preguntas = False  # la última página ya tiene preguntas (lo que sigue no es su intro)
+
+    def cerrar():
+        nonlocal actual
+        if actual is not None:
+            _formato_cerrar_pregunta(actual, proj, refs, usados, avisos)
+            actual = None
+
+    def pagina_actual() -> str:
+        if not proj["paginas"]:
+            proj["paginas"].append({"id": "p_preguntas", "label": "Preguntas", "intro": None, "relevant": None, "notas": None})
+        return proj["paginas"][-1]["id"]
+
+    bloques = list(_formato_bloques(doc))
+    for k, bloque in enumerate(bloques):
+        if not hasattr(bloque, "runs"):
+            if not _formato_matriz(bloque, actual if actual and not actual["opciones"] else None, proj, refs, usados, avisos):
+                avisos.append("Tabla omitida: no tiene la forma de la matriz (encabezado + filas).")
+            elif actual is not None and not actual["opciones"]:
+                actual = None  # la pregunta 9 es el título de la matriz, no una pregunta
+            continue
+        texto = bloque.text.strip()
+        if not texto:
+            continue
+        if _FORMATO_FIN_RE.search(texto):
+            break
+        titulo = bloque.style is not None and bloque.style.name.startswith(("Heading", "Title"))
+        negrita = not titulo and _formato_negrita(bloque)
+        m = _FORMATO_PREGUNTA_RE.match(texto) if negrita else None
+        # Pregunta sin número (p. ej. el "Indique cuál es ese otro..." del Word que exporta el constructor)
+        grupo = _FORMATO_GRUPO_RE.match(texto) is not None and not (_FORMATO_SECCION_RE.match(texto) and texto.isupper())
+        sin_numero = (negrita and not m and not grupo and not texto[:1].islower()
+                      and len(_FORMATO_LEYENDA_RE.findall(texto)) < 2
+                      and _formato_es_respuesta(_formato_siguiente(bloques, k)))
+
+        if m or sin_numero or (en_consentimiento and texto.startswith("¿")):
+            cerrar()
+            resto, opciones, multiple = _formato_opciones(texto)
+            actual = {"label": "\n".join(resto), "numero": m.group(1) if m else None, "inicio": m.end() if m else 0,
+                      "opciones": opciones, "multiple": multiple, "leyenda": [], "notas": [], "logica": [],
+                      "abierta": None, "pagina": None}
+            if en_consentimiento and not m:
+                fijos = {slugify_name(b) for b in CONSENTIMIENTO_BLOQUES}
+                if not fijos <= {slugify_name(b) for b in consentimiento}:
+                    avisos.append("El texto del consentimiento difiere del fijo del constructor; se conserva el fijo.")
+                actual.update(name="consentimiento", pagina=PAGINA_CONSENTIMIENTO)
+            else:
+                actual["pagina"] = pagina_actual()
+                con_preguntas = True
+            en_consentimiento = False
+            continue
+
+        if en_consentimiento:
+            if not titulo:
+                consentimiento.append(texto)
+            continue
+
+        if actual is not None and not titulo:
+            if _FORMATO_NOTA_RE.search(texto) or (actual["opciones"] and not negrita and not _formato_numerado(bloque)
+                                                and not _FORMATO_MARCA_RE.search(texto)):
+                actual["notas"].append(texto)
+                if _FORMATO_LOGICA_RE.search(texto):
+                    actual["logica"].append(texto)
+                continue
+            _, opciones, multiple = _formato_opciones(texto)
+            if opciones:
+                actual["opciones"].extend(opciones)
+                actual["multiple"] = actual["multiple"] or multiple
+                continue
+            tokens = texto.split()
+            if tokens and all(t.isdigit() for t in tokens):
+                if not actual["opciones"]:
+                    actual["opciones"] = tokens
+                continue
+            if negrita and len(_FORMATO_LEYENDA_RE.findall(texto)) > 1 and not actual["opciones"]:
+                actual["leyenda"] = [f"{t.strip()} ({n})" for n, t in _FORMATO_LEYENDA_RE.findall(texto)]
+                continue
+            abierta = _formato_respuesta_abierta(texto)
+            if abierta:
+                actual["abierta"] = abierta
+                continue
+            if _formato_numerado(bloque):
+                actual["opciones"].append(" ".join(texto.split()))
+                continue
+            if negrita and grupo:
+                continue  # subtítulo de un grupo de opciones ("A. Robo y Asalto")
+            if negrita and not actual["opciones"] and texto[:1].islower():
+                actual["label"] += " " + texto
+                continue
+            if not negrita:
+                if not texto.startswith("(") and not actual["opciones"]:
+                    actual["label"] += "\n" + texto
+                continue
+
+        if negrita or titulo:
+            # Encabezado de sección → página (dos seguidos sin contenido se unen: "Victimización — Apartado A")
+            cerrar()
+            label = " ".join(texto.split())
+            ultima = proj["paginas"][-1] if proj["paginas"] else None
+            if ultima and not ultima["intro"] and not con_preguntas:
+                proj["paginas"].pop()
+                label = f"{ultima['label']} — {label}"
+            pid = paginas_ref.get(slugify_name(label)) or paginas_ref.get(slugify_name(label.split(" — ")[0]))
+            if pid is None or any(p["id"] == pid for p in proj["paginas"]):
+                pid = nuevo_id_pagina(label, proj["paginas"])
+            proj["paginas"].append({"id": pid, "label": label, "intro": None, "relevant": None, "notas": None})
+            con_preguntas = False
+        elif proj["paginas"] and not con_preguntas:
+            pag = proj["paginas"][-1]
+            pag["intro"] = f"{pag['intro']} {texto}" if pag["intro"] else texto
+    cerrar()
+
+    if not proj["preguntas"]:
+        raise ValueError("No se encontraron preguntas numeradas (¿es un Formato de encuesta?).")
+    if not proj["paginas"]:
+        proj["paginas"] = paginas_por_defecto()
+    return proj, avisos
+
+
+# ------------------------------------------------------------------------------------------
+# Lote por delegaciones (pool de procesos → un solo .zip)
+# ------------------------------------------------------------------------------------------
+# Cada delegación es un str (nombre) o un dict:
+#   {"nombre": "San Carlos Oeste",
+#    "logo": "ruta/logo.png",            # opcional: archivo para media::image de esa delegación
+#    "cantones": ["San Carlos", ...]}    # opcional: subconjunto del catálogo (label o name del cantón)
+_LOTE_ESTADO = None  # proyecto ya cargado en cada proceso del pool (se envía una vez por proceso)
+_LOTE_DOCX = None    # cuestionario Word sin portada (solo con incluir_word)
+_LOTE_LOGO = None    # logo por defecto para la portada del Word / encabezado del PDF
+_LOTE_PDF = False    # agregar el formato PDF de cada delegación
+
+def _normalizar_delegacion(d) -> Dict:
+    return {"nombre": d} if isinstance(d, str) else dict(d)
+
+def _subconjunto_catalogo(rows: List[Dict], cantones: List[str]) -> List[Dict]:
+    """Placeholders + cantones pedidos (por label o name) + sus distritos."""
+    pedidos = {str(c).strip() for c in cantones}
+    slugs = {r["name"] for r in rows
+             if r.get("list_name") == "list_canton" and (r.get("name") in pedidos or r.get("label") in pedidos)}
+    return [
+        r for r in rows
+        if (r.get("list_name"), r.get("name")) in PLACEHOLDER_KEYS
+        or (r.get("list_name") == "list_canton" and r.get("name") in slugs)
+        or (r.get("list_name") == "list_distrito" and r.get("canton_key") in slugs)
+        or r.get("list_name") not in ("list_canton", "list_distrito")
+    ]
+
+def _init_lote(proyecto: Dict, incluir_word: bool = False, logo_bytes: bytes = None, incluir_pdf: bool = False):
+    global _LOTE_ESTADO, _LOTE_DOCX, _LOTE_LOGO, _LOTE_PDF
+    _LOTE_ESTADO = estado_desde_proyecto(proyecto)
+    # El cuestionario en Word es el mismo para todas las delegaciones: una vez por proceso
+    _LOTE_DOCX = docx_cuestionario_bytes(_LOTE_ESTADO["preguntas"], _LOTE_ESTADO) if incluir_word else None
+    _LOTE_LOGO = logo_bytes
+    _LOTE_PDF = incluir_pdf
+
+def _construir_delegacion(args):
+    """
+    Corre en un proceso del pool: devuelve (carpeta, xlsx_ruta, logo_name, logo_bytes, docx_bytes, pdf_bytes) de una delegación.
+    El .xlsx queda en un temporal (no viaja serializado entre procesos); el proceso principal lo copia al zip y lo borra.
+    """
+    delegacion, idioma, version, logo_defecto = args
+    base = _LOTE_ESTADO
+    nombre = delegacion["nombre"]
+    carpeta = slugify_name(nombre)
+
+    estado = dict(base)
+    if delegacion.get("cantones"):
+        set_catalogo(estado, _subconjunto_catalogo(base["choices_ext_rows"], delegacion["cantones"]))
+
+    logo_path = delegacion.get("logo")
+    logo_name = os.path.basename(logo_path) if logo_path else logo_defecto
+    df_survey, df_choices, df_settings = construir_xlsform(
+        estado["preguntas"],
+        form_title=titulo_formulario(nombre),
+        idioma=idioma,
+        version=version,
+        reglas_vis=estado["reglas_visibilidad"],
+        reglas_fin=estado["reglas_finalizar"],
+        estado=estado,
+        logo_media_name=logo_name,
+    )
+    logo_bytes = None
+    if logo_path:
+        with open(logo_path, "rb") as f:
+            logo_bytes = f.read()
+    docx_bytes = None
+    if _LOTE_DOCX is not None:
+        docx_bytes = word_encuesta_bytes(estado["preguntas"], titulo_formulario(nombre), estado,
+                                         logo_bytes=logo_bytes or _LOTE_LOGO, cuestionario=_LOTE_DOCX)
+    pdf_bytes = None
+    if _LOTE_PDF:
+        pdf_bytes = pdf_encuesta_bytes(estado["preguntas"], titulo_formulario(nombre), estado,
+                                       logo_bytes=logo_bytes or _LOTE_LOGO)
+    return carpeta, xlsform_temporal(df_survey, df_choices, df_settings), logo_name, logo_bytes, docx_bytes, pdf_bytes
+
+def construir_lote_delegaciones(proyecto: Dict, delegaciones: List, destino=None, max_workers: int = None,
+                                logo_media_name: str = None, logo_bytes: bytes = None, incluir_word: bool = False,
+                                incluir_pdf: bool = False):
+    """
+    Construye un XLSForm por delegación con un pool de procesos y los escribe en un .zip
+    (una carpeta Survey123 Connect por delegación: <slug>/<slug>.xlsx y <slug>/media/<logo>).
+    destino: ruta o archivo binario; si es None se devuelven los bytes del zip.
+    incluir_word / incluir_pdf: agregan también <slug>/<slug>_formato.docx / .pdf (formato de encuesta para papel).
+    """
+    delegaciones = [_normalizar_delegacion(d) for d in delegaciones]
+    slugs = [slugify_name(d["nombre"]) for d in delegaciones]
+    if len(slugs) != len(set(slugs)):
+        raise ValueError("Hay delegaciones repetidas (mismo nombre normalizado).")
+
+    estado = estado_desde_proyecto(proyecto)
+    names = [q["name"] for q in estado["preguntas"]]
+    if len(names) != len(set(names)):
+        raise ValueError("Hay 'name' duplicados en las preguntas del proyecto.")
+
+    idioma = proyecto.get("idioma") or "es"
+    version = proyecto.get("version") or "1"
+    logo_defecto = os.path.basename(logo_media_name or proyecto.get("logo_media_name") or DEFAULT_LOGO_MEDIA_NAME)
+    tareas = [(d, idioma, version, logo_defecto) for d in delegaciones]
+
+    workers = min(max_workers or os.cpu_count() or 1, len(tareas))
+
+    salida = BytesIO() if destino is None else destino
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        def _escribir(resultado):
+            carpeta, xlsx_ruta, logo_name, logo_propio, docx_bytes, pdf_bytes = resultado
+            try:
+                agregar_bundle_survey123(zf, carpeta, xlsx_ruta=xlsx_ruta, logo_media_name=logo_name,
+                                         logo_bytes=logo_propio or logo_bytes, docx_bytes=docx_bytes,
+                                         pdf_bytes=pdf_bytes)
+            finally:
+                os.remove(xlsx_ruta)
+
+        if workers <= 1:
+            _init_lote(proyecto, incluir_word, logo_bytes, incluir_pdf)
+            for resultado in map(_construir_delegacion, tareas):
+                _escribir(resultado)
+        else:
+            # "spawn": los procesos hijos no heredan el estado del servidor (Streamlit) y funciona igual en Windows
+            chunksize = max(1, len(tareas) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_lote, initargs=(proyecto, incluir_word, logo_bytes, incluir_pdf)) as ex:
+                for resultado in ex.map(_construir_delegacion, tareas, chunksize=chunksize):
+                    _escribir(resultado)
+
+    if destino is None:
+        return salida.getvalue()
+    return None
+
+# ------------------------------------------------------------------------------------------
+# CLI: proyecto JSON → XLSForm
+# ------------------------------------------------------------------------------------------
+def _leer_logo(logo_name: str) -> Optional[bytes]:
+    """Bytes del logo: la ruta dada o, si no existe, el archivo con ese nombre junto al motor (None si no hay)."""
+    for cand in (logo_name, os.path.join(BASE_DIR, logo_name)):
+        if os.path.isfile(cand):
+            with open(cand, "rb") as f:
+                return f.read()
+    return None
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Genera un XLSForm (.xlsx) para Survey123 a partir de un proyecto JSON exportado por la app."
+    )
+    parser.add_argument("proyecto", help="Ruta del proyecto .json / .json.gz (Exportar proyecto), de un XLSForm .xlsx existente "
+                                         "o de un Formato de encuesta en Word (.docx).")
+    parser.add_argument("-o", "--salida",
+                        help="Ruta del .xlsx, .zip (Survey123 Connect), .docx o .pdf (formato de encuesta) "
+                             "o .json / .json.gz (proyecto); por defecto: <form_title>_xlsform.xlsx.")
+    parser.add_argument("--titulo", help="Sobrescribe form_title del proyecto.")
+    parser.add_argument("--version", help="Sobrescribe settings.version del proyecto.")
+    parser.add_argument("--idioma", help="Sobrescribe default_language del proyecto.")
+    parser.add_argument("--logo", help="Nombre de archivo para media::image (por defecto: el del proyecto o 001.png).")
+    parser.add_argument("--delegaciones",
+                        help="JSON con la lista de delegaciones (nombres o {nombre, logo, cantones}); genera un .zip.")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool para --delegaciones (por defecto: CPUs).")
+    parser.add_argument("--word", action="store_true", help="Con --delegaciones: agrega el formato Word de cada delegación.")
+    parser.add_argument("--pdf", action="store_true", help="Con --delegaciones: agrega el formato PDF de cada delegación.")
+    args = parser.parse_args(argv)
+
+    if args.proyecto.lower().endswith((".xlsx", ".docx")):
+        importar = proyecto_desde_docx if args.proyecto.lower().endswith(".docx") else proyecto_desde_xlsform
+        try:
+            data, avisos = importar(args.proyecto)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        for aviso in avisos:
+            print(f"Aviso: {aviso}", file=sys.stderr)
+    else:
+        with open(args.proyecto, "rb") as f:
+            raw = f.read()
+        try:
+            data = proyecto_desde_archivo(raw)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
+    if args.salida and args.salida.lower().endswith((".json", ".json.gz")):
+        with open(args.salida, "wb") as f:
+            f.write(proyecto_a_archivo(data, comprimir=args.salida.lower().endswith(".gz")))
+        print(f"Proyecto generado: {args.salida} ({len(data.get('preguntas', []))} preguntas)")
+        return 0
+
+    estado = estado_desde_proyecto(data)
+
+    names = [q["name"] for q in estado["preguntas"]]
+    if len(names) != len(set(names)):
+        print("Error: hay 'name' duplicados en las preguntas del proyecto.", file=sys.stderr)
+        return 2
+
+    validacion = validar_dependencias(estado["preguntas"], estado["reglas_visibilidad"],
+                                      estado["reglas_finalizar"], estado["paginas"])
+    for aviso in validacion["avisos"]:
+        print(f"Aviso: {aviso}", file=sys.stderr)
+    if validacion["errores"]:
+        for error in validacion["errores"]:
+            print(f"Error: {error}", file=sys.stderr)
+        return 2
+
+    # Logo por defecto si existe (ruta dada o junto al motor)
+    logo_name = args.logo or data.get("logo_media_name") or DEFAULT_LOGO_MEDIA_NAME
+    logo_media_name = os.path.basename(logo_name)  # media::image y el archivo en media/ deben coincidir
+    logo_bytes = _leer_logo(logo_name)
+
+    if args.delegaciones:
+        with open(args.delegaciones, "r", encoding="utf-8") as f:
+            delegaciones = json.load(f)
+        if args.version:
+            data["version"] = args.version
+        if args.idioma:
+            data["idioma"] = args.idioma
+        salida = args.salida or "lote_delegaciones.zip"
+        try:
+            construir_lote_delegaciones(data, delegaciones, destino=salida, max_workers=args.procesos,
+                                        logo_media_name=logo_media_name, logo_bytes=logo_bytes,
+                                        incluir_word=args.word, incluir_pdf=args.pdf)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        print(f"Lote generado: {salida} ({len(delegaciones)} delegaciones)")
+        return 0
+
+    form_title = args.titulo or data.get("form_title") or "Encuesta comunidad"
+    salida = args.salida or (slugify_name(form_title) + "_xlsform.xlsx")
+
+    if salida.lower().endswith(".docx"):
+        escribir_docx(salida, estado["preguntas"], form_title, estado, logo_bytes=logo_bytes)
+        print(f"Formato Word generado: {salida} ({len(estado['preguntas'])} preguntas)")
+        return 0
+    if salida.lower().endswith(".pdf"):
+        escribir_pdf(salida, estado["preguntas"], form_title, estado, logo_bytes=logo_bytes)
+        print(f"Formato PDF generado: {salida} ({len(estado['preguntas'])} preguntas)")
+        return 0
+
+    stats = {}
+    df_survey, df_choices, df_settings = construir_xlsform(
+        estado["preguntas"],
+        form_title=form_title,
+        idioma=args.idioma or data.get("idioma") or "es",
+        version=args.version or data.get("version") or "1",
+        reglas_vis=estado["reglas_visibilidad"],
+        reglas_fin=estado["reglas_finalizar"],
+        estado=estado,
+        logo_media_name=logo_media_name,
+        stats=stats,
+    )
+
+    if salida.lower().endswith(".zip"):
+        # Proyecto Survey123 Connect: xlsx + media/ (logo)
+        with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            agregar_bundle_survey123(zf, slugify_name(form_title), dfs=(df_survey, df_choices, df_settings),
+                                     logo_media_name=logo_media_name, logo_bytes=logo_bytes)
+    else:
+        escribir_xlsform(salida, df_survey, df_choices, df_settings)
+    print(f"XLSForm generado: {salida} (survey: {len(df_survey)} filas, choices: {len(df_choices)} filas)")
+    print(f"relevant: {stats['bytes_antes']} → {stats['bytes_despues']} bytes "
+          f"({stats['bytes_antes'] - stats['bytes_despues']} bytes menos)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import shutil
+import zipfile
+
+import pandas as pd
+
+import motor_xlsform as m
+
+
+def _proyecto_seed(tmp_path):
+    estado = {"preguntas": list(m.plantilla_seed())}
+    m.inicializar_estado(estado)
+    ruta = tmp_path / "proyecto.json"
+    ruta.write_bytes(m.proyecto_a_archivo(m.proyecto_a_dict(estado, "Encuesta comunidad", "es", "1")))
+    return ruta
+
+
+def _media_image(zf: zipfile.ZipFile, xlsx: str):
+    with zf.open(xlsx) as f:
+        survey = pd.read_excel(f, sheet_name="survey")
+    return set(survey["media::image"].dropna())
+
+
+def test_zip_con_logo_en_subcarpeta(tmp_path):
+    proyecto = _proyecto_seed(tmp_path)
+    (tmp_path / "assets").mkdir()
+    shutil.copy(f"{m.BASE_DIR}/{m.DEFAULT_LOGO_MEDIA_NAME}", tmp_path / "assets" / "escudo.png")
+    salida = tmp_path / "encuesta.zip"
+
+    assert m.main([str(proyecto), "-o", str(salida), "--logo", str(tmp_path / "assets" / "escudo.png")]) == 0
+    with zipfile.ZipFile(salida) as zf:
+        assert "encuesta_comunidad/media/escudo.png" in zf.namelist()
+        assert _media_image(zf, "encuesta_comunidad/encuesta_comunidad.xlsx") == {"escudo.png"}
+
+
+def test_lote_por_delegaciones_incluye_el_logo(tmp_path):
+    proyecto = _proyecto_seed(tmp_path)
+    delegaciones = tmp_path / "delegaciones.json"
+    delegaciones.write_text('["San Carlos", "Upala"]', encoding="utf-8")
+    salida = tmp_path / "lote.zip"
+
+    assert m.main([str(proyecto), "--delegaciones", str(delegaciones), "-o", str(salida),
+                   "--procesos", "1", "--word"]) == 0
+    with zipfile.ZipFile(salida) as zf:
+        nombres = set(zf.namelist())
+        for slug in ("san_carlos", "upala"):
+            assert f"{slug}/media/{m.DEFAULT_LOGO_MEDIA_NAME}" in nombres
+            assert _media_image(zf, f"{slug}/{slug}.xlsx") == {m.DEFAULT_LOGO_MEDIA_NAME}
+            with zf.open(f"{slug}/{slug}_formato.docx") as f:
+                assert any(n.startswith("word/media/") for n in zipfile.ZipFile(f).namelist())
+
+
+def test_lote_valida_dependencias_antes_de_construir(tmp_path, capsys):
+    estado = {"preguntas": list(m.plantilla_seed())}
+    m.inicializar_estado(estado)
+    estado["reglas_finalizar"].append({"src": "no_existe", "op": "=", "values": ["x"]})
+    proyecto = tmp_path / "proyecto.json"
+    proyecto.write_bytes(m.proyecto_a_archivo(m.proyecto_a_dict(estado, "Encuesta", "es", "1")))
+    delegaciones = tmp_path / "delegaciones.json"
+    delegaciones.write_text('["Upala"]', encoding="utf-8")
+    salida = tmp_path / "lote.zip"
+
+    assert m.main([str(proyecto), "--delegaciones", str(delegaciones), "-o", str(salida)]) == 2
+    assert "no_existe" in capsys.readouterr().err
+    assert not salida.exists()
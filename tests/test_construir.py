@@ -0,0 +1,30 @@
+import motor_xlsform as m
+
+
+def _survey_seed(**cambios):
+    estado = {"preguntas": list(m.plantilla_seed())}
+    m.inicializar_estado(estado)
+    estado.update(cambios)
+    survey, _, _ = m.construir_xlsform(estado["preguntas"], "Encuesta", "es", "1",
+                                       estado["reglas_visibilidad"], estado["reglas_finalizar"], estado)
+    return survey
+
+
+def test_matriz_9_en_un_solo_table_list():
+    survey = _survey_seed()
+    names = survey["name"].tolist()
+    ini, fin = names.index("matriz_seguridad_9"), names.index("matriz_seguridad_9_end")
+    assert survey["appearance"].iloc[ini] == "table-list"
+    dentro = set(names[ini + 1:fin])
+    assert dentro == set(m.MATRIZ_9_NAMES)
+    assert names.count("matriz_seguridad_9") == 1
+
+
+def test_cache_de_fragmentos_no_cambia_el_resultado():
+    estado = {"preguntas": list(m.plantilla_seed())}
+    m.inicializar_estado(estado)
+    cache = {}
+    args = (estado["preguntas"], "Encuesta", "es", "1", [], [], estado)
+    primero = m.construir_xlsform(*args, frag_cache=cache)[0]
+    segundo = m.construir_xlsform(*args, frag_cache=cache)[0]
+    assert cache and segundo.equals(primero)
@@ -0,0 +1,50 @@
+import motor_xlsform as m
+
+
+def _estado_seed():
+    estado = {"preguntas": list(m.plantilla_seed())}
+    m.inicializar_estado(estado)
+    return estado
+
+
+def _construir(estado):
+    survey, _, _ = m.construir_xlsform(estado["preguntas"], "Encuesta", "es", "1",
+                                       estado["reglas_visibilidad"], estado["reglas_finalizar"], estado)
+    return survey.fillna("")
+
+
+def _relevant(survey, name):
+    return survey.loc[survey["name"] == name, "relevant"].iloc[0]
+
+
+def test_regla_usa_posicion_emitida_del_src():
+    # Pregunta agregada al final de la lista pero asignada a la primera página: se emite antes que el resto
+    estado = _estado_seed()
+    pag = estado["paginas"][0]["id"]
+    estado["preguntas"].append({"tipo_ui": "Selección única", "label": "¿Vive en la zona?", "name": "vive_en_zona",
+                                "required": True, "opciones": ["Sí", "No"], "appearance": None,
+                                "choice_filter": None, "relevant": None, "pagina": pag})
+    estado["reglas_finalizar"].append({"src": "vive_en_zona", "op": "=", "values": ["no"]})
+    survey = _construir(estado)
+
+    assert "fin_flag_01" not in _relevant(survey, "canton")
+    assert "fin_flag_01" not in _relevant(survey, "vive_en_zona")
+    siguiente = estado["paginas"][1]["id"]
+    assert "${fin_flag_01}!=1" in _relevant(survey, siguiente)
+
+
+def test_index_src_desfasado_se_ignora():
+    estado = _estado_seed()
+    regla = {"src": "edad_rango", "op": "=", "values": ["x"]}
+    estado["reglas_finalizar"].append(regla)
+    esperado = _construir(estado)
+
+    regla["index_src"] = 0  # índice viejo de un proyecto anterior
+    assert _construir(estado).equals(esperado)
+
+
+def test_regla_con_src_borrado_no_se_compila():
+    estado = _estado_seed()
+    estado["reglas_finalizar"].append({"src": "no_existe", "op": "=", "values": ["x"]})
+    survey = _construir(estado)
+    assert not survey["name"].str.startswith("fin_flag").any()
@@ -0,0 +1,46 @@
+import os
+from io import BytesIO
+
+import motor_xlsform as m
+
+FORMATO_V41 = os.path.join(m.BASE_DIR, "Formato de encuesta Comunidad 2026 V.4.1 cambios generales.docx")
+
+
+def _limpio(textos):
+    return [" ".join(str(t).split()) for t in textos or []]
+
+
+def test_ida_y_vuelta_word_del_seed():
+    estado = {"preguntas": list(m.plantilla_seed())}
+    m.inicializar_estado(estado)
+    buffer = BytesIO()
+    m.escribir_docx(buffer, estado["preguntas"], "Encuesta comunidad", estado)
+    buffer.seek(0)
+
+    proj, _ = m.proyecto_desde_docx(buffer)
+    assert len(proj["preguntas"]) == len(estado["preguntas"]) == 86
+    for leida, original in zip(proj["preguntas"], estado["preguntas"]):
+        assert (leida["name"], leida["tipo_ui"]) == (original["name"], original["tipo_ui"])
+        assert leida["pagina"] == original["pagina"]
+        assert _limpio(leida.get("opciones")) == _limpio(original.get("opciones"))
+        assert _limpio([leida["label"]]) == _limpio([original["label"]])
+
+
+def test_formato_v41_incluido_en_el_repo():
+    proj, avisos = m.proyecto_desde_docx(FORMATO_V41)
+    preguntas = proj["preguntas"]
+    names = [q["name"] for q in preguntas]
+    assert len(preguntas) == 83
+    assert len(set(names)) == len(names)
+    assert names[:7] == ["consentimiento", "canton", "distrito", "edad_rango", "genero", "escolaridad", "relacion_zona"]
+    assert {q["tipo_ui"] for q in preguntas} <= set(m.TIPOS)
+    # La matriz 9 conserva sus names y la escala compartida
+    matriz = [q for q in preguntas if q["name"] in m.MATRIZ_9_NAMES]
+    assert matriz and len({tuple(q["opciones"]) for q in matriz}) == 1
+    # La lógica escrita en notas no se interpreta: queda en avisos
+    assert any("lógica condicional no importada" in a for a in avisos)
+
+    # El borrador se puede exportar tal cual
+    estado = m.estado_desde_proyecto(proj)
+    survey, _, _ = m.construir_xlsform(estado["preguntas"], proj["form_title"], "es", "1", [], [], estado)
+    assert set(names) <= set(survey["name"])
@@ -0,0 +1,38 @@
+from io import BytesIO
+
+import pytest
+
+import motor_xlsform as m
+
+
+def _estado_seed(con_catalogo: bool):
+    estado = {"preguntas": list(m.plantilla_seed())}
+    m.inicializar_estado(estado)
+    if con_catalogo:
+        m.importar_catalogo_poblados(estado, m.cargar_catalogo_poblados()[:5])
+    q = next(q for q in estado["preguntas"] if q["name"] == "edad_rango")
+    estado["reglas_finalizar"].append({"src": "edad_rango", "op": "=", "values": [m.slugify_name(q["opciones"][0])]})
+    return estado
+
+
+def _construir(estado, form_title="Encuesta comunidad", idioma="es", version="7"):
+    return m.construir_xlsform(estado["preguntas"], form_title, idioma, version,
+                               estado["reglas_visibilidad"], estado["reglas_finalizar"], estado)
+
+
+@pytest.mark.parametrize("con_catalogo", [False, True])
+def test_ida_y_vuelta_xlsform(con_catalogo):
+    hojas = _construir(_estado_seed(con_catalogo))
+    assert "fin_flag_01" in hojas[0]["name"].tolist()
+    buffer = BytesIO()
+    m.escribir_xlsform(buffer, *hojas)
+    buffer.seek(0)
+
+    proj, _ = m.proyecto_desde_xlsform(buffer)
+    assert len(proj["reglas_finalizar"]) == 1
+    estado = m.estado_desde_proyecto(proj)
+    de_nuevo = _construir(estado, proj["form_title"], proj["idioma"], proj["version"])
+
+    for original, reconstruida in zip(hojas, de_nuevo):
+        assert list(reconstruida.columns) == list(original.columns)
+        assert reconstruida.fillna("").astype(str).equals(original.fillna("").astype(str))
@@ -0,0 +1,15 @@
+import os
+
+import motor_xlsform as m
+
+
+def test_pdf_del_seed_con_logo():
+    estado = {"preguntas": list(m.plantilla_seed())}
+    m.inicializar_estado(estado)
+    with open(os.path.join(m.BASE_DIR, m.DEFAULT_LOGO_MEDIA_NAME), "rb") as f:
+        logo = f.read()
+    pdf = m.pdf_encuesta_bytes(estado["preguntas"], "Encuesta", estado, logo_bytes=logo)
+    assert pdf.startswith(b"%PDF")
+    # El logo se incrusta una sola vez aunque aparezca en el encabezado de cada página
+    assert pdf.count(b"/Subtype /Image") == 1
+    assert pdf.count(b"/Type /Page\n") > 1
@@ -0,0 +1,114 @@
+import copy
+import gzip
+import json
+
+import pytest
+
+import motor_xlsform as m
+
+
+def _proyecto_legado():
+    """Proyecto como lo exportaba la app antes del schema: JSON indentado, sin 'schema' ni 'pagina' ni 'paginas'."""
+    preguntas = m.seed_preguntas()
+    for i, q in enumerate(preguntas, start=1):
+        q.pop("pagina", None)
+        q["qid"] = f"q_{i:03d}"
+    return {
+        "form_title": "Encuesta comunidad",
+        "idioma": "es",
+        "version": "3",
+        "preguntas": preguntas,
+        "reglas_visibilidad": [{"src": "consentimiento", "op": "=", "values": ["si"], "target": "canton"}],
+        "reglas_finalizar": [{"src": "edad_rango", "op": "=", "values": ["x"], "index_src": 3}],
+        "choices_ext_rows": [
+            {"list_name": "list_canton", "name": "san_jose", "label": "San José"},
+            {"list_name": "list_distrito", "name": "carmen", "label": "Carmen", "canton_key": "san_jose"},
+        ],
+        "choices_extra_cols": ["canton_key"],
+        "textos_fijos": {"matriz_9_label": m.MATRIZ_9_LABEL_DEFAULT},
+    }
+
+
+def _legado_bytes(proj):
+    return json.dumps(proj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def test_lee_archivo_schema_1():
+    legado = _proyecto_legado()
+    proj = m.proyecto_desde_archivo(_legado_bytes(legado))
+    assert proj == legado
+
+    estado = m.estado_desde_proyecto(proj)
+    assert [m.pagina_de_pregunta(q) for q in estado["preguntas"]] == [q["pagina"] for q in m.seed_preguntas()]
+    assert estado["paginas"]
+
+
+@pytest.mark.parametrize("comprimir", [False, True])
+def test_schema_1_a_2_sin_perdida(comprimir):
+    legado = _proyecto_legado()
+    proj = m.proyecto_desde_archivo(_legado_bytes(legado))
+    raw = m.proyecto_a_archivo(proj, comprimir=comprimir)
+    assert raw.startswith(b"\x1f\x8b") == comprimir
+    datos = json.loads(gzip.decompress(raw) if comprimir else raw)
+    assert datos["schema"] == m.PROYECTO_SCHEMA
+    assert len(raw) < len(_legado_bytes(legado))
+    assert m.proyecto_desde_archivo(raw) == legado
+
+
+def test_proyecto_de_la_sesion_ida_y_vuelta():
+    estado = {"preguntas": list(m.plantilla_seed())}
+    m.inicializar_estado(estado)
+    proj = m.proyecto_a_dict(estado, "Encuesta", "es", "1")
+    leido = m.proyecto_desde_archivo(m.proyecto_a_archivo(proj))
+    assert json.dumps(leido, sort_keys=True, default=list) == json.dumps(proj, sort_keys=True, default=list)
+
+
+def _con(**cambios):
+    proj = _proyecto_legado()
+    proj.update(copy.deepcopy(cambios))
+    return proj
+
+
+def _pregunta(**cambios):
+    proj = _proyecto_legado()
+    proj["preguntas"][0].update(cambios)
+    return proj
+
+
+@pytest.mark.parametrize("proj, mensaje", [
+    ({"form_title": "x"}, "Falta la lista 'preguntas'"),
+    (_con(preguntas=["no soy un dict"]), "Pregunta #1: no es un objeto"),
+    (_pregunta(tipo_ui="Matriz"), "tipo_ui desconocido 'Matriz'"),
+    (_pregunta(name=""), "Pregunta #1: falta 'name'"),
+    (_pregunta(opciones="Sí, No"), "'opciones' debe ser una lista de textos"),
+    (_pregunta(opciones=["Sí", 2]), "'opciones' debe ser una lista de textos"),
+    (_con(reglas_visibilidad=[{"src": "canton", "op": ">", "values": []}]), "reglas_visibilidad #1"),
+    (_con(reglas_finalizar=[{"src": "canton", "op": "="}]), "reglas_finalizar #1"),
+    (_con(paginas=[{"id": "p1"}]), "Página #1: se esperaba {id, label}"),
+    (_con(choices_ext_rows=[{"name": "san_jose", "label": "San José"}]), "choices_ext_rows"),
+])
+def test_validar_proyecto_errores(proj, mensaje):
+    errores = m.validar_proyecto(proj)
+    assert len(errores) == 1 and mensaje in errores[0]
+    with pytest.raises(ValueError, match="Proyecto inválido"):
+        m.proyecto_desde_archivo(_legado_bytes(proj))
+
+
+def test_validar_proyecto_sin_errores():
+    assert m.validar_proyecto(_proyecto_legado()) == []
+
+
+@pytest.mark.parametrize("raw, mensaje", [
+    (b"\x1f\x8b\x08\x00roto", "dañado"),
+    (b"{\"preguntas\": [", "no es un JSON válido"),
+    (b"[1, 2, 3]", "se esperaba un objeto JSON"),
+    (json.dumps({"schema": 99, "preguntas": []}).encode(), "schema 99"),
+    (json.dumps({"schema": 2, "preguntas": []}).encode(), "schema 2 mal formado"),
+    (json.dumps({"schema": 2, "listas": [], "preguntas": [{"name": "a", "opciones": 5}]}).encode(), "schema 2 mal formado"),
+    (json.dumps({"schema": 2, "listas": [], "preguntas": [],
+                 "catalogo": {"textos": [], "tramos": [{"lista": "l", "names": ["a"], "labels": []}]}}).encode(),
+     "distinto largo"),
+])
+def test_archivo_mal_formado(raw, mensaje):
+    with pytest.raises(ValueError, match=mensaje):
+        m.proyecto_desde_archivo(raw)
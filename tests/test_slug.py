@@ -0,0 +1,48 @@
+import random
+import re
+
+import motor_xlsform as m
+
+
+def _slugify_anterior(texto: str) -> str:
+    """slugify_name tal como estaba antes de la tabla de transliteración (referencia byte a byte)."""
+    if not texto:
+        return "campo"
+    t = texto.lower()
+    t = re.sub(r"[áàäâ]", "a", t)
+    t = re.sub(r"[éèëê]", "e", t)
+    t = re.sub(r"[íìïî]", "i", t)
+    t = re.sub(r"[óòöô]", "o", t)
+    t = re.sub(r"[úùüû]", "u", t)
+    t = re.sub(r"ñ", "n", t)
+    t = re.sub(r"[^a-z0-9]+", "_", t).strip("_")
+    return t or "campo"
+
+
+# Alfabeto que la versión anterior ya cubría: en él ambas deben coincidir
+ALFABETO = ("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 _-.,;:()¿?¡!/'\"%\n"
+            "áàäâéèëêíìïîóòöôúùüûñÁÀÄÂÉÈËÊÍÌÏÎÓÒÖÔÚÙÜÛÑ")
+
+
+def test_igual_a_la_anterior_en_seed_y_catalogo():
+    textos = []
+    for q in m.seed_preguntas():
+        textos += [q["label"], q["name"], *(q.get("opciones") or [])]
+    for c in m.cargar_catalogo_poblados():
+        textos += [c["canton"], *c["distritos"]]
+    distintos = [t for t in textos if m.slugify_name(t) != _slugify_anterior(t)]
+    assert distintos == []
+
+
+def test_igual_a_la_anterior_en_textos_aleatorios():
+    rnd = random.Random(17)
+    for _ in range(50000):
+        t = "".join(rnd.choice(ALFABETO) for _ in range(rnd.randint(0, 12)))
+        assert m.slugify_name(t) == _slugify_anterior(t), repr(t)
+
+
+def test_letras_fuera_del_espanol_ya_no_son_guion_bajo():
+    assert m.slugify_name("Straße Müller") == "strasse_muller"
+    assert m.slugify_name("Łódź") == "lodz"
+    assert m.slugify_name("çedilla") == "cedilla"
+    assert m.slugify_name("") == m.slugify_name("¿?") == "campo"